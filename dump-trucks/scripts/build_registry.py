@@ -5,12 +5,29 @@
 Шаг 3: Создать dump-trucks-registry.json с idMo + gruzopod'yomnost'
 """
 
+import argparse
 import json
 import re
 import sys
 import os
+import shutil
+import importlib.util
 import requests
-import openpyxl
+
+try:
+    import pandas as pd
+except ImportError:  # без pandas Excel читается построчно через openpyxl
+    pd = None
+
+try:
+    import orjson
+except ImportError:  # минимальное окружение — stdlib json
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # без ijson ответ getPassports читается целиком
+    ijson = None
 
 # --- Конфиг ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -18,6 +35,10 @@ ENV_PATH = os.path.join(BASE_DIR, 'server', '.env')
 EXCEL_PATH = os.path.join(os.path.dirname(BASE_DIR), 'Самосвалы объёмы.xlsx')
 REGISTRY_PATH = os.path.join(BASE_DIR, 'config', 'dump-trucks-registry.json')
 
+# calamine (Rust) заметно быстрее openpyxl; fallback, если не установлен
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+EXCEL_COLUMNS = ['model', 'regNumber', 'branch', 'volumeM3', 'weightT']
+
 def load_env(path):
     env = {}
     with open(path) as f:
@@ -28,43 +49,108 @@ def load_env(path):
                 env[k.strip()] = v.strip()
     return env
 
+_REG_TRANS = str.maketrans('', '', ' \t\n\r')
+
 def normalize_reg(reg: str) -> str:
     """Нормализация госномера: убрать пробелы, привести к верхнему регистру."""
     if not reg:
         return ''
-    return reg.strip().upper().replace(' ', '')
+    return reg.upper().translate(_REG_TRANS)
 
-def load_excel_vehicles(path: str) -> list:
-    wb = openpyxl.load_workbook(path, data_only=True)
-    ws = wb.active
+def _excel_float(value):
+    """Число из ячейки Excel; пусто, 0 и нечисловое → None (как pd.to_numeric + mask)."""
+    try:
+        num = float(value)
+    except (TypeError, ValueError):
+        return None
+    return num if num and num == num else None
+
+def _load_excel_vehicles_openpyxl(path: str) -> list:
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
     vehicles = []
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if not row[1]:
+    for row in wb.active.iter_rows(min_row=2, max_col=len(EXCEL_COLUMNS), values_only=True):
+        row = tuple(row) + (None,) * (len(EXCEL_COLUMNS) - len(row))
+        if row[1] is None or str(row[1]) == '':
             continue
         vehicles.append({
-            'model':     str(row[0]).strip() if row[0] else '',
-            'regNumber': normalize_reg(str(row[1])),
-            'branch':    str(row[2]).strip() if row[2] else '',
-            'volumeM3':  float(row[3]) if row[3] else None,
-            'weightT':   float(row[4]) if row[4] else None,
+            'model':     str(row[0]).strip() if row[0] is not None else '',
+            'regNumber': str(row[1]).strip().upper().replace(' ', ''),
+            'branch':    str(row[2]).strip() if row[2] is not None else '',
+            'volumeM3':  _excel_float(row[3]),
+            'weightT':   _excel_float(row[4]),
         })
+    wb.close()
     return vehicles
 
-def get_passports(base_url: str, token: str) -> list:
-    """getPassports — без доп. параметров, возвращает список всех ТС."""
-    url = f"{base_url}?token={token}&format=json&command=getPassports"
+def load_excel_vehicles(path: str) -> list:
+    if pd is None:
+        return _load_excel_vehicles_openpyxl(path)
+    df = pd.read_excel(path, engine=EXCEL_ENGINE, header=0, usecols=range(len(EXCEL_COLUMNS)))
+    df.columns = EXCEL_COLUMNS
+
+    # Векторная нормализация вместо поячеечных str()/float()
+    reg = df['regNumber'].astype('string')
+    df = df[reg.notna() & (reg != '')].copy()
+    df['regNumber'] = df['regNumber'].astype('string').str.strip().str.upper().str.replace(' ', '', regex=False)
+    for col in ('model', 'branch'):
+        df[col] = df[col].astype('string').fillna('').str.strip()
+    for col in ('volumeM3', 'weightT'):
+        num = pd.to_numeric(df[col], errors='coerce').astype('Float64')
+        df[col] = num.mask(num == 0)
+
+    # pd.NA → None, чтобы реестр сериализовался в JSON
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+def _passports_url(base_url: str, token: str) -> str:
+    return f"{base_url}?token={token}&format=json&command=getPassports"
+
+def get_passports(base_url: str, token: str):
+    """getPassports — без доп. параметров; потоково отдаёт паспорта всех ТС.
+
+    Ответ: { passports: [...] } разбирается ijson по элементам, без
+    материализации всего списка в памяти; без ijson — целиком.
+    """
+    url = _passports_url(base_url, token)
     print(f"  POST {url[:80]}...")
-    resp = requests.post(url, data=None, timeout=60)
-    resp.raise_for_status()
-    data = resp.json()
-    # Ответ: { passports: [...] }
+    with requests.post(url, data=None, timeout=60, stream=ijson is not None) as resp:
+        resp.raise_for_status()
+        if ijson is not None:
+            resp.raw.decode_content = True
+            yield from ijson.items(resp.raw, 'passports.item')
+            return
+        data = orjson.loads(resp.content) if orjson else resp.json()
     if isinstance(data, dict):
-        return data.get('passports', data.get('list', data.get('data', [])))
-    if isinstance(data, list):
-        return data
-    return []
+        yield from data.get('passports', [])
+    elif isinstance(data, list):
+        yield from data
+
+def dump_passports(base_url: str, token: str, path: str):
+    """Сырой ответ getPassports → файл, без повторной сериализации."""
+    with requests.post(_passports_url(base_url, token), data=None, timeout=60, stream=True) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(resp.raw, f)
+
+def _extract_passport(p: dict) -> tuple:
+    """(reg, idMo, nameMO) из паспорта TIS; модель хранится в modelOrMarkOrModif."""
+    return (
+        normalize_reg(str(p.get('regNumber') or p.get('regNum') or p.get('reg_number') or '')),
+        p.get('idMO') or p.get('id') or p.get('moId'),
+        p.get('modelOrMarkOrModif') or p.get('nameMO') or p.get('name') or '',
+    )
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Сборка реестра самосвалов (Excel + TIS getPassports)')
+    parser.add_argument('--dump-passports', action='store_true',
+                        help='Сохранить полный дамп TIS паспортов в config/passports_dump.json (отладка)')
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+
     # --- Загрузка конфига ---
     env = load_env(ENV_PATH)
     base_url = env.get('TIS_API_URL', '')
@@ -82,44 +168,41 @@ def main():
     # --- getPassports ---
     print("\nПолучаю список ТС из TIS API (getPassports)...")
     token = tokens[0]  # первый токен, без rate limit (нет idMO)
-    try:
-        passports = get_passports(base_url, token)
-    except Exception as e:
-        print(f"ERROR: getPassports failed: {e}")
-        sys.exit(1)
-
-    print(f"  Получено {len(passports)} ТС из TIS")
-
-    if passports:
-        # Покажем структуру первого элемента
-        print(f"  Пример элемента: {json.dumps(passports[0], ensure_ascii=False, indent=2)[:500]}")
 
     # --- Матчинг ---
-    print("\nМатчинг gosنومеров...")
     matched = []
     unmatched_excel = []
     tis_by_reg = {}
 
-    for p in passports:
-        reg_raw = p.get('regNumber') or p.get('regNum') or p.get('reg_number') or ''
-        id_mo   = p.get('idMO') or p.get('id') or p.get('moId')
-        # Паспорт хранит модель в modelOrMarkOrModif
-        name_mo = p.get('modelOrMarkOrModif') or p.get('nameMO') or p.get('name') or ''
-        reg = normalize_reg(str(reg_raw))
-        if reg:
-            tis_by_reg[reg] = {'idMo': id_mo, 'nameMO': name_mo, 'reg': reg, 'raw': p}
+    # reg → (idMo, nameMO); паспорта разбираются потоково, сырой паспорт не храним
+    passports_count = 0
+    try:
+        for p in get_passports(base_url, token):
+            if passports_count == 0:
+                # Покажем структуру первого элемента
+                print(f"  Пример элемента: {json.dumps(p, ensure_ascii=False, indent=2, default=str)[:500]}")
+            passports_count += 1
+            reg, id_mo, name_mo = _extract_passport(p)
+            if reg:
+                tis_by_reg[reg] = (id_mo, name_mo)
+    except Exception as e:
+        print(f"ERROR: getPassports failed: {e}")
+        sys.exit(1)
 
+    print(f"  Получено {passports_count} ТС из TIS")
+
+    print("\nМатчинг gosنومеров...")
     for reg, excel_v in excel_by_reg.items():
         if reg in tis_by_reg:
-            tis = tis_by_reg[reg]
+            id_mo, name_mo = tis_by_reg[reg]
             matched.append({
-                'idMo':      tis['idMo'],
+                'idMo':      id_mo,
                 'regNumber': reg,
                 'model':     excel_v['model'],
                 'branch':    excel_v['branch'],
                 'volumeM3':  excel_v['volumeM3'],
                 'weightT':   excel_v['weightT'],
-                'nameMO':    tis['nameMO'],
+                'nameMO':    name_mo,
             })
         else:
             unmatched_excel.append(reg)
@@ -135,8 +218,12 @@ def main():
     matched_sorted = sorted(matched, key=lambda x: (x.get('regNumber', '') or ''))
     registry = {"vehicles": matched_sorted}
 
-    with open(REGISTRY_PATH, 'w', encoding='utf-8') as f:
-        json.dump(registry, f, ensure_ascii=False, indent=2)
+    if orjson:
+        with open(REGISTRY_PATH, 'wb') as f:
+            f.write(orjson.dumps(registry, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(REGISTRY_PATH, 'w', encoding='utf-8') as f:
+            json.dump(registry, f, ensure_ascii=False, indent=2)
     print(f"\nРеестр сохранён: {REGISTRY_PATH}")
     print(f"Итого машин в реестре: {len(matched_sorted)}")
 
@@ -146,9 +233,10 @@ def main():
         print(f"  idMo={v['idMo']:5}  {v['regNumber']:12}  {v['model'][:40]}  vol={v['volumeM3']}м3")
 
     # --- Сохраняем полный дамп TIS пассортов (для отладки) ---
+    if not args.dump_passports:
+        return
     dump_path = os.path.join(os.path.dirname(REGISTRY_PATH), 'passports_dump.json')
-    with open(dump_path, 'w', encoding='utf-8') as f:
-        json.dump(passports, f, ensure_ascii=False, indent=2)
+    dump_passports(base_url, token, dump_path)
     print(f"\nПолный дамп TIS сохранён: {dump_path}")
 
 if __name__ == '__main__':
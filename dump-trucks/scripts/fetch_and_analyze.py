@@ -8,26 +8,92 @@
 Шаг 5: CSV: trips_raw.csv (промежуточная) + summary.csv (финальная)
 """
 
+import argparse
 import json
 import os
 import re
 import sys
 import time
 import csv
+import functools
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+try:
+    import orjson
+except ImportError:  # минимальное окружение — stdlib json
+    orjson = None
+
 # --- Пути ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ENV_PATH = os.path.join(BASE_DIR, 'server', '.env')
 REGISTRY_PATH = os.path.join(BASE_DIR, 'config', 'dump-trucks-registry.json')
 OUTPUT_DIR = os.path.join(BASE_DIR, 'output')
+MONITORING_CACHE_PATH = os.path.join(OUTPUT_DIR, 'monitoring_cache.json')
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # --- Конфиг ---
 PL_DAYS_BACK = 7
 REQ_DAYS_BACK = 60
 RATE_LIMIT_SEC = 31  # между запросами мониторинга для одного idMO
+MONITORING_CACHE_MIN_AGE = timedelta(days=1)  # кэшируем только закрытые периоды
+
+_REQ_NUM_RE = re.compile(r'(\d+)')
+
+# Колонки CSV (строки собираются кортежами в этом же порядке)
+TRIP_FIELDS = (
+    'id_mo',
+    'reg_number',
+    'model',
+    'branch',
+    'volume_m3',
+    'pl_date',
+    'pl_status',
+    'request_numbers',
+    'object_expend',
+    'parking_num',
+    'parking_begin',
+    'parking_end',
+    'parking_dur_min',
+    'parking_address',
+    'parking_lat',
+    'parking_lon',
+)
+SUMMARY_FIELDS = (
+    'id_mo',
+    'reg_number',
+    'model',
+    'branch',
+    'volume_m3',
+    'weight_t',
+    'pl_count',
+    'pl_date_from',
+    'pl_date_to',
+    'pl_duration_h',
+    'engine_time_h',
+    'moving_time_h',
+    'distance_km',
+    'parkings_count',
+    'kip_pct',
+    'request_numbers',
+    'object_expend',
+)
+
+def json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def write_json(path, obj, indent=True):
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=option))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2 if indent else None)
 
 def load_env(path):
     env = {}
@@ -45,8 +111,21 @@ def load_registry(path):
     by_id = {v['idMo']: v for v in data['vehicles']}
     return by_id
 
+@functools.lru_cache(maxsize=65536)
 def parse_date(s):
     """DD.MM.YYYY или DD.MM.YYYY HH:mm:ss или DD.MM.YYYY HH:mm"""
+    # Быстрый путь: фиксированные позиции без strptime
+    n = len(s) if isinstance(s, str) else 0
+    if n in (10, 16, 19) and s[2] == '.' and s[5] == '.':
+        try:
+            if n == 10:
+                return datetime(int(s[6:10]), int(s[3:5]), int(s[0:2]))
+            if s[10] == ' ' and s[13] == ':' and (n == 16 or s[16] == ':'):
+                return datetime(int(s[6:10]), int(s[3:5]), int(s[0:2]),
+                                int(s[11:13]), int(s[14:16]),
+                                int(s[17:19]) if n == 19 else 0)
+        except ValueError:
+            pass
     for fmt in ('%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y'):
         try:
             return datetime.strptime(s, fmt)
@@ -54,31 +133,85 @@ def parse_date(s):
             pass
     return None
 
+# f-строки вместо strftime: без разбора формата на каждый вызов
 def fmt_date(dt):
-    return dt.strftime('%d.%m.%Y')
+    return f"{dt.day:02d}.{dt.month:02d}.{dt.year}"
 
 def fmt_datetime(dt):
-    return dt.strftime('%d.%m.%Y %H:%M')
+    return f"{dt.day:02d}.{dt.month:02d}.{dt.year} {dt.hour:02d}:{dt.minute:02d}"
 
 def extract_request_number(order_descr):
     """Номер заявки из orderDescr: ведущий ^ (\d+)"""
     if not order_descr:
         return None
     cleaned = order_descr.lstrip('№').lstrip()
-    m = re.match(r'^(\d+)', cleaned)
+    m = _REQ_NUM_RE.match(cleaned)
     return int(m.group(1)) if m else None
 
+# --- Кэш мониторинга (повторные прогоны без сети) ---
+class MonitoringCache:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {}
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    self.data = json_loads(f.read())
+            except (OSError, ValueError) as e:
+                print(f"  Кэш мониторинга не прочитан ({e}), начинаем с пустого")
+
+    @staticmethod
+    def key(id_mo, from_dt, to_dt):
+        return f"{id_mo}|{from_dt.isoformat()}|{to_dt.isoformat()}"
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    @staticmethod
+    def period_closed(to_dt):
+        # Мониторинг незакрытого периода ещё дополняется — такой ответ не кэшируем
+        return to_dt + MONITORING_CACHE_MIN_AGE < datetime.now()
+
+    def put(self, key, payload):
+        # Только в памяти; на диск — один раз в конце прогона (save)
+        with self.lock:
+            self.data[key] = payload
+            self.dirty = True
+
+    def save(self):
+        # Атомарная запись: .tmp → os.replace
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp = self.path + '.tmp'
+            write_json(tmp, self.data, indent=False)
+            os.replace(tmp, self.path)
+            self.dirty = False
+
 # --- TIS API ---
 class TisClient:
-    def __init__(self, base_url, tokens):
+    def __init__(self, base_url, tokens, cache=None):
         self.base_url = base_url
+        self.cache = cache
         self.tokens = tokens
         self.token_idx = 0
-        self.last_call = {}  # idMO → timestamp
+        self.token_lock = threading.Lock()
+        self.last_call = defaultdict(float)  # idMO → timestamp
+        self.idmo_locks = defaultdict(threading.Lock)
+        # Keep-alive сессия: одно TCP/TLS-соединение на все вызовы
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def _next_token(self):
-        t = self.tokens[self.token_idx % len(self.tokens)]
-        self.token_idx += 1
+        with self.token_lock:
+            t = self.tokens[self.token_idx % len(self.tokens)]
+            self.token_idx += 1
         return t
 
     def _post(self, command, params, timeout=60):
@@ -87,13 +220,13 @@ class TisClient:
         url = f"{self.base_url}?token={token}&format=json&command={command}&{qs}"
         for attempt in range(3):
             try:
-                resp = requests.post(url, timeout=timeout)
+                resp = self.session.post(url, timeout=timeout)
                 if resp.status_code == 429:
                     print(f"  429 rate limit, wait 10s...")
                     time.sleep(10)
                     continue
                 resp.raise_for_status()
-                return resp.json()
+                return json_loads(resp.content)
             except requests.Timeout:
                 print(f"  Timeout, retry {attempt+1}/3")
                 time.sleep(2 ** attempt)
@@ -117,20 +250,30 @@ class TisClient:
         return data.get('list', []) if data else []
 
     def get_monitoring(self, id_mo, from_dt, to_dt):
+        if self.cache is not None:
+            cache_key = self.cache.key(id_mo, from_dt, to_dt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         # Rate limit: 30 сек между запросами для одного idMO
-        now = time.time()
-        last = self.last_call.get(id_mo, 0)
-        wait = RATE_LIMIT_SEC - (now - last)
-        if wait > 0:
-            print(f"  Rate limit: ждём {wait:.1f}с для idMO={id_mo}...")
-            time.sleep(wait)
-        self.last_call[id_mo] = time.time()
-
-        data = self._post('getMonitoringStats', {
-            'idMO':     id_mo,
-            'fromDate': fmt_datetime(from_dt),
-            'toDate':   fmt_datetime(to_dt),
-        }, timeout=30)
+        with self.token_lock:
+            lock = self.idmo_locks[id_mo]
+        with lock:
+            now = time.time()
+            wait = RATE_LIMIT_SEC - (now - self.last_call[id_mo])
+            if wait > 0:
+                print(f"  Rate limit: ждём {wait:.1f}с для idMO={id_mo}...")
+                time.sleep(wait)
+            self.last_call[id_mo] = time.time()
+
+            data = self._post('getMonitoringStats', {
+                'idMO':     id_mo,
+                'fromDate': fmt_datetime(from_dt),
+                'toDate':   fmt_datetime(to_dt),
+            }, timeout=30)
+        if data is not None and self.cache is not None and self.cache.period_closed(to_dt):
+            self.cache.put(cache_key, data)
         return data
 
 # --- Анализ трека (упрощённый, без геозон — только подсчёт рейсов) ---
@@ -161,7 +304,103 @@ def analyze_track_simple(monitoring):
         'track_points':   len(track),
     }
 
+def process_vehicle(tis, idmo, pls, label, verbose=False):
+    """Мониторинг + строки trips/summary для одной машины (выполняется в пуле потоков)."""
+    pl = pls[0]  # берём первый ПЛ (или объединяем)
+    reg = pl['reg_number']
+    model = pl['model']
+    # Лог машины собираем и выводим одним print в конце
+    log_lines = [f"\n  [{label}] idMO={idmo} {reg} ({model})"]
+
+    # Используем период от начала первого ПЛ до конца последнего
+    all_starts = [p['date_out_plan'] for p in pls]
+    all_ends   = [p['date_in_plan']  for p in pls]
+    mon_from = min(all_starts)
+    mon_to   = max(all_ends)
+    if verbose:
+        log_lines.append(f"    Период: {fmt_datetime(mon_from)} – {fmt_datetime(mon_to)}")
+
+    monitoring = tis.get_monitoring(idmo, mon_from, mon_to)
+    stats = analyze_track_simple(monitoring)
+    if verbose:
+        log_lines.append(f"    Трек: {stats['track_points']} точек, {stats['engine_time_h']}ч, {stats['distance_km']}км, {stats['parkings_count']} остановок")
+
+    # Рейсы = остановки (parkings)
+    _parse = parse_date
+    _round = round
+    trips_rows = []
+    parkings = (monitoring or {}).get('parkings', []) or []
+    for i, park in enumerate(parkings, 1):
+        begin_dt = _parse(park.get('begin', ''))
+        end_dt   = _parse(park.get('end', ''))
+        dur_min  = _round((end_dt - begin_dt).total_seconds() / 60) if begin_dt and end_dt else None
+        trips_rows.append((
+            idmo,                                           # id_mo
+            reg,                                            # reg_number
+            model,                                          # model
+            pl['branch'],                                   # branch
+            pl['volume_m3'],                                # volume_m3
+            pl['date_out'],                                 # pl_date
+            pl['pl_status'],                                # pl_status
+            '; '.join(str(n) for n in pl['request_numbers']),  # request_numbers
+            '; '.join(pl['object_expends']),                # object_expend
+            i,                                              # parking_num
+            park.get('begin', ''),                          # parking_begin
+            park.get('end', ''),                            # parking_end
+            dur_min,                                        # parking_dur_min
+            park.get('address', ''),                        # parking_address
+            park.get('lat', ''),                            # parking_lat
+            park.get('lon', ''),                            # parking_lon
+        ))
+
+    # Все заявки через ПЛ
+    all_requests = []
+    all_req_nums = []
+    all_objects  = []
+    for p in pls:
+        all_req_nums.extend(p['request_numbers'])
+        all_objects.extend(p['object_expends'])
+        all_requests.extend(p['requests'])
+    all_req_nums = list(dict.fromkeys(all_req_nums))
+    all_objects  = list(dict.fromkeys(all_objects))
+
+    # KIP%
+    pl_duration_h = sum(p['duration_h'] for p in pls)
+    kip_pct = round(stats['engine_time_h'] / pl_duration_h * 100, 1) if pl_duration_h > 0 else 0
+
+    summary_row = (
+        idmo,                                           # id_mo
+        reg,                                            # reg_number
+        model,                                          # model
+        pl['branch'],                                   # branch
+        pl['volume_m3'],                                # volume_m3
+        pl['weight_t'],                                 # weight_t
+        len(pls),                                       # pl_count
+        fmt_date(min(all_starts)),                      # pl_date_from
+        fmt_date(max(all_ends)),                        # pl_date_to
+        round(pl_duration_h, 1),                        # pl_duration_h
+        stats['engine_time_h'],                         # engine_time_h
+        stats['moving_time_h'],                         # moving_time_h
+        stats['distance_km'],                           # distance_km
+        stats['parkings_count'],                        # parkings_count
+        kip_pct,                                        # kip_pct
+        '; '.join(str(n) for n in all_req_nums),        # request_numbers
+        '; '.join(all_objects),                         # object_expend
+    )
+    print('\n'.join(log_lines), flush=False)
+    return trips_rows, summary_row
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Выгрузка ПЛ + мониторинг самосвалов → CSV')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Не использовать output/monitoring_cache.json')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Подробный лог по каждой машине (период, трек)')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     # --- Загрузка ---
     env = load_env(ENV_PATH)
     base_url = env.get('TIS_API_URL', '')
@@ -171,7 +410,8 @@ def main():
     print(f"Реестр: {len(our_ids)} самосвалов")
     print(f"Токены: {len(tokens)}")
 
-    tis = TisClient(base_url, tokens)
+    cache = None if args.no_cache else MonitoringCache(MONITORING_CACHE_PATH)
+    tis = TisClient(base_url, tokens, cache=cache)
 
     today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
@@ -197,172 +437,122 @@ def main():
 
     # --- Шаг 3: Фильтр ПЛ по нашим самосвалам ---
     print(f"\n[Шаг 3] Фильтрация ПЛ по нашим самосвалам...")
-    our_pls = []
+    our_pls_by_idmo = defaultdict(list)  # idMO → ПЛ, группировка сразу при фильтрации
+    # Локальные имена вместо LOAD_GLOBAL во внутреннем цикле
+    _parse = parse_date
+    _extract = extract_request_number
+    _reg_get = registry.get
     for pl in route_lists:
-        ts_list = pl.get('ts', [])
-        for ts in ts_list:
-            id_mo = ts.get('idMO')
-            if id_mo in our_ids:
-                # Парсим даты
-                date_out_plan = parse_date(pl.get('dateOutPlan', ''))
-                date_in_plan  = parse_date(pl.get('dateInPlan', ''))
-                if not date_out_plan or not date_in_plan:
-                    continue
-
-                # Номера заявок из calcs
-                request_numbers = []
-                object_expends  = []
-                for calc in pl.get('calcs', []):
-                    num = extract_request_number(calc.get('orderDescr', ''))
-                    if num and num not in request_numbers:
-                        request_numbers.append(num)
-                    obj = calc.get('objectExpend', '')
-                    if obj and obj not in object_expends:
-                        object_expends.append(obj)
-
-                # Матчинг с заявками
-                matched_requests = []
-                for rnum in request_numbers:
-                    req = req_by_number.get(rnum)
-                    if req:
-                        matched_requests.append({
-                            'number':       rnum,
-                            'status':       req.get('status', ''),
-                            'contactPerson': req.get('contactPerson', ''),
-                        })
-
-                vehicle_info = registry[id_mo]
-                our_pls.append({
-                    'pl_id':           pl.get('id'),
-                    'ts_number':       pl.get('tsNumber'),
-                    'pl_status':       pl.get('status'),
-                    'id_mo':           id_mo,
-                    'reg_number':      ts.get('regNumber', vehicle_info.get('regNumber', '')),
-                    'name_mo':         ts.get('nameMO', ''),
-                    'model':           vehicle_info.get('model', ''),
-                    'branch':          vehicle_info.get('branch', ''),
-                    'volume_m3':       vehicle_info.get('volumeM3'),
-                    'weight_t':        vehicle_info.get('weightT'),
-                    'date_out_plan':   date_out_plan,
-                    'date_in_plan':    date_in_plan,
-                    'date_out':        pl.get('dateOut', ''),
-                    'request_numbers': request_numbers,
-                    'object_expends':  object_expends,
-                    'requests':        matched_requests,
+        # Только ТС из реестра — ПЛ без наших машин пропускаем сразу
+        our_ts = [ts for ts in pl.get('ts', []) if ts.get('idMO') in our_ids]
+        if not our_ts:
+            continue
+
+        # Даты и calcs — один раз на ПЛ, не на каждую ТС
+        date_out_plan_str = pl.get('dateOutPlan', '')
+        date_in_plan_str  = pl.get('dateInPlan', '')
+        date_out_plan = _parse(date_out_plan_str)
+        date_in_plan  = _parse(date_in_plan_str)
+        if not date_out_plan or not date_in_plan:
+            continue
+        duration_h = (date_in_plan - date_out_plan).total_seconds() / 3600
+
+        # Номера заявок из calcs (dict как упорядоченное множество)
+        request_numbers = {}
+        object_expends  = {}
+        for calc in pl.get('calcs', []):
+            num = _extract(calc.get('orderDescr', ''))
+            if num:
+                request_numbers[num] = None
+            obj = calc.get('objectExpend', '')
+            if obj:
+                object_expends[obj] = None
+        request_numbers = list(request_numbers)
+        object_expends  = list(object_expends)
+
+        # Матчинг с заявками
+        matched_requests = []
+        for rnum in request_numbers:
+            req = req_by_number.get(rnum)
+            if req:
+                matched_requests.append({
+                    'number':       rnum,
+                    'status':       req.get('status', ''),
+                    'contactPerson': req.get('contactPerson', ''),
                 })
 
-    print(f"  Наших ПЛ: {len(our_pls)}")
+        for ts in our_ts:
+            id_mo = ts.get('idMO')
+            vehicle_info = _reg_get(id_mo)
+            our_pls_by_idmo[id_mo].append({
+                'pl_id':           pl.get('id'),
+                'ts_number':       pl.get('tsNumber'),
+                'pl_status':       pl.get('status'),
+                'id_mo':           id_mo,
+                'reg_number':      ts.get('regNumber', vehicle_info.get('regNumber', '')),
+                'name_mo':         ts.get('nameMO', ''),
+                'model':           vehicle_info.get('model', ''),
+                'branch':          vehicle_info.get('branch', ''),
+                'volume_m3':       vehicle_info.get('volumeM3'),
+                'weight_t':        vehicle_info.get('weightT'),
+                'date_out_plan':   date_out_plan,
+                'date_in_plan':    date_in_plan,
+                'date_out_plan_str': date_out_plan_str,
+                'date_in_plan_str':  date_in_plan_str,
+                'duration_h':      duration_h,
+                'date_out':        pl.get('dateOut', ''),
+                'request_numbers': request_numbers,
+                'object_expends':  object_expends,
+                'requests':        matched_requests,
+            })
 
-    # Группировка по машинам
-    by_vehicle = {}
-    for pl in our_pls:
-        idmo = pl['id_mo']
-        by_vehicle.setdefault(idmo, []).append(pl)
-    print(f"  Уникальных машин с ПЛ: {len(by_vehicle)}")
-    for idmo, pls in sorted(by_vehicle.items()):
+    ordered_idmos = sorted(our_pls_by_idmo)
+    print(f"  Наших ПЛ: {sum(len(pls) for pls in our_pls_by_idmo.values())}")
+    print(f"  Уникальных машин с ПЛ: {len(ordered_idmos)}")
+    for idmo in ordered_idmos:
+        pls = our_pls_by_idmo[idmo]
         r = pls[0]
         print(f"    idMO={idmo}  {r['reg_number']:12}  {len(pls)} ПЛ")
 
     # --- Сохраняем структуру ПЛ для просмотра ---
+    # Даты — исходные строки TIS, без обратного форматирования datetime
     pls_dump = []
-    for pl in our_pls:
-        pls_dump.append({**pl,
-            'date_out_plan': pl['date_out_plan'].strftime('%d.%m.%Y %H:%M'),
-            'date_in_plan':  pl['date_in_plan'].strftime('%d.%m.%Y %H:%M'),
-        })
-    with open(os.path.join(OUTPUT_DIR, 'our_pls.json'), 'w', encoding='utf-8') as f:
-        json.dump(pls_dump, f, ensure_ascii=False, indent=2)
+    for pl in (pl for idmo in ordered_idmos for pl in our_pls_by_idmo[idmo]):
+        row = dict(pl)
+        row['date_out_plan'] = row.pop('date_out_plan_str')
+        row['date_in_plan']  = row.pop('date_in_plan_str')
+        pls_dump.append(row)
+    write_json(os.path.join(OUTPUT_DIR, 'our_pls.json'), pls_dump)
     print(f"\n  ПЛ сохранены: output/our_pls.json")
 
     # --- Шаг 4: Мониторинг ---
     print(f"\n[Шаг 4] Загрузка мониторинга...")
-    print(f"  Машин для обработки: {len(by_vehicle)}")
-    print(f"  Ориентировочное время: {len(by_vehicle) * RATE_LIMIT_SEC // 60} мин (rate limit)")
+    print(f"  Машин для обработки: {len(ordered_idmos)}")
+    # Машины обрабатываются параллельно, по одной на токен
+    workers = max(1, len(tokens))
+    rounds = -(-len(ordered_idmos) // workers)
+    print(f"  Ориентировочное время: {rounds * RATE_LIMIT_SEC // 60} мин (rate limit, потоков: {workers})")
 
     trips_rows = []    # промежуточная таблица
     summary_rows = []  # финальная таблица
 
-    vehicle_count = 0
-    for idmo, pls in sorted(by_vehicle.items()):
-        vehicle_count += 1
-        pl = pls[0]  # берём первый ПЛ (или объединяем)
-        reg = pl['reg_number']
-        model = pl['model']
-        print(f"\n  [{vehicle_count}/{len(by_vehicle)}] idMO={idmo} {reg} ({model})")
-
-        # Используем период от начала первого ПЛ до конца последнего
-        all_starts = [p['date_out_plan'] for p in pls]
-        all_ends   = [p['date_in_plan']  for p in pls]
-        mon_from = min(all_starts)
-        mon_to   = max(all_ends)
-        print(f"    Период: {fmt_datetime(mon_from)} – {fmt_datetime(mon_to)}")
-
-        monitoring = tis.get_monitoring(idmo, mon_from, mon_to)
-        stats = analyze_track_simple(monitoring)
-        print(f"    Трек: {stats['track_points']} точек, {stats['engine_time_h']}ч, {stats['distance_km']}км, {stats['parkings_count']} остановок")
-
-        # Рейсы = остановки (parkings)
-        parkings = (monitoring or {}).get('parkings', []) or []
-        for i, park in enumerate(parkings, 1):
-            begin_dt = parse_date(park.get('begin', ''))
-            end_dt   = parse_date(park.get('end', ''))
-            dur_min  = round((end_dt - begin_dt).total_seconds() / 60) if begin_dt and end_dt else None
-            trips_rows.append({
-                'id_mo':           idmo,
-                'reg_number':      reg,
-                'model':           model,
-                'branch':          pl['branch'],
-                'volume_m3':       pl['volume_m3'],
-                'pl_date':         pl['date_out'],
-                'pl_status':       pl['pl_status'],
-                'request_numbers': '; '.join(str(n) for n in pl['request_numbers']),
-                'object_expend':   '; '.join(pl['object_expends']),
-                'parking_num':     i,
-                'parking_begin':   park.get('begin', ''),
-                'parking_end':     park.get('end', ''),
-                'parking_dur_min': dur_min,
-                'parking_address': park.get('address', ''),
-                'parking_lat':     park.get('lat', ''),
-                'parking_lon':     park.get('lon', ''),
-            })
-
-        # Все заявки через ПЛ
-        all_requests = []
-        all_req_nums = []
-        all_objects  = []
-        for p in pls:
-            all_req_nums.extend(p['request_numbers'])
-            all_objects.extend(p['object_expends'])
-            all_requests.extend(p['requests'])
-        all_req_nums = list(dict.fromkeys(all_req_nums))
-        all_objects  = list(dict.fromkeys(all_objects))
-
-        # KIP%
-        pl_duration_h = sum(
-            (p['date_in_plan'] - p['date_out_plan']).total_seconds() / 3600
-            for p in pls
-        )
-        kip_pct = round(stats['engine_time_h'] / pl_duration_h * 100, 1) if pl_duration_h > 0 else 0
-
-        summary_rows.append({
-            'id_mo':           idmo,
-            'reg_number':      reg,
-            'model':           model,
-            'branch':          pl['branch'],
-            'volume_m3':       pl['volume_m3'],
-            'weight_t':        pl['weight_t'],
-            'pl_count':        len(pls),
-            'pl_date_from':    fmt_date(min(all_starts)),
-            'pl_date_to':      fmt_date(max(all_ends)),
-            'pl_duration_h':   round(pl_duration_h, 1),
-            'engine_time_h':   stats['engine_time_h'],
-            'moving_time_h':   stats['moving_time_h'],
-            'distance_km':     stats['distance_km'],
-            'parkings_count':  stats['parkings_count'],
-            'kip_pct':         kip_pct,
-            'request_numbers': '; '.join(str(n) for n in all_req_nums),
-            'object_expend':   '; '.join(all_objects),
-        })
+    # Разные idMO независимы: параллелим по числу токенов,
+    # rate limit 31с действует только внутри одного idMO
+    total = len(ordered_idmos)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(process_vehicle, tis, idmo, our_pls_by_idmo[idmo], f"{n}/{total}", args.verbose)
+                for n, idmo in enumerate(ordered_idmos, 1)
+            ]
+            for fut in futures:
+                vehicle_trips, summary_row = fut.result()
+                trips_rows.extend(vehicle_trips)
+                summary_rows.append(summary_row)
+    finally:
+        # Кэш пишется один раз, в т.ч. при прерывании — загруженное не теряется
+        if cache is not None:
+            cache.save()
 
     # --- Шаг 5: Запись CSV ---
     trips_csv = os.path.join(OUTPUT_DIR, 'trips_raw.csv')
@@ -370,18 +560,20 @@ def main():
 
     if trips_rows:
         with open(trips_csv, 'w', newline='', encoding='utf-8-sig') as f:
-            w = csv.DictWriter(f, fieldnames=trips_rows[0].keys())
-            w.writeheader()
+            w = csv.writer(f)
+            w.writerow(TRIP_FIELDS)
             w.writerows(trips_rows)
         print(f"\n✅ trips_raw.csv: {len(trips_rows)} строк → {trips_csv}")
 
     if summary_rows:
         with open(summary_csv, 'w', newline='', encoding='utf-8-sig') as f:
-            w = csv.DictWriter(f, fieldnames=summary_rows[0].keys())
-            w.writeheader()
+            w = csv.writer(f)
+            w.writerow(SUMMARY_FIELDS)
             w.writerows(summary_rows)
         print(f"✅ summary.csv: {len(summary_rows)} строк → {summary_csv}")
 
+    tis.session.close()
+
     print(f"\n=== Готово ===")
     print(f"Машин обработано: {len(summary_rows)}")
     print(f"Всего остановок (потенц. рейсов): {len(trips_rows)}")
@@ -4,6 +4,7 @@ Usage: python3 import-dt-zones.py path/to/export.geojson
 """
 import json, sys, re, os
 import psycopg2
+from psycopg2.extras import execute_values
 
 GEOJSON_PATH = sys.argv[1] if len(sys.argv) > 1 else "export.geojson"
 
@@ -21,26 +22,44 @@ OBJECT_MAP = {
     "екатеринбург": {"id": 286, "uid": "ekaterinburg", "name": "Екатеринбург"},
 }
 
-def detect_object(zone_name: str):
-    name_lower = zone_name.lower()
-    for keyword, obj in OBJECT_MAP.items():
-        if keyword in name_lower:
-            return obj
-    return None
-
-def detect_tag(zone_name: str):
-    name_lower = zone_name.lower()
-    if "погрузка" in name_lower:
-        return "dt_loading"
-    if "выгрузка" in name_lower:
-        return "dt_unloading"
-    if "граница" in name_lower or "boundary" in name_lower:
-        return "dt_boundary"
-    return None
+# Ключевые слова тегов в порядке приоритета
+TAG_KEYWORDS = {
+    "погрузка": "dt_loading",
+    "выгрузка": "dt_unloading",
+    "граница": "dt_boundary",
+    "boundary": "dt_boundary",
+}
+
+def _alternation(keywords):
+    """Одна регулярка на все ключевые слова; группа kN ↔ N-е слово."""
+    return re.compile(
+        "|".join(f"(?P<k{i}>{re.escape(k)})" for i, k in enumerate(keywords))
+    )
+
+_OBJ_KEYS = list(OBJECT_MAP)
+_OBJ_RE = _alternation(_OBJ_KEYS)
+_TAG_KEYS = list(TAG_KEYWORDS)
+_TAG_RE = _alternation(_TAG_KEYS)
+
+def _first_keyword(regex, keys, name):
+    # При нескольких совпадениях побеждает слово, стоящее раньше в словаре
+    hits = {int(m.lastgroup[1:]) for m in regex.finditer(name)}
+    return keys[min(hits)] if hits else None
+
+# detect_* принимают уже приведённое к нижнему регистру имя (casefold)
+def detect_object(name_lower: str):
+    keyword = _first_keyword(_OBJ_RE, _OBJ_KEYS, name_lower)
+    return OBJECT_MAP[keyword] if keyword else None
+
+def detect_tag(name_lower: str):
+    keyword = _first_keyword(_TAG_RE, _TAG_KEYS, name_lower)
+    return TAG_KEYWORDS[keyword] if keyword else None
+
+_SLUG_RE = re.compile(r"[^a-zа-яё0-9]+")
 
 def slugify(s: str) -> str:
     s = s.lower().strip()
-    s = re.sub(r"[^a-zа-яё0-9]+", "-", s)
+    s = _SLUG_RE.sub("-", s)
     return s[:50].strip("-")
 
 def main():
@@ -52,14 +71,17 @@ def main():
 
     ok = 0
     skipped = 0
+    zones_batch = {}  # uid → (uid, object_id, name, geojson)
+    tags_batch = {}   # (uid, tag) → None
 
     for feat in fc["features"]:
         props = feat["properties"]
         zone_name = props.get("zoneName", "")
         geometry = feat["geometry"]
 
-        obj = detect_object(zone_name)
-        tag = detect_tag(zone_name)
+        name_lower = zone_name.casefold()
+        obj = detect_object(name_lower)
+        tag = detect_tag(name_lower)
 
         if not obj:
             print(f"  SKIP (no object match): {zone_name}")
@@ -73,31 +95,35 @@ def main():
         uid = "dt-" + slugify(zone_name)
         geojson_str = json.dumps(geometry)
 
-        # Upsert zone
-        cur.execute("""
+        # Один uid в одном INSERT ... ON CONFLICT DO UPDATE допустим лишь раз —
+        # повторная зона перезаписывает предыдущую, как и при построчном upsert
+        zones_batch[uid] = (uid, obj["id"], zone_name, geojson_str)
+        tags_batch[(uid, tag)] = None
+
+        print(f"  OK [{obj['name']}] [{tag}]: {zone_name}")
+        ok += 1
+
+    if zones_batch:
+        # Upsert zones — один запрос на весь пакет
+        rows = execute_values(cur, """
             INSERT INTO geo.zones (uid, object_id, name, geom)
-            VALUES (
-                %s, %s, %s,
-                ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326)
-            )
+            VALUES %s
             ON CONFLICT (uid) DO UPDATE SET
                 name = EXCLUDED.name,
                 geom = EXCLUDED.geom,
                 updated_at = now()
-            RETURNING id
-        """, (uid, obj["id"], zone_name, geojson_str))
-
-        zone_id = cur.fetchone()[0]
-
-        # Upsert tag
-        cur.execute("""
+            RETURNING uid, id
+        """, list(zones_batch.values()),
+            template="(%s, %s, %s, ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326))",
+            fetch=True)
+        uid_to_id = dict(rows)
+
+        # Upsert tags
+        execute_values(cur, """
             INSERT INTO geo.zone_tags (zone_id, tag)
-            VALUES (%s, %s)
+            VALUES %s
             ON CONFLICT DO NOTHING
-        """, (zone_id, tag))
-
-        print(f"  OK [{obj['name']}] [{tag}]: {zone_name}")
-        ok += 1
+        """, [(uid_to_id[uid], tag) for uid, tag in tags_batch])
 
     conn.commit()
     cur.close()
@@ -12,16 +12,17 @@ Transport Analytics Pipeline - Main Entry Point
 
 import sys
 import time
+import queue
+import atexit
 import logging
+import logging.handlers
 import argparse
 from pathlib import Path
 from datetime import datetime
+from types import SimpleNamespace
 
-import yaml
-import pandas as pd
-
-from src.parsers.request_parser import RequestParser
-from src.parsers.pl_parser import PLParser
+# pandas, yaml и парсеры импортируются внутри режимов: --web и --help
+# не должны платить за их загрузку
 
 
 def parse_args():
@@ -36,6 +37,7 @@ def parse_args():
   python main.py --fetch --from 01.01.2026 --to 15.01.2026  # загрузить из API
   python main.py --web                                  # запустить веб-сервер
   python main.py --web --port 3000                      # веб-сервер на порту 3000
+  python main.py --no-parallel                          # парсинг и HTML без отдельных процессов
         """
     )
 
@@ -141,6 +143,12 @@ def parse_args():
         help='Хост для веб-сервера (по умолчанию: 0.0.0.0)'
     )
 
+    parser.add_argument(
+        '--no-parallel',
+        action='store_true',
+        help='Парсить заявки и ПЛ и рендерить HTML последовательно, без отдельных процессов'
+    )
+
     return parser.parse_args()
 
 
@@ -210,116 +218,206 @@ def select_files_interactive(raw_dir: str) -> tuple:
     return str(requests_file), str(pl_file)
 
 
-def load_config(config_path: str = "config.yaml") -> dict:
-    """Загрузка конфигурации из YAML файла."""
+def _to_namespace(value):
+    """Рекурсивно dict → SimpleNamespace (списки обходятся поэлементно)."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+def load_config(config_path: str = "config.yaml") -> SimpleNamespace:
+    """
+    Загрузка конфигурации из YAML файла.
+
+    Разбирается один раз в дерево SimpleNamespace: config.paths.output.final
+    вместо config['paths']['output']['final'].
+    """
     config_file = Path(config_path)
     if not config_file.exists():
         raise FileNotFoundError(f"Файл конфигурации не найден: {config_path}")
 
+    import yaml
+
     with open(config_file, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+        return _to_namespace(yaml.safe_load(f))
 
 
-def setup_logging(config: dict) -> logging.Logger:
-    """Настройка логирования для main модуля."""
-    log_config = config['logging']
-    log_level = getattr(logging, log_config['level'])
+def setup_logging(config: SimpleNamespace) -> logging.Logger:
+    """
+    Настройка логирования для main модуля.
+
+    Логгер пишет только в очередь (QueueHandler); форматирование и вывод
+    в консоль/файл выполняет QueueListener в отдельном потоке.
+    """
+    log_config = config.logging
+    log_level = getattr(logging, log_config.level)
 
     logger = logging.getLogger('main')
     logger.setLevel(log_level)
+
+    # Повторная настройка: останавливаем прежний listener (он дописывает очередь)
+    listener = getattr(logger, '_queue_listener', None)
+    if listener is not None:
+        listener.stop()
     logger.handlers = []
 
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
+    handlers = []
 
-    if log_config['console']:
+    if log_config.console:
         console_handler = logging.StreamHandler()
         console_handler.setLevel(log_level)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
 
-    if log_config['file']:
-        log_dir = Path(config['paths']['output']['logs'])
+    if log_config.file:
+        log_dir = Path(config.paths.output.logs)
         log_dir.mkdir(parents=True, exist_ok=True)
 
         date_str = datetime.now().strftime('%Y-%m-%d')
-        log_file = log_dir / log_config['file_format'].replace('{date}', date_str)
+        log_file = log_dir / log_config.file_format.replace('{date}', date_str)
 
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
         file_handler.setLevel(log_level)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    logger._queue_listener = listener
+    if not getattr(logger, '_queue_atexit', False):
+        # Дописать очередь до выхода из процесса
+        atexit.register(lambda: logger._queue_listener.stop())
+        logger._queue_atexit = True
 
     return logger
 
 
-def run_matching(config: dict, logger: logging.Logger) -> dict:
+MATCH_CHUNK_ROWS = 2000
+
+
+def _stream_merge_to_csv(requests_df, pl_df, req_key: str, pl_key: str, path: Path,
+                         collect: bool = False) -> tuple:
+    """
+    Inner merge заявок и ПЛ с записью в CSV по частям.
+
+    Заявки режутся на блоки по MATCH_CHUNK_ROWS строк; каждый блок сливается
+    с ПЛ и сразу дописывается в файл, так что в памяти держится только
+    результат одного блока. Порядок строк совпадает с цельным pd.merge.
+
+    Args:
+        collect: Дополнительно собрать и вернуть весь результат в памяти
+
+    Returns:
+        (число записанных строк, DataFrame результата или None)
+    """
+    import pandas as pd
+    from src.utils.csv_io import TableWriter
+
+    def merge(left):
+        return pd.merge(left, pl_df, left_on=req_key, right_on=pl_key,
+                        how='inner', suffixes=('_req', '_pl'))
+
+    template = merge(requests_df.iloc[:0])
+    parts = []
+    with TableWriter(path, template, arrow_sources=[requests_df, pl_df]) as writer:
+        for start in range(0, len(requests_df), MATCH_CHUNK_ROWS):
+            part = merge(requests_df.iloc[start:start + MATCH_CHUNK_ROWS])
+            writer.write(part)
+            if collect:
+                parts.append(part)
+
+    if not collect:
+        return writer.rows, None
+    return writer.rows, pd.concat(parts or [template], ignore_index=True)
+
+
+def run_matching(config: SimpleNamespace, logger: logging.Logger, return_frames: bool = False):
     """
     Сопоставление заявок и путевых листов.
 
+    Args:
+        return_frames: Вернуть также полученные таблицы, чтобы не перечитывать CSV
+
     Returns:
-        dict со статистикой матчинга
+        dict со статистикой матчинга, либо при return_frames=True
+        (stats, matched_df, requests_unmatched, pl_unmatched)
     """
-    intermediate_dir = Path(config['paths']['output']['intermediate'])
-    output_dir = Path(config['paths']['output']['final'])
+    import pandas as pd
+    from src.utils.csv_io import read_csv, write_table
+
+    intermediate_dir = Path(config.paths.output.intermediate)
+    output_dir = Path(config.paths.output.final)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Загрузка данных
     logger.info("Загрузка промежуточных файлов...")
-    requests_df = pd.read_csv(intermediate_dir / 'requests_parsed.csv')
-    pl_df = pd.read_csv(intermediate_dir / 'pl_parsed.csv')
+    requests_df = read_csv(intermediate_dir / 'requests_parsed.csv')
+    pl_df = read_csv(intermediate_dir / 'pl_parsed.csv')
 
-    logger.info(f"  Заявок: {len(requests_df)}")
-    logger.info(f"  Записей ПЛ: {len(pl_df)}")
+    logger.info("  Заявок: %s", len(requests_df))
+    logger.info("  Записей ПЛ: %s", len(pl_df))
 
     # Ключи для сопоставления
     req_key = 'request_number'
     pl_key = 'extracted_request_number'
 
-    # Множества номеров для статистики
-    req_numbers = set(requests_df[req_key].dropna().astype(int))
-    pl_numbers = set(pl_df[pl_key].dropna().astype(int))
+    # Ключи приводятся к Int64 один раз: тот же массив идёт в merge, статистику
+    # и в итоговые файлы (номер заявки больше не пишется как 123.0)
+    requests_df[req_key] = req_keys = requests_df[req_key].astype('Int64')
+    pl_df[pl_key] = pl_keys = pl_df[pl_key].astype('Int64')
+
+    # Уникальные номера: и для статистики, и для разметки строк
+    req_numbers = pd.Index(req_keys.dropna().unique())
+    pl_numbers = pd.Index(pl_keys.dropna().unique())
+
+    # get_indexer использует хеш-таблицу, закешированную в самом Index: таблица
+    # pl_numbers строится один раз и служит и для статистики, и для разметки заявок
+    matched_numbers = int((pl_numbers.get_indexer(req_numbers) >= 0).sum())
 
-    matched_numbers = req_numbers & pl_numbers
-    req_only_numbers = req_numbers - pl_numbers
-    pl_only_numbers = pl_numbers - req_numbers
+    # Строки без номера сопоставляются между собой, как в pd.merge
+    req_has_pl = (pl_numbers.get_indexer(req_keys) >= 0) | (req_keys.isna().to_numpy() & pl_keys.hasnans)
+    pl_has_req = (req_numbers.get_indexer(pl_keys) >= 0) | (pl_keys.isna().to_numpy() & req_keys.hasnans)
 
     # 1. Matched: inner join
     logger.info("Создание matched.csv...")
-    matched_df = pd.merge(
-        requests_df,
-        pl_df,
-        left_on=req_key,
-        right_on=pl_key,
-        how='inner',
-        suffixes=('_req', '_pl')
+    matched_rows, matched_df = _stream_merge_to_csv(
+        requests_df[req_has_pl], pl_df[pl_has_req], req_key, pl_key,
+        output_dir / 'matched.csv', collect=return_frames
     )
-    matched_df.to_csv(output_dir / 'matched.csv', index=False)
 
     # 2. Requests without PL
     logger.info("Создание requests_unmatched.csv...")
-    requests_unmatched = requests_df[~requests_df[req_key].isin(pl_df[pl_key])]
-    requests_unmatched.to_csv(output_dir / 'requests_unmatched.csv', index=False)
+    requests_unmatched = requests_df[~req_has_pl]
+    write_table(requests_unmatched, output_dir / 'requests_unmatched.csv')
 
     # 3. PL without requests
     logger.info("Создание pl_unmatched.csv...")
-    pl_unmatched = pl_df[~pl_df[pl_key].isin(requests_df[req_key])]
-    pl_unmatched.to_csv(output_dir / 'pl_unmatched.csv', index=False)
+    pl_unmatched = pl_df[~pl_has_req]
+    write_table(pl_unmatched, output_dir / 'pl_unmatched.csv')
 
     stats = {
         'total_requests': len(requests_df),
         'total_pl_records': len(pl_df),
         'unique_request_numbers': len(req_numbers),
         'unique_pl_numbers': len(pl_numbers),
-        'matched_numbers': len(matched_numbers),
-        'matched_rows': len(matched_df),
-        'requests_only_numbers': len(req_only_numbers),
+        'matched_numbers': matched_numbers,
+        'matched_rows': matched_rows,
+        'requests_only_numbers': len(req_numbers) - matched_numbers,
         'requests_unmatched_rows': len(requests_unmatched),
-        'pl_only_numbers': len(pl_only_numbers),
+        'pl_only_numbers': len(pl_numbers) - matched_numbers,
         'pl_unmatched_rows': len(pl_unmatched),
     }
 
+    if return_frames:
+        return stats, matched_df, requests_unmatched, pl_unmatched
     return stats
 
 
@@ -351,11 +449,201 @@ def print_summary(stats: dict, elapsed: float):
     print("=" * 60)
 
 
+def explode_ts_ids(ts_id_mo):
+    """
+    Разбор колонки ts_id_mo ("123, 456") в длинную форму одним проходом.
+
+    Returns:
+        int64 Series: индекс — позиция исходной строки, значения — ts_id
+        в порядке следования внутри строки; нечисловые части отброшены
+    """
+    import pandas as pd
+
+    parts = (
+        pd.Series(ts_id_mo.to_numpy(), dtype='string')
+        .fillna('')
+        .str.replace(' ', '', regex=False)
+        .str.split(',')
+        .explode()
+    )
+    # как isdigit() в прежнем цикле, плюс id, записанные float-колонкой ("123.0")
+    parts = parts[parts.str.fullmatch(r'\d+(?:\.0+)?').fillna(False)]
+    return pd.to_numeric(parts).astype('int64')
+
+
+def _first_match_kernel():
+    """numba-ядро поиска мониторинга; None, если numba не установлена."""
+    try:
+        from src.utils.monitoring_kernel import first_match
+    except ImportError:
+        return None
+    return first_match
+
+
+def _match_monitoring_jit(kernel, pl_ids, ts_ids, mon_index) -> tuple:
+    """(позиции строк, позиции мониторинга) через numba-ядро."""
+    import numpy as np
+    import pandas as pd
+
+    mon_pl = mon_index.get_level_values('pl_id')
+    # pl_id — строка "tsNumber_dateOut": кодируем общим словарём кодов
+    codes, _ = pd.factorize(pd.concat([pd.Series(mon_pl), pl_ids], ignore_index=True))
+    mon_codes = codes[:len(mon_pl)].astype(np.int64)
+    row_codes = codes[len(mon_pl):].astype(np.int64)
+
+    mon_packed = (mon_codes << 32) | mon_index.get_level_values('ts_id').to_numpy(np.int64)
+    # ts_ids упорядочены по позиции строки → CSR-смещения
+    counts = np.bincount(ts_ids.index.to_numpy(), minlength=len(pl_ids))
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    out = kernel(row_codes, offsets, ts_ids.to_numpy(np.int64), mon_packed)
+    rows = np.flatnonzero(out >= 0)
+    return rows, out[rows]
+
+
+def _match_monitoring_index(pl_ids, ts_ids, mon_index) -> tuple:
+    """(позиции строк, позиции мониторинга) через хеш-поиск по MultiIndex."""
+    import numpy as np
+    import pandas as pd
+
+    long_rows = ts_ids.index.to_numpy()
+    keys = pd.MultiIndex.from_arrays([pl_ids.to_numpy()[long_rows], ts_ids.to_numpy()])
+    hit_pos = mon_index.get_indexer(keys)
+
+    found = hit_pos >= 0
+    long_rows, hit_pos = long_rows[found], hit_pos[found]
+    # long_rows отсортированы → return_index даёт первый подходящий ts_id в строке
+    rows, first = np.unique(long_rows, return_index=True)
+    return rows, hit_pos[first]
+
+
+def monitoring_to_frame(monitoring_results: dict):
+    """
+    Результаты мониторинга {(pl_id, ts_id): {...}} → DataFrame.
+
+    Индекс — MultiIndex (pl_id, ts_id) для векторного поиска; ключи
+    с нечисловым ts_id отбрасываются.
+    """
+    import pandas as pd
+
+    keys = pd.DataFrame(list(monitoring_results.keys()), columns=['pl_id', 'ts_id'])
+    keys['ts_id'] = pd.to_numeric(keys['ts_id'], errors='coerce')
+    valid = keys['ts_id'].notna().to_numpy()
+
+    mon_df = pd.DataFrame.from_records(list(monitoring_results.values()))[valid]
+    mon_df.index = pd.MultiIndex.from_frame(keys[valid].astype({'ts_id': 'int64'}))
+    return mon_df
+
+
+def attach_monitoring(matched_df, mon_df, monitoring_cols_csv: list) -> tuple:
+    """
+    Присоединение мониторинга к matched-строкам.
+
+    ts_id_mo может содержать несколько id через запятую: строка раскладывается
+    в длинную форму, и берётся первый ts_id, для которого есть мониторинг
+    по ключу (pl_id, ts_id).
+
+    Args:
+        matched_df: Сопоставленные строки (заявка + ПЛ + машина)
+        mon_df: Мониторинг из monitoring_to_frame()
+        monitoring_cols_csv: Плоские колонки мониторинга для CSV
+
+    Returns:
+        (matched_df с плоскими колонками мониторинга,
+         html_df — то же плюс остальные поля мониторинга включая массивы,
+         число строк с найденным мониторингом)
+    """
+    import numpy as np
+    import pandas as pd
+    from src.parsers.monitoring_parser import MONITORING_LIST_FIELDS
+
+    ts_ids = explode_ts_ids(matched_df['ts_id_mo'])
+    mon_ts = mon_df.index.get_level_values('ts_id')
+    kernel = _first_match_kernel()
+    if kernel is not None and ((mon_ts >= 0) & (mon_ts <= 0xFFFFFFFF)).all() and (
+        ts_ids.between(0, 0xFFFFFFFF).all()
+    ):
+        rows, positions = _match_monitoring_jit(kernel, matched_df['pl_id'], ts_ids, mon_df.index)
+    else:
+        rows, positions = _match_monitoring_index(matched_df['pl_id'], ts_ids, mon_df.index)
+
+    mon_hits = mon_df.iloc[positions].set_axis(matched_df.index[rows])
+
+    # HTML получает исходные значения мониторинга: object-колонки, чтобы NaN у строк
+    # без мониторинга не превращал int во float («Стоянок 3», а не «3.0»)
+    html_df = matched_df.drop(columns=monitoring_cols_csv, errors='ignore').join(mon_hits.astype(object))
+
+    # Плоские колонки для CSV — типизированный float64 (NaN по умолчанию), без object-боксинга
+    flat = np.full((len(matched_df), len(monitoring_cols_csv)), np.nan)
+    flat[rows] = (
+        mon_hits.reindex(columns=monitoring_cols_csv)
+        .apply(pd.to_numeric, errors='coerce')
+        .to_numpy(np.float64, na_value=np.nan)
+    )
+    matched_df = matched_df.copy()
+    matched_df[monitoring_cols_csv] = flat
+
+    # Строки без мониторинга: пустые массивы вместо NaN, как в _empty_monitoring()
+    for col in MONITORING_LIST_FIELDS:
+        if col in html_df.columns:
+            html_df[col] = [v if isinstance(v, list) else [] for v in html_df[col]]
+
+    return matched_df, html_df, len(rows)
+
+
+def _parse_requests(config_path: str, source) -> None:
+    """Парсинг заявок: source — путь к JSON или уже загруженные данные."""
+    from src.parsers.request_parser import RequestParser
+
+    parser = RequestParser(config_path)
+    if isinstance(source, dict):
+        parser.parse_obj(source)
+    else:
+        parser.input_path = source
+        parser.parse()
+
+
+def _parse_pl(config_path: str, source) -> None:
+    """Парсинг путевых листов: source — путь к JSON или уже загруженные данные."""
+    from src.parsers.pl_parser import PLParser
+
+    parser = PLParser(config_path)
+    if isinstance(source, dict):
+        parser.parse_obj(source)
+    else:
+        parser.input_path = source
+        parser.parse()
+
+
+def run_parsers(config_path: str, requests_source, pl_source, parallel: bool = True) -> None:
+    """
+    Парсинг заявок и ПЛ в requests_parsed.csv / pl_parsed.csv.
+
+    Этапы независимы, поэтому по умолчанию идут в двух процессах
+    (разбор JSON упирается в GIL).
+    """
+    if not parallel:
+        _parse_requests(config_path, requests_source)
+        _parse_pl(config_path, pl_source)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(_parse_requests, config_path, requests_source),
+            executor.submit(_parse_pl, config_path, pl_source),
+        ]
+        for future in futures:
+            future.result()
+
+
 def run_fetch_mode(args, config, logger):
     """Режим загрузки данных из API."""
     from src.api.fetcher import DataFetcher, fetch_data_interactive
     from src.parsers.monitoring_parser import parse_monitoring
     from src.output.html_generator_v2 import generate_html_report, build_hierarchy
+    from src.utils.csv_io import write_table
 
     # Support separate date ranges for requests and PL
     from_req = args.from_requests or args.from_date
@@ -396,18 +684,8 @@ def run_fetch_mode(args, config, logger):
     # 2. Парсинг
     print("\n[2/4] Парсинг данных...")
 
-    # Сохраняем временные файлы для парсеров (имена зависят от соответствующих периодов)
-    raw_dir = Path(config['paths']['input']['requests']).parent
-    requests_file = raw_dir / f"Requests_{from_req.replace('.', '-')}_{to_req.replace('.', '-')}.json"
-    pl_file = raw_dir / f"PL_{from_pl.replace('.', '-')}_{to_pl.replace('.', '-')}.json"
-
-    request_parser = RequestParser(args.config)
-    request_parser.input_path = str(requests_file)
-    request_parser.parse()
-
-    pl_parser = PLParser(args.config)
-    pl_parser.input_path = str(pl_file)
-    pl_parser.parse()
+    # Парсеры получают уже загруженные данные — без повторного чтения сохранённых JSON
+    run_parsers(args.config, requests_data, pl_data, parallel=not args.no_parallel)
 
     # 3. Извлечение задач мониторинга и запросы
     print("\n[3/4] Загрузка мониторинга...")
@@ -415,15 +693,15 @@ def run_fetch_mode(args, config, logger):
     print(f"    Найдено {len(monitoring_tasks)} комбинаций ПЛ+машина")
 
     monitoring_results = fetcher.fetch_monitoring_batch(monitoring_tasks)
+    mon_df = monitoring_to_frame(monitoring_results)
 
     # 4. Сопоставление и генерация отчётов
     print("\n[4/4] Генерация отчётов...")
 
-    stats = run_matching(config, logger)
+    stats, matched_df, _, _ = run_matching(config, logger, return_frames=True)
 
     # Добавляем мониторинг к matched данным
-    output_dir = Path(config['paths']['output']['final'])
-    matched_df = pd.read_csv(output_dir / 'matched.csv')
+    output_dir = Path(config.paths.output.final)
 
     # Колонки мониторинга для CSV (плоские поля)
     monitoring_cols_csv = [
@@ -432,52 +710,22 @@ def run_fetch_mode(args, config, logger):
         'mon_parkings_total_hours'
     ]
 
-    for col in monitoring_cols_csv:
-        matched_df[col] = None
-
-    # Для HTML нужны также массивы (parkings, fuels) - храним отдельно
-    html_records = []
-    matched_count = 0
-
-    for idx, row in matched_df.iterrows():
-        pl_id = row.get('pl_id')
-        ts_id_str = str(row.get('ts_id_mo', ''))
-
-        # Parse potentially comma-separated ts_id_mo
-        ts_ids = [int(x.strip()) for x in ts_id_str.split(',') if x.strip().isdigit()]
-
-        # Prepare record for HTML
-        record = row.to_dict()
-        mon_data_found = None
-
-        # Try each ts_id and use first match
-        for ts_id in ts_ids:
-            key = (pl_id, ts_id)
-            if key in monitoring_results:
-                mon_data_found = monitoring_results[key]
-                # Update CSV columns
-                for col in monitoring_cols_csv:
-                    if col in mon_data_found:
-                        matched_df.at[idx, col] = mon_data_found[col]
-                matched_count += 1
-                break
-
-        # Add monitoring to HTML record (including arrays)
-        if mon_data_found:
-            record.update(mon_data_found)
-        html_records.append(record)
+    # Для HTML нужны также массивы (parkings, fuels) - они попадают в html_df
+    matched_df, html_df, matched_count = attach_monitoring(
+        matched_df, mon_df, monitoring_cols_csv
+    )
 
     print(f"    Мониторинг добавлен к {matched_count} из {len(matched_df)} строк")
 
     # Сохраняем CSV (без массивов)
-    matched_df.to_csv(output_dir / 'matched_full.csv', index=False)
+    write_table(matched_df, output_dir / 'matched_full.csv')
 
     # Генерация HTML (с полными данными включая массивы)
     if not args.no_html:
         print("  Генерация HTML отчёта...")
 
         hierarchy = build_hierarchy(
-            html_records,
+            html_df,
             []  # Не включаем несопоставленные заявки
         )
 
@@ -485,7 +733,8 @@ def run_fetch_mode(args, config, logger):
         generate_html_report(
             hierarchy,
             str(html_path),
-            title=f"ПЛ {from_pl} — {to_pl}"
+            title=f"ПЛ {from_pl} — {to_pl}",
+            parallel=not args.no_parallel
         )
         print(f"    HTML: {html_path}")
 
@@ -494,41 +743,34 @@ def run_fetch_mode(args, config, logger):
 
 def run_local_mode(args, config, logger):
     """Режим работы с локальными файлами."""
+    from src.utils.csv_io import read_table
+
     # Определяем пути к файлам
     requests_path = args.requests
     pl_path = args.pl
 
     # Если файлы не указаны — интерактивный выбор
     if not requests_path or not pl_path:
-        raw_dir = Path(config['paths']['input']['requests']).parent
+        raw_dir = Path(config.paths.input.requests).parent
         requests_path, pl_path = select_files_interactive(str(raw_dir))
 
     # Сохраняем выбранные пути
-    config['paths']['input']['requests'] = requests_path
-    config['paths']['input']['pl'] = pl_path
-    logger.info(f"Файл заявок: {requests_path}")
-    logger.info(f"Файл ПЛ: {pl_path}")
+    config.paths.input.requests = requests_path
+    config.paths.input.pl = pl_path
+    logger.info("Файл заявок: %s", requests_path)
+    logger.info("Файл ПЛ: %s", pl_path)
 
     print(f"\n  Заявки: {Path(requests_path).name}")
     print(f"  ПЛ:     {Path(pl_path).name}")
-    print(f"  Вывод:  {config['paths']['output']['final']}")
-
-    # Парсинг заявок
-    print("\n[1/3] Парсинг заявок...")
-    request_parser = RequestParser(args.config)
-    request_parser.input_path = requests_path
-    request_parser.parse()
-    logger.info("Парсинг заявок завершён")
-
-    # Парсинг путевых листов
-    print("[2/3] Парсинг путевых листов...")
-    pl_parser = PLParser(args.config)
-    pl_parser.input_path = pl_path
-    pl_parser.parse()
-    logger.info("Парсинг ПЛ завершён")
+    print(f"  Вывод:  {config.paths.output.final}")
+
+    # Парсинг заявок и путевых листов
+    print("\n[1/2] Парсинг заявок и путевых листов...")
+    run_parsers(args.config, requests_path, pl_path, parallel=not args.no_parallel)
+    logger.info("Парсинг заявок и ПЛ завершён")
 
     # Сопоставление
-    print("[3/3] Сопоставление данных...")
+    print("[2/2] Сопоставление данных...")
     stats = run_matching(config, logger)
     logger.info("Сопоставление завершено")
 
@@ -537,24 +779,24 @@ def run_local_mode(args, config, logger):
         try:
             from src.output.html_generator_v2 import generate_html_report, build_hierarchy
 
-            output_dir = Path(config['paths']['output']['final'])
+            output_dir = Path(config.paths.output.final)
             # Use matched_full.csv which includes monitoring data
             matched_full_path = output_dir / 'matched_full.csv'
             if matched_full_path.exists():
-                matched_df = pd.read_csv(matched_full_path)
+                matched_df = read_table(matched_full_path)
             else:
-                matched_df = pd.read_csv(output_dir / 'matched.csv')
+                matched_df = read_table(output_dir / 'matched.csv')
 
             hierarchy = build_hierarchy(
-                matched_df.to_dict('records'),
+                matched_df,
                 []  # Не включаем несопоставленные заявки
             )
 
             html_path = output_dir / 'report.html'
-            generate_html_report(hierarchy, str(html_path))
+            generate_html_report(hierarchy, str(html_path), parallel=not args.no_parallel)
             print(f"\n  HTML отчёт: {html_path}")
         except Exception as e:
-            logger.warning(f"Не удалось создать HTML: {e}")
+            logger.warning("Не удалось создать HTML: %s", e)
 
     return stats
 
@@ -562,8 +804,9 @@ def run_local_mode(args, config, logger):
 def run_html_only_mode(args, config, logger):
     """Режим перегенерации только HTML из существующих CSV."""
     from src.output.html_generator_v2 import generate_html_report, build_hierarchy
+    from src.utils.csv_io import read_table
 
-    output_dir = Path(config['paths']['output']['final'])
+    output_dir = Path(config.paths.output.final)
 
     # Используем matched_full.csv если есть (с мониторингом), иначе matched.csv
     matched_full_path = output_dir / 'matched_full.csv'
@@ -571,10 +814,10 @@ def run_html_only_mode(args, config, logger):
 
     if matched_full_path.exists():
         csv_path = matched_full_path
-        logger.info(f"Используем {csv_path} (с данными мониторинга)")
+        logger.info("Используем %s (с данными мониторинга)", csv_path)
     elif matched_path.exists():
         csv_path = matched_path
-        logger.info(f"Используем {csv_path}")
+        logger.info("Используем %s", csv_path)
     else:
         raise FileNotFoundError(
             f"Не найдены CSV файлы: {matched_full_path} или {matched_path}\n"
@@ -584,26 +827,26 @@ def run_html_only_mode(args, config, logger):
     print(f"\n  Источник: {csv_path.name}")
 
     # Загружаем данные
-    matched_df = pd.read_csv(csv_path)
-    logger.info(f"Загружено {len(matched_df)} записей")
+    matched_df = read_table(csv_path)
+    logger.info("Загружено %s записей", len(matched_df))
 
     # Строим иерархию и генерируем HTML
     hierarchy = build_hierarchy(
-        matched_df.to_dict('records'),
+        matched_df,
         []  # Не включаем несопоставленные заявки
     )
 
     html_path = output_dir / 'report.html'
-    generate_html_report(hierarchy, str(html_path))
+    generate_html_report(hierarchy, str(html_path), parallel=not args.no_parallel)
 
     print(f"  HTML отчёт: {html_path}")
-    logger.info(f"HTML отчёт сгенерирован: {html_path}")
+    logger.info("HTML отчёт сгенерирован: %s", html_path)
 
     return {
         'total_requests': len(hierarchy),
         'total_pl_records': len(matched_df),
         'unique_request_numbers': len(hierarchy),
-        'unique_pl_numbers': len(set(matched_df.get('pl_id', []))),
+        'unique_pl_numbers': int(matched_df['pl_id'].nunique()) if 'pl_id' in matched_df.columns else 0,
         'matched_numbers': len(hierarchy),
         'matched_rows': len(matched_df),
         'requests_only_numbers': 0,
@@ -645,7 +888,7 @@ def main():
         logger.info("Конфигурация загружена")
 
         if args.output:
-            config['paths']['output']['final'] = args.output
+            config.paths.output.final = args.output
             Path(args.output).mkdir(parents=True, exist_ok=True)
 
         start_time = time.time()
@@ -665,9 +908,9 @@ def main():
         elapsed = time.time() - start_time
         print_summary(stats, elapsed)
 
-        logger.info(f"Пайплайн завершён успешно за {elapsed:.2f} сек")
+        logger.info("Пайплайн завершён успешно за %.2f сек", elapsed)
 
-        output_dir = config['paths']['output']['final']
+        output_dir = config.paths.output.final
         print(f"\nРезультаты сохранены в: {output_dir}")
 
         return 0
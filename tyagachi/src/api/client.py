@@ -4,16 +4,46 @@ API Client for TIS Online Transport Management System.
 Provides methods to fetch requests, route lists, and monitoring data.
 """
 
+import os
 import json
 import time
+import pickle
+import random
+import asyncio
 import logging
 from pathlib import Path
 from typing import Dict, Any, Optional
 from datetime import datetime
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import yaml
 
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as YamlLoader
+
+try:
+    import httpx
+except ImportError:  # httpx is optional, threaded fetch fallback
+    httpx = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json fallback
+    orjson = None
+
+
+# SystemRandom is safe to share between token worker threads
+_rng = random.SystemRandom()
+
+
+def _backoff(delay: float, cap: float) -> float:
+    """Full-jitter backoff: uniform in [0, min(cap, delay)], desynchronizes retrying workers."""
+    return _rng.uniform(0, min(cap, delay))
+
 
 class NotFoundError(Exception):
     """Raised when API returns 404 - resource not found (e.g., vehicle not in monitoring)."""
@@ -30,14 +60,25 @@ class APIClient:
     - getMonitoringStats: Vehicle monitoring data
     """
 
-    def __init__(self, config_path: str = "config.yaml"):
-        """Initialize API client with configuration."""
-        self.config = self._load_config(config_path)
+    def __init__(self, config_path: str = "config.yaml", *,
+                 config: Optional[Dict[str, Any]] = None,
+                 token: Optional[str] = None,
+                 session: Optional[requests.Session] = None):
+        """
+        Initialize API client with configuration.
+
+        Args:
+            config_path: Path to config.yaml (ignored if config is given)
+            config: Already loaded configuration dict
+            token: API token overriding api.token (per-token clients)
+            session: Shared session to reuse instead of creating one
+        """
+        self.config = config if config is not None else self._load_config(config_path)
         self._setup_logging()
 
         api_config = self.config.get('api', {})
         self.base_url = api_config.get('base_url', 'https://tt.tis-online.com/tt/api/v3')
-        self.token = api_config.get('token', '')
+        self.token = token or api_config.get('token', '')
         self.format = api_config.get('format', 'json')
         self.timeout = api_config.get('timeout', 30)
         self.retry_count = api_config.get('retry_count', 3)
@@ -45,16 +86,104 @@ class APIClient:
         if not self.token:
             raise ValueError("API token not configured. Add 'api.token' to config.yaml")
 
+        # Per-client constant part of every request's query string
+        self._base_params = {'token': self.token, 'format': self.format}
+
+        # A shared session belongs to its creator and is not closed here
+        self._owns_session = session is None
+        self.session = session or self._create_session(
+            len(api_config.get('tokens') or [self.token]), self.retry_count
+        )
+
         self.logger.info("APIClient initialized")
 
-    def _load_config(self, config_path: str) -> Dict[str, Any]:
-        """Load YAML configuration file."""
+    @staticmethod
+    def _create_session(pool_connections: int = 1, retry_count: int = 3) -> requests.Session:
+        """
+        Create a keep-alive session with a connection pool.
+
+        Reusing connections saves a TCP + TLS handshake on every request.
+        Connection errors, timeouts and 5xx responses are retried by urllib3
+        inside the adapter with exponential backoff.
+
+        Args:
+            pool_connections: Number of token clients sharing the host
+            retry_count: Total attempts per request
+
+        Returns:
+            Configured requests.Session
+        """
+        retry_kwargs = dict(
+            total=max(0, retry_count - 1),
+            backoff_factor=1.0,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=("POST",),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        try:
+            # urllib3 2.x: randomize delays so token workers don't retry in lockstep
+            retry = Retry(backoff_jitter=1.0, **retry_kwargs)
+        except TypeError:
+            retry = Retry(**retry_kwargs)
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=max(20, 4 * pool_connections),
+            max_retries=retry,
+        )
+        session.mount('https://', adapter)
+        session.headers.update({'Accept': 'application/json'})
+        return session
+
+    def close(self) -> None:
+        """Close pooled HTTP connections."""
+        if self._owns_session:
+            self.session.close()
+
+    def _load_config(self, config_path: str, ignore_cache: bool = False) -> Dict[str, Any]:
+        """
+        Load YAML configuration file.
+
+        The parsed dict is cached as a pickle next to the YAML file
+        (config.yaml.pkl) and reused while the YAML mtime is unchanged.
+
+        Args:
+            config_path: Path to config.yaml
+            ignore_cache: Always parse the YAML (the cache is still refreshed)
+
+        Returns:
+            Configuration dictionary
+        """
         config_file = Path(config_path)
         if not config_file.exists():
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
 
+        mtime = config_file.stat().st_mtime
+        cache_file = config_file.with_suffix(config_file.suffix + '.pkl')
+        if not ignore_cache and cache_file.exists():
+            try:
+                with open(cache_file, 'rb') as f:
+                    cached_mtime, cached = pickle.load(f)
+                if cached_mtime == mtime:
+                    return cached
+            except Exception:
+                pass  # Corrupt or foreign cache - reparse YAML
+
         with open(config_file, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+            config = yaml.load(f, Loader=YamlLoader)
+
+        # Write to a temp file and swap, so readers never see a partial cache
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'wb') as f:
+                pickle.dump((mtime, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            tmp_file.unlink(missing_ok=True)  # Read-only dir - run without cache
+
+        return config
 
     def _setup_logging(self):
         """Configure logging."""
@@ -67,27 +196,86 @@ class APIClient:
             self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
 
-    def _make_request(self, command: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _url_params(self, command: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Query parameters: client skeleton + command + call-specific params."""
+        url_params = self._base_params.copy()
+        url_params['command'] = command
+        url_params.update(params)
+        return url_params
+
+    def _make_request(self, command: str, params: Dict[str, Any], raw: bool = False) -> Any:
         """
         Make POST request to API.
 
         Args:
             command: API command (getRequests, getRouteLists, getMonitoringStats)
             params: Additional parameters for the command
+            raw: Return the undecoded response body (bytes)
 
         Returns:
-            JSON response as dictionary
+            JSON response as dictionary, or bytes if raw
         """
-        url_params = {
-            'token': self.token,
-            'format': self.format,
-            'command': command,
-            **params
-        }
+        url_params = self._url_params(command, params)
 
-        # Build URL with query parameters
-        param_str = '&'.join(f"{k}={v}" for k, v in url_params.items())
-        full_url = f"{self.base_url}?{param_str}"
+        rate_limit_retries = 0
+        max_rate_limit_retries = 5
+
+        # Retries and backoff for transient errors happen in the session adapter
+        while True:
+            try:
+                self.logger.debug("Request: %s", command)
+                response = self.session.post(self.base_url, params=url_params, timeout=self.timeout)
+
+                # 404 = vehicle not in monitoring system, skip immediately
+                if response.status_code == 404:
+                    raise NotFoundError(f"Resource not found: {command}")
+                # 429 = per-vehicle rate limit without Retry-After: wait longer
+                # than the adapter backoff would (doesn't count as attempt)
+                if response.status_code == 429:
+                    rate_limit_retries += 1
+                    if rate_limit_retries > max_rate_limit_retries:
+                        raise RuntimeError(f"Rate limited too many times for {command}")
+                    wait_time = _backoff(10 * 2 ** rate_limit_retries, cap=120)
+                    self.logger.warning("Rate limited, waiting %.1fs (retry %d/%d)...", wait_time, rate_limit_retries, max_rate_limit_retries)
+                    time.sleep(wait_time)
+                    continue
+                response.raise_for_status()
+
+                if raw:
+                    return response.content
+
+                # orjson parses the raw bytes, skipping the text decode
+                if orjson is not None:
+                    return orjson.loads(response.content)
+                return response.json()
+
+            except json.JSONDecodeError as e:
+                # orjson/requests JSONDecodeError subclass json.JSONDecodeError
+                self.logger.error("Invalid JSON response: %s", e)
+                raise RuntimeError(f"API request failed: Invalid JSON response: {e}") from e
+            except requests.exceptions.RequestException as e:
+                raise RuntimeError(f"API request failed after {self.retry_count} attempts: {e}") from e
+
+    async def _make_request_async(self, client: 'httpx.AsyncClient', command: str,
+                                  params: Dict[str, Any], raw: bool = False) -> Any:
+        """
+        Make POST request to API on a shared httpx.AsyncClient.
+
+        Async counterpart of _make_request with the same retry, 404 and
+        429 handling. The token is sent per request, so clients of all
+        tokens can share one (HTTP/2) connection.
+
+        Args:
+            client: Open httpx.AsyncClient
+            command: API command
+            params: Additional parameters for the command
+            raw: Return the undecoded response body (bytes)
+
+        Returns:
+            JSON response as dictionary, or bytes if raw
+        """
+        url_params = self._url_params(command, params)
+        loads = orjson.loads if orjson is not None else json.loads
 
         last_error = None
         attempt = 0
@@ -96,42 +284,43 @@ class APIClient:
 
         while attempt < self.retry_count:
             try:
-                self.logger.debug(f"Request attempt {attempt + 1}: {command}")
-                response = requests.post(full_url, timeout=self.timeout)
-                response.raise_for_status()
-
-                data = response.json()
-                return data
-
-            except requests.exceptions.HTTPError as e:
+                self.logger.debug("Async request attempt %d: %s", attempt + 1, command)
+                response = await client.post(self.base_url, params=url_params)
                 # 404 = vehicle not in monitoring system, skip immediately
-                if e.response is not None and e.response.status_code == 404:
+                if response.status_code == 404:
                     raise NotFoundError(f"Resource not found: {command}")
                 # 429 = rate limited, wait and retry (doesn't count as attempt)
-                if e.response is not None and e.response.status_code == 429:
+                if response.status_code == 429:
                     rate_limit_retries += 1
                     if rate_limit_retries > max_rate_limit_retries:
                         raise RuntimeError(f"Rate limited too many times for {command}")
-                    wait_time = 10 * rate_limit_retries
-                    self.logger.warning(f"Rate limited, waiting {wait_time}s (retry {rate_limit_retries}/{max_rate_limit_retries})...")
-                    time.sleep(wait_time)
+                    wait_time = _backoff(10 * 2 ** rate_limit_retries, cap=120)
+                    self.logger.warning("Rate limited, waiting %.1fs (retry %d/%d)...", wait_time, rate_limit_retries, max_rate_limit_retries)
+                    await asyncio.sleep(wait_time)
                     continue
+                response.raise_for_status()
+                if raw:
+                    return response.content
+                return loads(response.content)
+
+            except httpx.HTTPStatusError as e:
                 last_error = str(e)
-                self.logger.warning(f"HTTP error on attempt {attempt + 1}: {e}")
-            except requests.exceptions.Timeout:
+                self.logger.warning("HTTP error on attempt %d: %s", attempt + 1, e)
+            except httpx.TimeoutException:
                 last_error = "Request timeout"
-                self.logger.warning(f"Timeout on attempt {attempt + 1}")
-            except requests.exceptions.RequestException as e:
+                self.logger.warning("Timeout on attempt %d", attempt + 1)
+            except httpx.HTTPError as e:
                 last_error = str(e)
-                self.logger.warning(f"Request error on attempt {attempt + 1}: {e}")
-            except json.JSONDecodeError as e:
+                self.logger.warning("Request error on attempt %d: %s", attempt + 1, e)
+            except ValueError as e:
+                # json/orjson decode errors are ValueError subclasses
                 last_error = f"Invalid JSON response: {e}"
                 self.logger.error(last_error)
                 break
 
             attempt += 1
             if attempt < self.retry_count:
-                time.sleep(2 ** (attempt - 1))  # Exponential backoff
+                await asyncio.sleep(_backoff(2 ** attempt, cap=60))  # Exponential backoff, full jitter
 
         raise RuntimeError(f"API request failed after {self.retry_count} attempts: {last_error}")
 
@@ -146,7 +335,7 @@ class APIClient:
         Returns:
             JSON response with 'list' array of requests
         """
-        self.logger.info(f"Fetching requests: {from_date} - {to_date}")
+        self.logger.info("Fetching requests: %s - %s", from_date, to_date)
 
         params = {
             'fromDate': from_date,
@@ -156,7 +345,7 @@ class APIClient:
         data = self._make_request('getRequests', params)
 
         count = len(data.get('list', []))
-        self.logger.info(f"Fetched {count} requests")
+        self.logger.info("Fetched %d requests", count)
 
         return data
 
@@ -199,7 +388,7 @@ class APIClient:
         Returns:
             JSON response with 'list' array of route lists
         """
-        self.logger.info(f"Fetching route lists by DateOut: {from_date} - {to_date}")
+        self.logger.info("Fetching route lists by DateOut: %s - %s", from_date, to_date)
 
         params = {
             'fromDate': from_date,
@@ -209,7 +398,7 @@ class APIClient:
         data = self._make_request('getRouteListsByDateOut', params)
 
         count = len(data.get('list', []))
-        self.logger.info(f"Fetched {count} route lists (by DateOut)")
+        self.logger.info("Fetched %d route lists (by DateOut)", count)
 
         return data
 
@@ -232,7 +421,7 @@ class APIClient:
         Returns:
             JSON response with 'list' array of route lists
         """
-        self.logger.info(f"Fetching route lists (legacy): {from_date} - {to_date}")
+        self.logger.info("Fetching route lists (legacy): %s - %s", from_date, to_date)
 
         params = {
             'fromDate': from_date,
@@ -242,11 +431,11 @@ class APIClient:
         data = self._make_request('getRouteLists', params)
 
         count = len(data.get('list', []))
-        self.logger.info(f"Fetched {count} route lists (legacy method)")
+        self.logger.info("Fetched %d route lists (legacy method)", count)
 
         return data
 
-    def get_monitoring_stats(self, id_mo: int, from_date: str, to_date: str) -> Dict[str, Any]:
+    def get_monitoring_stats(self, id_mo: int, from_date: str, to_date: str, raw: bool = False) -> Any:
         """
         Fetch monitoring statistics for a vehicle.
 
@@ -254,11 +443,13 @@ class APIClient:
             id_mo: Monitoring object ID (vehicle ID)
             from_date: Start date/time (DD.MM.YYYY HH:MM)
             to_date: End date/time (DD.MM.YYYY HH:MM)
+            raw: Return the undecoded response body (bytes)
 
         Returns:
-            JSON response with monitoring data (distance, time, fuel, etc.)
+            JSON response with monitoring data (distance, time, fuel, etc.),
+            or bytes if raw
         """
-        self.logger.debug(f"Fetching monitoring for MO {id_mo}: {from_date} - {to_date}")
+        self.logger.debug("Fetching monitoring for MO %s: %s - %s", id_mo, from_date, to_date)
 
         params = {
             'idMO': id_mo,
@@ -266,16 +457,47 @@ class APIClient:
             'toDate': to_date
         }
 
-        data = self._make_request('getMonitoringStats', params)
+        data = self._make_request('getMonitoringStats', params, raw=raw)
 
         return data
 
+    async def get_monitoring_stats_async(self, client: 'httpx.AsyncClient', id_mo: int,
+                                         from_date: str, to_date: str, raw: bool = False) -> Any:
+        """
+        Fetch monitoring statistics for a vehicle on a shared httpx.AsyncClient.
+
+        Args:
+            client: Open httpx.AsyncClient
+            id_mo: Monitoring object ID (vehicle ID)
+            from_date: Start date/time (DD.MM.YYYY HH:MM)
+            to_date: End date/time (DD.MM.YYYY HH:MM)
+            raw: Return the undecoded response body (bytes)
+
+        Returns:
+            JSON response with monitoring data, or bytes if raw
+        """
+        self.logger.debug("Fetching monitoring for MO %s: %s - %s", id_mo, from_date, to_date)
+
+        params = {
+            'idMO': id_mo,
+            'fromDate': from_date,
+            'toDate': to_date
+        }
+
+        return await self._make_request_async(client, 'getMonitoringStats', params, raw=raw)
+
     def save_json(self, data: Dict[str, Any], filepath: str) -> None:
         """Save JSON data to file."""
         path = Path(filepath)
         path.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Serialize to bytes once and write in binary mode: no text-layer encode pass
+        if orjson is not None:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            payload = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+        with open(path, 'wb') as f:
+            f.write(payload)
 
-        self.logger.info(f"Saved: {filepath}")
+        self.logger.info("Saved: %s", filepath)
@@ -10,17 +10,76 @@ Workflow:
 Supports multiple API tokens for parallel requests.
 """
 
+import json
+import sqlite3
 import logging
+import importlib.util
 import time
-import yaml
+import asyncio
+import heapq
 from pathlib import Path
 from typing import Dict, Any, List, Tuple, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import defaultdict, deque
+from operator import itemgetter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json fallback
+    orjson = None
+
+try:
+    import httpx
+except ImportError:  # httpx is optional, threaded fetch fallback
+    httpx = None
+
+# HTTP/2 in httpx needs the h2 package; without it the pool speaks HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
 from src.api.client import APIClient, NotFoundError
-from src.parsers.monitoring_parser import parse_monitoring
+from src.parsers.monitoring_parser import parse_monitoring, parse_monitoring_bytes
+
+# API limit: 1 monitoring request per 30s per vehicle
+RATE_LIMIT_SECONDS = 30
+
+# Monitoring is fetched only for vehicles with this in nameMO (lowercase)
+TS_NAME_FILTER = 'тягач'
+
+# Required PL / vehicle fields for monitoring tasks, fetched in one C call
+_pl_fields = itemgetter('dateOutPlan', 'dateInPlan', 'ts')
+_ts_fields = itemgetter('nameMO', 'idMO')
+
+# Parsed monitoring of closed periods, reused across runs
+MONITORING_CACHE_PATH = Path('Data/cache/monitoring.sqlite')
+# Period counts as closed this long after its end: late GLONASS uploads settle
+MONITORING_CACHE_MIN_AGE = timedelta(days=1)
+
+_PERIOD_DATE_FORMATS = ('%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y')
+
+
+def _period_closed(to_date: str) -> bool:
+    """True if monitoring for a period ending at to_date can no longer change."""
+    for fmt in _PERIOD_DATE_FORMATS:
+        try:
+            end = datetime.strptime(to_date, fmt)
+        except (TypeError, ValueError):
+            continue
+        return end + MONITORING_CACHE_MIN_AGE < datetime.now()
+    return False
+
+
+def _json_dumps(data: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(raw: bytes) -> Dict[str, Any]:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 class DataFetcher:
@@ -44,15 +103,76 @@ class DataFetcher:
             self.logger.addHandler(handler)
 
         # Load additional tokens for parallel requests
-        self.tokens = self._load_tokens(config_path)
-        self.logger.info(f"Loaded {len(self.tokens)} API token(s)")
+        self.tokens = self._load_tokens()
+        self.logger.info("Loaded %d API token(s)", len(self.tokens))
+
+        # Parsed monitoring per (id_mo, from_date, to_date) for this run:
+        # PLs with the same vehicle and period share one request
+        self._mon_cache: Dict[Tuple[int, str, str], Dict] = {}
+        self._mon_cache_lock = threading.Lock()
+        # Persistent cache for closed periods, survives reruns
+        self._disk_cache = self._open_disk_cache(MONITORING_CACHE_PATH)
+
+    def _open_disk_cache(self, path: Path) -> Optional[sqlite3.Connection]:
+        """Open (create) SQLite monitoring cache; None if unavailable."""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS mon ("
+                "id_mo INTEGER, fd TEXT, td TEXT, json BLOB, "
+                "PRIMARY KEY (id_mo, fd, td))"
+            )
+            conn.commit()
+            return conn
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning("Monitoring disk cache disabled: %s", e)
+            return None
+
+    def _mon_cache_get(self, cache_key: Tuple[int, str, str]) -> Optional[Dict]:
+        """Return parsed monitoring fetched earlier in this run or, for closed periods, in earlier runs."""
+        with self._mon_cache_lock:
+            parsed = self._mon_cache.get(cache_key)
+            if parsed is None and self._disk_cache is not None and _period_closed(cache_key[2]):
+                try:
+                    row = self._disk_cache.execute(
+                        "SELECT json FROM mon WHERE id_mo = ? AND fd = ? AND td = ?", cache_key
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    self.logger.warning("Monitoring disk cache read failed: %s", e)
+                    row = None
+                if row is not None:
+                    parsed = _json_loads(row[0])
+                    self._mon_cache[cache_key] = parsed
+            return parsed
+
+    def _mon_cache_put(self, cache_key: Tuple[int, str, str], parsed: Dict, persist: bool = True) -> None:
+        """
+        Remember parsed monitoring (failed fetches are not cached).
 
-    def _load_tokens(self, config_path: str) -> List[str]:
-        """Load list of API tokens from config."""
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        Args:
+            cache_key: (id_mo, from_date, to_date)
+            parsed: Parsed monitoring data
+            persist: Also store on disk if the period is closed
+                (False for 404 - vehicle may be registered later)
+        """
+        with self._mon_cache_lock:
+            self._mon_cache[cache_key] = parsed
+            if persist and self._disk_cache is not None and _period_closed(cache_key[2]):
+                try:
+                    self._disk_cache.execute(
+                        "INSERT OR REPLACE INTO mon (id_mo, fd, td, json) VALUES (?, ?, ?, ?)",
+                        (*cache_key, _json_dumps(parsed)),
+                    )
+                    self._disk_cache.commit()
+                except sqlite3.Error as e:
+                    self.logger.warning("Monitoring disk cache write failed: %s", e)
 
-        api_config = config.get('api', {})
+    def _load_tokens(self) -> List[str]:
+        """Load list of API tokens from config already parsed by APIClient."""
+        api_config = self.client.config.get('api', {})
 
         # Try tokens list first, fallback to single token
         tokens = api_config.get('tokens', [])
@@ -123,37 +243,38 @@ class DataFetcher:
         tasks = []
 
         for pl in pl_data.get('list', []):
-            pl_id = f"{pl.get('tsNumber')}_{pl.get('dateOut')}"
-            date_out_plan = pl.get('dateOutPlan', '')
-            date_in_plan = pl.get('dateInPlan', '')
-
-            # Skip if no dates
-            if not date_out_plan or not date_in_plan:
+            # Plan dates and vehicles are required; a missing key skips the PL
+            try:
+                date_out_plan, date_in_plan, ts_list = _pl_fields(pl)
+            except (TypeError, KeyError):
                 continue
 
-            # Get vehicles from ts array
-            ts_list = pl.get('ts', [])
-            if not ts_list:
+            # Skip if no dates or no vehicles
+            if not date_out_plan or not date_in_plan or not ts_list:
                 continue
 
+            pl_id = None
             for ts in ts_list:
-                if not isinstance(ts, dict):
+                try:
+                    ts_name, ts_id_mo = _ts_fields(ts)
+                except (TypeError, KeyError):  # not a dict, or no name/id
                     continue
 
-                ts_id_mo = ts.get('idMO')
+                # Filter first: only vehicles with "тягач" in ts_name_mo
+                if TS_NAME_FILTER not in str(ts_name).lower():
+                    continue
                 if not ts_id_mo:
                     continue
 
-                # Filter: only vehicles with "Самосвал" or "тягач" in ts_name_mo
-                ts_name = str(ts.get('nameMO', '')).lower()
-                if 'тягач' not in ts_name:
-                    continue
-#'самосвал' not in ts_name and 
+                # Formatted once per PL, only when some vehicle passes
+                if pl_id is None:
+                    pl_id = f"{pl.get('tsNumber')}_{pl.get('dateOut')}"
+
                 tasks.append({
                     'pl_id': pl_id,
                     'ts_id_mo': ts_id_mo,
                     'ts_reg_number': ts.get('regNumber'),
-                    'ts_name_mo': ts.get('nameMO'),
+                    'ts_name_mo': ts_name,
                     'from_date': date_out_plan,
                     'to_date': date_in_plan,
                 })
@@ -177,6 +298,8 @@ class DataFetcher:
         # Use parallel fetching if multiple tokens available
         if len(self.tokens) > 1:
             print(f"  Загрузка мониторинга ({total} запросов) через {len(self.tokens)} токенов...")
+            if self._can_run_async():
+                return asyncio.run(self._fetch_monitoring_async(tasks, progress_callback))
             return self._fetch_monitoring_parallel(tasks, progress_callback)
 
         # Single token - use sequential fetching
@@ -188,9 +311,8 @@ class DataFetcher:
         results = {}
         total = len(tasks)
 
-        # Track last request time per vehicle (API limit: 1 request per 30s per vehicle)
+        # Track last request time per vehicle (monotonic clock, immune to NTP jumps)
         last_request_time: Dict[int, float] = {}
-        RATE_LIMIT_SECONDS = 30
 
         # Reorder tasks to minimize waiting: spread same vehicles apart
         tasks_sorted = self._reorder_tasks_for_rate_limit(tasks)
@@ -199,36 +321,43 @@ class DataFetcher:
             key = (task['pl_id'], task['ts_id_mo'])
             ts_id = task['ts_id_mo']
 
-            # Check if we need to wait for this vehicle
-            if ts_id in last_request_time:
-                elapsed = time.time() - last_request_time[ts_id]
-                if elapsed < RATE_LIMIT_SECONDS:
-                    wait_time = RATE_LIMIT_SECONDS - elapsed
-                    self.logger.debug(f"Waiting {wait_time:.1f}s for vehicle {ts_id}")
-                    time.sleep(wait_time)
+            cache_key = (ts_id, task['from_date'], task['to_date'])
 
-            try:
-                raw_data = self.client.get_monitoring_stats(
-                    id_mo=ts_id,
-                    from_date=task['from_date'],
-                    to_date=task['to_date']
-                )
+            # Same vehicle and period already fetched in this run: no request, no wait
+            parsed = self._mon_cache_get(cache_key)
+            if parsed is None:
+                # Check if we need to wait for this vehicle
+                if ts_id in last_request_time:
+                    elapsed = time.monotonic() - last_request_time[ts_id]
+                    if elapsed < RATE_LIMIT_SECONDS:
+                        wait_time = RATE_LIMIT_SECONDS - elapsed
+                        self.logger.debug("Waiting %.1fs for vehicle %s", wait_time, ts_id)
+                        time.sleep(wait_time)
 
-                # Record request time
-                last_request_time[ts_id] = time.time()
+                try:
+                    raw_data = self.client.get_monitoring_stats(
+                        id_mo=ts_id,
+                        from_date=task['from_date'],
+                        to_date=task['to_date']
+                    )
 
-                # Parse immediately, don't store raw
-                parsed = parse_monitoring(raw_data)
-                results[key] = parsed
+                    # Record request time
+                    last_request_time[ts_id] = time.monotonic()
 
-            except NotFoundError:
-                # Vehicle not registered in monitoring system - skip silently
-                last_request_time[ts_id] = time.time()
-                results[key] = parse_monitoring({})
-            except Exception as e:
-                self.logger.warning(f"Failed to fetch monitoring for {key}: {e}")
-                last_request_time[ts_id] = time.time()
-                results[key] = parse_monitoring({})
+                    # Parse immediately, don't store raw
+                    parsed = parse_monitoring(raw_data)
+                    self._mon_cache_put(cache_key, parsed)
+
+                except NotFoundError:
+                    # Vehicle not registered in monitoring system - skip silently
+                    last_request_time[ts_id] = time.monotonic()
+                    parsed = parse_monitoring({})
+                    self._mon_cache_put(cache_key, parsed, persist=False)
+                except Exception as e:
+                    self.logger.warning("Failed to fetch monitoring for %s: %s", key, e)
+                    last_request_time[ts_id] = time.monotonic()
+                    parsed = parse_monitoring({})
+            results[key] = parsed
 
             # Progress
             if progress_callback:
@@ -241,86 +370,222 @@ class DataFetcher:
     def _fetch_monitoring_parallel(self, tasks: List[Dict[str, Any]], progress_callback=None) -> Dict[str, Dict]:
         """
         Parallel fetching using multiple tokens.
-        Each token gets its own thread and rate-limit tracking.
+        Each token gets its own thread; per-vehicle rate limit is shared
+        across tokens.
         """
         results = {}
         total = len(tasks)
-        completed = [0]  # Use list for mutable counter in threads
+        self._done = 0  # Completed tasks, printed by the reporter thread
         lock = threading.Lock()
+        # ts_id -> monotonic time of the reserved request slot
+        self._vehicle_last: Dict[int, float] = {}
 
-        # Create API client for each token
-        clients = []
-        for token in self.tokens:
-            client = APIClient.__new__(APIClient)
-            client.base_url = self.client.base_url
-            client.token = token
-            client.format = self.client.format
-            client.timeout = self.client.timeout
-            client.retry_count = self.client.retry_count
-            client.logger = self.client.logger
-            clients.append(client)
-
-        # Distribute tasks across tokens (round-robin)
-        task_queues = [[] for _ in clients]
-        for i, task in enumerate(tasks):
-            task_queues[i % len(clients)].append(task)
+        clients = self._make_token_clients()
+        task_queues = self._distribute_tasks(tasks, len(clients))
 
         def worker(client_idx: int, client: APIClient, task_list: List[Dict]):
             """Worker function for each token."""
             local_results = {}
-            last_request_time: Dict[int, float] = {}
-            RATE_LIMIT_SECONDS = 30
 
             for task in task_list:
                 key = (task['pl_id'], task['ts_id_mo'])
                 ts_id = task['ts_id_mo']
 
-                # Rate limit per vehicle per token
-                if ts_id in last_request_time:
-                    elapsed = time.time() - last_request_time[ts_id]
-                    if elapsed < RATE_LIMIT_SECONDS:
-                        time.sleep(RATE_LIMIT_SECONDS - elapsed)
+                cache_key = (ts_id, task['from_date'], task['to_date'])
+
+                # Same vehicle and period already fetched in this run: no request, no wait
+                parsed = self._mon_cache_get(cache_key)
+                if parsed is None:
+                    # Rate limit per vehicle across all tokens: reserve the next
+                    # slot under the lock, sleep outside it
+                    with lock:
+                        now = time.monotonic()
+                        last = self._vehicle_last.get(ts_id, float('-inf'))
+                        wait = max(0.0, RATE_LIMIT_SECONDS - (now - last))
+                        self._vehicle_last[ts_id] = now + wait
+                    if wait:
+                        time.sleep(wait)
+
+                    try:
+                        raw_data = client.get_monitoring_stats(
+                            id_mo=ts_id,
+                            from_date=task['from_date'],
+                            to_date=task['to_date'],
+                            raw=True
+                        )
+                        # Decoded straight from bytes (orjson), in this thread: no process
+                        # pool inside the web server's background threads
+                        parsed = parse_monitoring_bytes(raw_data)
+                        self._mon_cache_put(cache_key, parsed)
+
+                    except NotFoundError:
+                        parsed = parse_monitoring({})
+                        self._mon_cache_put(cache_key, parsed, persist=False)
+                    except Exception as e:
+                        self.logger.warning("Token %d: Failed for %s: %s", client_idx, key, e)
+                        parsed = parse_monitoring({})
+                local_results[key] = parsed
+
+                # Update progress (reported by the reporter thread, no I/O under the lock)
+                with lock:
+                    self._done += 1
 
-                try:
-                    raw_data = client.get_monitoring_stats(
-                        id_mo=ts_id,
-                        from_date=task['from_date'],
-                        to_date=task['to_date']
-                    )
-                    last_request_time[ts_id] = time.time()
-                    local_results[key] = parse_monitoring(raw_data)
+            return local_results
 
-                except NotFoundError:
-                    last_request_time[ts_id] = time.time()
-                    local_results[key] = parse_monitoring({})
-                except Exception as e:
-                    self.logger.warning(f"Token {client_idx}: Failed for {key}: {e}")
-                    last_request_time[ts_id] = time.time()
-                    local_results[key] = parse_monitoring({})
+        stop_evt = threading.Event()
+        reported = 0
 
-                # Update progress
-                with lock:
-                    completed[0] += 1
-                    if completed[0] % 10 == 0 or completed[0] == total:
-                        print(f"    [{completed[0]}/{total}]")
-                        if progress_callback:
-                            progress_callback(completed[0], total)
+        def report():
+            nonlocal reported
+            done = self._done
+            if done != reported:
+                print(f"    [{done}/{total}]")
+                if progress_callback:
+                    progress_callback(done, total)
+                reported = done
 
-            return local_results
+        def reporter():
+            """Print progress every 0.5s instead of on every task."""
+            while not stop_evt.wait(0.5):
+                report()
 
         # Run workers in parallel
-        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
-            futures = [
-                executor.submit(worker, i, clients[i], task_queues[i])
-                for i in range(len(clients))
-            ]
+        reporter_thread = threading.Thread(target=reporter, daemon=True)
+        reporter_thread.start()
+        try:
+            with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+                futures = [
+                    executor.submit(worker, i, clients[i], task_queues[i])
+                    for i in range(len(clients))
+                ]
+
+                for future in as_completed(futures):
+                    try:
+                        local_results = future.result()
+                        results.update(local_results)
+                    except Exception as e:
+                        self.logger.error("Worker failed: %s", e)
+        finally:
+            stop_evt.set()
+            reporter_thread.join()
+            for client in clients:
+                client.close()
+
+        report()  # Final count after the reporter has stopped
+        return results
 
-            for future in as_completed(futures):
-                try:
-                    local_results = future.result()
-                    results.update(local_results)
-                except Exception as e:
-                    self.logger.error(f"Worker failed: {e}")
+    @staticmethod
+    def _can_run_async() -> bool:
+        """Check that httpx is installed and no event loop runs in this thread."""
+        if httpx is None:
+            return False
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return True
+        return False
+
+    def _make_token_clients(self) -> List[APIClient]:
+        """Create API client for each token."""
+        return [APIClient(config=self.client.config, token=token) for token in self.tokens]
+
+    @staticmethod
+    def _distribute_tasks(tasks: List[Dict[str, Any]], n: int) -> List[List[Dict[str, Any]]]:
+        """Distribute tasks across tokens (round-robin)."""
+        task_queues = [[] for _ in range(n)]
+        for i, task in enumerate(tasks):
+            task_queues[i % n].append(task)
+        return task_queues
+
+    async def _fetch_monitoring_async(self, tasks: List[Dict[str, Any]], progress_callback=None) -> Dict[str, Dict]:
+        """
+        Parallel fetching using multiple tokens on a single event loop.
+
+        All tokens share one httpx.AsyncClient: with HTTP/2 every in-flight
+        request is multiplexed over a single TLS connection. Requests for
+        the same vehicle are serialized by a per-vehicle lock that enforces
+        the 30s API limit.
+        """
+        results = {}
+        total = len(tasks)
+        completed = 0
+
+        clients = self._make_token_clients()
+        task_queues = self._distribute_tasks(tasks, len(clients))
+
+        # Shared by all tokens: a vehicle is limited whichever token calls it
+        vehicle_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        last_request_time: Dict[int, float] = {}
+
+        async def fetch_task(client_idx: int, client: APIClient, http, task: Dict):
+            nonlocal completed
+            key = (task['pl_id'], task['ts_id_mo'])
+            ts_id = task['ts_id_mo']
+
+            cache_key = (ts_id, task['from_date'], task['to_date'])
+
+            async with vehicle_locks[ts_id]:
+                # Same vehicle and period already fetched in this run: no request, no wait
+                # (checked under the vehicle lock, so a duplicate waits for the first fetch)
+                parsed = self._mon_cache_get(cache_key)
+                if parsed is None:
+                    # Rate limit per vehicle
+                    if ts_id in last_request_time:
+                        elapsed = time.monotonic() - last_request_time[ts_id]
+                        if elapsed < RATE_LIMIT_SECONDS:
+                            await asyncio.sleep(RATE_LIMIT_SECONDS - elapsed)
+
+                    try:
+                        # At most max_connections requests in flight: the rest wait
+                        # here rather than in the pool, where they would time out
+                        async with in_flight:
+                            raw_data = await client.get_monitoring_stats_async(
+                                http,
+                                id_mo=ts_id,
+                                from_date=task['from_date'],
+                                to_date=task['to_date'],
+                                raw=True
+                            )
+                        parsed = parse_monitoring_bytes(raw_data)
+                        self._mon_cache_put(cache_key, parsed)
+                    except NotFoundError:
+                        parsed = parse_monitoring({})
+                        self._mon_cache_put(cache_key, parsed, persist=False)
+                    except Exception as e:
+                        self.logger.warning("Token %d: Failed for %s: %s", client_idx, key, e)
+                        parsed = parse_monitoring({})
+                    last_request_time[ts_id] = time.monotonic()
+                results[key] = parsed
+
+            # Update progress
+            completed += 1
+            if completed % 10 == 0 or completed == total:
+                print(f"    [{completed}/{total}]")
+                if progress_callback:
+                    progress_callback(completed, total)
+
+        max_connections = len(clients) * 4
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        in_flight = asyncio.Semaphore(max_connections)
+        try:
+            async with httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                # No pool timeout: waiting for a free connection is not a failure
+                timeout=httpx.Timeout(self.client.timeout, pool=None),
+                limits=limits,
+                headers={'Accept': 'application/json'},
+            ) as http:
+                await asyncio.gather(*(
+                    fetch_task(i, clients[i], http, task)
+                    for i in range(len(clients))
+                    for task in task_queues[i]
+                ))
+        finally:
+            for client in clients:
+                client.close()
 
         return results
 
@@ -329,27 +594,29 @@ class DataFetcher:
         Reorder tasks to spread requests for same vehicle apart.
 
         This minimizes waiting time by ensuring we don't request the same
-        vehicle twice in a row.
+        vehicle twice in a row. A min-heap keyed by each vehicle's next
+        eligible time always picks the vehicle that unblocks soonest
+        (ties in first-seen order), O(N log V).
         """
         if not tasks:
             return tasks
 
-        # Group tasks by vehicle ID
-        by_vehicle: Dict[int, List[Dict]] = {}
+        # Group tasks by vehicle ID (insertion order = first-seen order)
+        by_vehicle: Dict[int, deque] = defaultdict(deque)
         for task in tasks:
-            ts_id = task['ts_id_mo']
-            if ts_id not in by_vehicle:
-                by_vehicle[ts_id] = []
-            by_vehicle[ts_id].append(task)
+            by_vehicle[task['ts_id_mo']].append(task)
 
-        # Interleave: take one from each vehicle in round-robin
-        result = []
-        vehicle_ids = list(by_vehicle.keys())
+        # Heap of (ready_time, first_seen_order, vehicle_id)
+        heap = [(0.0, order, vid) for order, vid in enumerate(by_vehicle)]
+        heapq.heapify(heap)
 
-        while any(by_vehicle.values()):
-            for vid in vehicle_ids:
-                if by_vehicle[vid]:
-                    result.append(by_vehicle[vid].pop(0))
+        result = []
+        while heap:
+            t_ready, order, vid = heapq.heappop(heap)
+            pending = by_vehicle[vid]
+            result.append(pending.popleft())
+            if pending:
+                heapq.heappush(heap, (t_ready + RATE_LIMIT_SECONDS, order, vid))
 
         return result
 
@@ -6,10 +6,72 @@ Request → Route Lists → Vehicles + Monitoring
 With search, sorting, and Plan/Fact comparison.
 """
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from html import escape
+from operator import itemgetter, methodcaller
 from pathlib import Path
-from typing import Dict, List, Any
-from datetime import datetime
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
 import json
+import math
+import os
+import re
+import shutil
+import threading
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json fallback
+    orjson = None
+
+# Rendered persistent reports keyed by (report_id, title, web_mode, link_css), reused only
+# for the same hierarchy object: the web server renders one hierarchy several times in a row
+# (current + history copy). Pages are stored with timestamp markers, filled in per write.
+_HTML_CACHE: "OrderedDict[tuple, Tuple[Dict[str, Any], str]]" = OrderedDict()
+_HTML_CACHE_SIZE = 8
+_HTML_CACHE_LOCK = threading.Lock()
+_STAMP_RE = re.compile('\x00([^\x00]*)\x00')
+
+# Rendered request records (card HTML + sort keys), reused across reports and runs.
+# Keys hash the request data with this module's source, so changed code never reuses old markup.
+# Each render version has its own subdirectory; older versions and entries not used
+# for REQUEST_CACHE_MAX_AGE are pruned once per process.
+# Anchored to the project root like the server's Data/ paths, independent of the working directory.
+REQUEST_CACHE_ROOT = Path(__file__).resolve().parent.parent.parent / 'Data' / 'cache' / 'reqhtml'
+REQUEST_CACHE_MAX_AGE = timedelta(days=30)
+_RECORD_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_RECORD_CACHE_SIZE = 4096
+_RECORD_CACHE_LOCK = threading.Lock()
+_RENDER_VERSION = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16).digest()
+REQUEST_CACHE_DIR = REQUEST_CACHE_ROOT / _RENDER_VERSION.hex()[:16]
+_REQUEST_CACHE_PRUNED = False
+
+# Shared immutable default for missing lists, and a C-level getter for PL vehicles
+_EMPTY: tuple = ()
+_pl_vehicles = methodcaller('get', 'vehicles', _EMPTY)
+
+# Above this many requests the request cards are rendered in a process pool (parallel=True only)
+PARALLEL_RENDER_MIN_REQUESTS = 500
+
+# Minification: line breaks with surrounding indentation collapse to a bare "\n"
+# (same rendering, inline spaces are kept); <style>/<script> bodies are left as is.
+_MINIFY_INDENT = re.compile(r'[ \t]*\n\s*')
+_MINIFY_RAW_BLOCK = re.compile(r'<(style|script)\b.*?</\1>', re.S | re.I)
+
+
+def _minify_html(html: str) -> str:
+    """Strip indentation and blank lines outside <style>/<script> blocks."""
+    out = []
+    pos = 0
+    for m in _MINIFY_RAW_BLOCK.finditer(html):
+        out.append(_MINIFY_INDENT.sub('\n', html[pos:m.start()]))
+        out.append(m.group())
+        pos = m.end()
+    out.append(_MINIFY_INDENT.sub('\n', html[pos:]))
+    return ''.join(out)
 
 
 def generate_html_report(
@@ -17,7 +79,9 @@ def generate_html_report(
     output_path: str,
     title: str = "Отчёт по заявкам и путевым листам",
     web_mode: bool = False,
-    report_id: int = None
+    report_id: Optional[int] = None,
+    link_css: bool = False,
+    parallel: bool = False
 ) -> str:
     """
     Generate HTML report from hierarchical data.
@@ -28,22 +92,35 @@ def generate_html_report(
         title: Report title
         web_mode: If True, add archive buttons and web features
         report_id: Optional report ID for shift loading
+        link_css: If True, link report.css instead of inlining it. Only for
+            pages served by a route that also serves report.css next to them
+        parallel: Render request cards of large reports in a process pool.
+            CLI only: the web server must not fork from its worker threads
 
     Returns:
         Path to generated file
     """
-    html = _build_html(hierarchy, title, web_mode=web_mode, report_id=report_id)
-
     path = Path(output_path)
     path.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    if report_id is not None:
+        # Persistent reports go through the render cache: one encode, one write
+        path.write_bytes(_build_html(hierarchy, title, web_mode=web_mode, report_id=report_id, link_css=link_css, parallel=parallel).encode('utf-8'))
+    else:
+        # Fragments are written as they are produced, the full page is never held in memory
+        with open(path, 'wb', buffering=1 << 20) as f:
+            f.writelines(chunk.encode('utf-8') for chunk in _iter_html(hierarchy, title, web_mode=web_mode, report_id=report_id, link_css=link_css, parallel=parallel))
 
     return str(path)
 
 
-def _format_pl_number(pl_id: str) -> str:
+# Addresses and cost objects repeat across requests: each distinct value is escaped once
+_escape_cached = lru_cache(maxsize=4096)(escape)
+
+
+# The same PL id is formatted several times per report (search text, headers, cards)
+@lru_cache(maxsize=4096)
+def _format_pl_number(pl_id: Any) -> str:
     """Format PL number: remove date part after underscore."""
     if not pl_id:
         return '—'
@@ -52,2216 +129,37 @@ def _format_pl_number(pl_id: str) -> str:
     return str(pl_id)
 
 
-def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, report_id: int = None) -> str:
-    """Build HTML string from hierarchy."""
-    from datetime import datetime
-    generated_at = datetime.now().strftime('%d.%m.%Y, %H:%M:%S')
-
-    # Statistics
-    total_requests = len(hierarchy)
-    total_pl = sum(len(req.get('pl_list', [])) for req in hierarchy.values())
-    total_vehicles = sum(
-        len(pl.get('vehicles', []))
-        for req in hierarchy.values()
-        for pl in req.get('pl_list', [])
-    )
-
-    # Collect unique values for filters
-    import math
-    start_addresses = set()
-    end_addresses = set()
-    cost_objects = set()
-
-    def is_valid_value(val):
-        if val is None or val == '' or val == '—':
-            return False
-        if isinstance(val, float) and math.isnan(val):
-            return False
-        return True
-
-    for req in hierarchy.values():
-        start_addr = req.get('route_start_address')
-        end_addr = req.get('route_end_address')
-        cost_obj = req.get('object_expend_name')
-        if is_valid_value(start_addr):
-            start_addresses.add(str(start_addr))
-        if is_valid_value(end_addr):
-            end_addresses.add(str(end_addr))
-        if is_valid_value(cost_obj):
-            cost_objects.add(str(cost_obj))
-
-    # Sort filter values
-    start_addresses = sorted(start_addresses)
-    end_addresses = sorted(end_addresses)
-    cost_objects = sorted(cost_objects)
-
-    # Sort by route_start_date
-    sorted_items = sorted(
-        hierarchy.items(),
-        key=lambda x: x[1].get('route_start_date', '') or '',
-        reverse=True
-    )
-
-    html = f"""<!DOCTYPE html>
+# Report skeleton, built once at import. The head takes the title via %-formatting;
+# the CSS is emitted verbatim, so no template ever scans it for placeholders.
+_REPORT_HEAD = """<!DOCTYPE html>
 <html lang="ru">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
+    <title>%s</title>
     <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" integrity="sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=" crossorigin=""/>
     <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js" integrity="sha256-20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=" crossorigin=""></script>
-    <style>
-        * {{ box-sizing: border-box; margin: 0; padding: 0; }}
-
-        body {{
-            font-family: system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            line-height: 1.5;
-            background: #f0f4f8;
-            color: #0f172a;
-        }}
-
-        /* Fixed Header */
-        .header {{
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            background: linear-gradient(135deg, #0B1120 0%, #111B2E 100%);
-            color: #F1F5F9;
-            padding: 12px 20px;
-            z-index: 1000;
-            box-shadow: 0 4px 16px rgba(0,0,0,0.25);
-            backdrop-filter: blur(16px);
-        }}
-
-        .header-content {{
-            max-width: 1920px;
-            margin: 0 auto;
-            display: flex;
-            align-items: center;
-            gap: 30px;
-            flex-wrap: wrap;
-        }}
-
-        .header h1 {{
-            font-size: 18px;
-            font-weight: 600;
-            white-space: nowrap;
-            color: #F1F5F9;
-        }}
-
-        .search-box {{
-            flex: 1;
-            min-width: 250px;
-            max-width: 400px;
-        }}
-
-        .search-box input {{
-            width: 100%;
-            padding: 8px 12px;
-            border: 1px solid rgba(255,255,255,0.07);
-            border-radius: 8px;
-            font-size: 14px;
-            background: rgba(255,255,255,0.07);
-            color: #F1F5F9;
-            transition: all 0.2s;
-        }}
-
-        .search-box input::placeholder {{
-            color: #64748B;
-        }}
-
-        .search-box input:focus {{
-            outline: none;
-            background: rgba(255,255,255,0.12);
-            border-color: #3b82f6;
-            box-shadow: 0 0 0 3px rgba(59,130,246,0.25);
-        }}
-
-        .header-stats {{
-            display: flex;
-            gap: 20px;
-            font-size: 13px;
-        }}
-
-        .header-stats span {{
-            color: #94A3B8;
-        }}
-
-        .header-stats strong {{
-            color: #f97316;
-        }}
-
-        /* Filter Panel */
-        .filter-panel {{
-            background: rgba(15,23,42,0.85);
-            padding: 12px 20px;
-            border-top: 1px solid rgba(255,255,255,0.07);
-        }}
-
-        .filter-panel-content {{
-            max-width: 1920px;
-            margin: 0 auto;
-            display: flex;
-            align-items: center;
-            gap: 15px;
-            flex-wrap: wrap;
-        }}
-
-        .filter-group {{
-            position: relative;
-        }}
-
-        .filter-label {{
-            font-size: 11px;
-            color: rgba(255,255,255,0.9);
-            margin-bottom: 4px;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }}
-
-        .filter-dropdown {{
-            position: relative;
-        }}
-
-        .filter-btn {{
-            background: rgba(255,255,255,0.07);
-            border: 1px solid rgba(255,255,255,0.07);
-            border-radius: 8px;
-            padding: 8px 12px;
-            color: #F1F5F9;
-            font-size: 13px;
-            cursor: pointer;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            min-width: 180px;
-            justify-content: space-between;
-            transition: all 0.2s;
-        }}
-
-        .filter-btn:hover {{
-            background: rgba(255,255,255,0.12);
-            border-color: rgba(255,255,255,0.15);
-        }}
-
-        .filter-btn .count {{
-            background: #f97316;
-            padding: 2px 6px;
-            border-radius: 10px;
-            font-size: 11px;
-        }}
-
-        .filter-popup {{
-            position: absolute;
-            top: 100%;
-            left: 0;
-            background: #ffffff;
-            border-radius: 12px;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.2);
-            border: 1px solid rgba(0,0,0,0.08);
-            min-width: 280px;
-            max-height: 350px;
-            z-index: 2000;
-            display: none;
-            overflow: hidden;
-        }}
-
-        .filter-popup.active {{
-            display: block;
-        }}
-
-        .filter-search {{
-            padding: 10px;
-            border-bottom: 1px solid #e2e8f0;
-        }}
-
-        .filter-search input {{
-            width: 100%;
-            padding: 8px 10px;
-            border: 1px solid #e2e8f0;
-            border-radius: 4px;
-            font-size: 13px;
-        }}
-
-        .filter-options {{
-            max-height: 250px;
-            overflow-y: auto;
-        }}
-
-        .filter-option {{
-            display: flex;
-            align-items: center;
-            padding: 8px 12px;
-            cursor: pointer;
-            font-size: 13px;
-            color: #2d3748;
-        }}
-
-        .filter-option:hover {{
-            background: #f7fafc;
-        }}
-
-        .filter-option input {{
-            margin-right: 10px;
-        }}
-
-        .filter-option.hidden {{
-            display: none;
-        }}
-
-        .filter-actions {{
-            padding: 10px;
-            border-top: 1px solid #e2e8f0;
-            display: flex;
-            gap: 8px;
-            flex-wrap: wrap;
-        }}
-
-        .filter-actions button {{
-            flex: 1;
-            padding: 6px 10px;
-            border: none;
-            border-radius: 4px;
-            font-size: 12px;
-            cursor: pointer;
-            min-width: 70px;
-        }}
-
-        .filter-actions .apply-btn {{
-            background: #f97316;
-            color: white;
-            border-radius: 6px;
-        }}
-
-        .filter-actions .clear-btn {{
-            background: #e2e8f0;
-            color: #475569;
-            border-radius: 6px;
-        }}
-
-        .filter-actions .select-all-btn {{
-            background: #22c55e;
-            color: white;
-            border-radius: 6px;
-        }}
-
-        .parking-time-filter {{
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }}
-
-        .parking-time-filter input {{
-            width: 70px;
-            padding: 8px 10px;
-            border: 1px solid rgba(255,255,255,0.07);
-            border-radius: 8px;
-            font-size: 13px;
-            background: rgba(255,255,255,0.07);
-            color: #F1F5F9;
-            text-align: center;
-            transition: all 0.2s;
-        }}
-
-        .parking-time-filter input:focus {{
-            outline: none;
-            border-color: #3b82f6;
-            box-shadow: 0 0 0 3px rgba(59,130,246,0.25);
-        }}
-
-        .parking-time-filter input::placeholder {{
-            color: #64748B;
-        }}
-
-        .parking-time-filter span {{
-            font-size: 13px;
-            color: rgba(255,255,255,0.92);
-        }}
-
-        /* Parking groups by day */
-        .parking-day-group {{
-            margin-bottom: 12px;
-        }}
-
-        .parking-day-header {{
-            font-size: 12px;
-            font-weight: 600;
-            color: #975a16;
-            background: #fef5e7;
-            padding: 6px 12px;
-            border-radius: 4px 4px 0 0;
-            border: 1px solid #fbd38d;
-            border-bottom: none;
-        }}
-
-        .parking-day-items {{
-            border: 1px solid #fbd38d;
-            border-radius: 0 0 4px 4px;
-        }}
-
-        .parking-item {{
-            background: #fffaf0;
-            border-bottom: 1px solid #fbd38d;
-            padding: 8px 12px;
-            font-size: 13px;
-        }}
-
-        .parking-item:last-child {{
-            border-bottom: none;
-            border-radius: 0 0 4px 4px;
-        }}
-
-        /* Main Content */
-        .container {{
-            max-width: 1920px;
-            margin: 0 auto;
-            padding: 140px 20px 40px;
-        }}
-
-        .sort-bar {{
-            display: flex;
-            gap: 10px;
-            margin-bottom: 20px;
-            align-items: center;
-        }}
-
-        .sort-bar label {{
-            font-size: 13px;
-            color: #475569;
-        }}
-
-        .sort-bar select {{
-            padding: 6px 10px;
-            border: 1px solid rgba(0,0,0,0.08);
-            border-radius: 8px;
-            font-size: 13px;
-            background: rgba(255,255,255,0.75);
-            color: #0f172a;
-            transition: border-color 0.2s;
-        }}
-
-        .sort-bar select:focus {{
-            outline: none;
-            border-color: #3b82f6;
-        }}
-
-        .results-info {{
-            font-size: 13px;
-            color: #475569;
-            margin-bottom: 15px;
-        }}
-
-        /* Request Card */
-        .request {{
-            background: rgba(255,255,255,0.75);
-            backdrop-filter: blur(16px);
-            -webkit-backdrop-filter: blur(16px);
-            border-radius: 16px;
-            margin-bottom: 16px;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.06);
-            border: 1px solid rgba(0,0,0,0.08);
-            overflow: hidden;
-            transition: box-shadow 0.2s;
-        }}
-
-        .request:hover {{
-            box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-        }}
-
-        .request.hidden {{
-            display: none;
-        }}
-
-        .request-header {{
-            background: linear-gradient(135deg, #0B1120 0%, #111B2E 100%);
-            color: #F1F5F9;
-            padding: 16px 20px;
-            cursor: pointer;
-            display: flex;
-            justify-content: space-between;
-            align-items: flex-start;
-            gap: 15px;
-            transition: background 0.2s;
-        }}
-
-        .request-header:hover {{
-            background: linear-gradient(135deg, #111B2E 0%, #162236 100%);
-        }}
-
-        .request-title {{
-            font-size: 16px;
-            font-weight: 600;
-            margin-bottom: 4px;
-        }}
-
-        .request-route {{
-            font-size: 13px;
-            opacity: 0.9;
-        }}
-
-        .request-badges {{
-            display: flex;
-            gap: 8px;
-            flex-shrink: 0;
-        }}
-
-        .badge {{
-            padding: 4px 10px;
-            border-radius: 12px;
-            font-size: 12px;
-            font-weight: 500;
-        }}
-
-        .badge-success {{ background: #22c55e; }}
-        .badge-info {{ background: #3b82f6; }}
-        .badge-warning {{ background: #f97316; }}
-
-        /* V2: Увеличенный хедер заявки */
-        .request-header-v2 {{
-            background: linear-gradient(135deg, #0B1120 0%, #111B2E 100%);
-            color: #F1F5F9;
-            padding: 16px 20px;
-            cursor: pointer;
-            transition: background 0.2s;
-        }}
-
-        .request-header-v2:hover {{
-            background: linear-gradient(135deg, #111B2E 0%, #162236 100%);
-        }}
-
-        .request-header-top {{
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 12px;
-        }}
-
-        .request-header-left {{
-            display: flex;
-            align-items: center;
-            gap: 16px;
-            flex: 1;
-        }}
-
-        .request-header-top .request-title {{
-            font-size: 16px;
-            font-weight: 600;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            flex-shrink: 0;
-        }}
-
-        .request-header-top .request-route {{
-            display: flex;
-            flex-direction: column;
-            gap: 2px;
-            font-size: 13px;
-            opacity: 0.95;
-            max-width: 450px;
-        }}
-
-        .route-line {{
-            display: flex;
-            align-items: center;
-            gap: 6px;
-            white-space: nowrap;
-            overflow: hidden;
-            text-overflow: ellipsis;
-        }}
-
-        .route-line .emoji {{
-            flex-shrink: 0;
-        }}
-
-        .route-line .addr {{
-            overflow: hidden;
-            text-overflow: ellipsis;
-        }}
-
-        .request-header-right {{
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            flex-shrink: 0;
-        }}
-
-        /* V2: Нижняя часть хедера - данные заявки */
-        .request-header-data {{
-            display: flex;
-            align-items: stretch;
-            gap: 16px;
-            padding-top: 12px;
-            border-top: 1px solid rgba(255,255,255,0.1);
-        }}
-
-        .header-data-main {{
-            display: flex;
-            flex-wrap: wrap;
-            gap: 12px 20px;
-            flex: 1;
-        }}
-
-        .header-data-item {{
-            display: flex;
-            flex-direction: column;
-        }}
-
-        .header-data-item .label {{
-            font-size: 11px;
-            color: rgba(255,255,255,0.92);
-            text-transform: uppercase;
-        }}
-
-        .header-data-item .value {{
-            font-size: 14px;
-            font-weight: 500;
-        }}
-
-        /* Период с округлёнными рамками и метками от/до */
-        .header-data-period {{
-            display: flex;
-            flex-direction: column;
-            gap: 4px;
-        }}
-
-        .period-row {{
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }}
-
-        .period-label {{
-            font-size: 10px;
-            text-transform: lowercase;
-            opacity: 0.92;
-            min-width: 18px;
-        }}
-
-        .period-date {{
-            background: rgba(255,255,255,0.08);
-            padding: 3px 10px;
-            border-radius: 12px;
-            font-size: 12px;
-            font-weight: 500;
-            border: 1px solid rgba(255,255,255,0.07);
-        }}
-
-        /* Груз с весом/объёмом справа от названия */
-        .header-data-cargo {{
-            flex-direction: row !important;
-            align-items: flex-start !important;
-            gap: 12px;
-        }}
-
-        .cargo-left {{
-            display: flex;
-            flex-direction: column;
-        }}
-
-        .cargo-left .label {{
-            font-size: 11px;
-            color: rgba(255,255,255,0.92);
-            text-transform: uppercase;
-        }}
-
-        .cargo-name {{
-            font-size: 14px;
-            font-weight: 500;
-            max-width: 180px;
-            line-height: 1.3;
-        }}
-
-        .cargo-details {{
-            display: flex;
-            flex-direction: column;
-            gap: 4px;
-            flex-shrink: 0;
-        }}
-
-        .cargo-detail {{
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }}
-
-        .cargo-detail .cargo-label {{
-            font-size: 12px;
-            opacity: 0.8;
-        }}
-
-        .cargo-detail .cargo-value {{
-            background: rgba(255,255,255,0.08);
-            padding: 3px 10px;
-            border-radius: 12px;
-            font-size: 12px;
-            font-weight: 500;
-            border: 1px solid rgba(255,255,255,0.07);
-        }}
-
-        /* Объект затрат - справа, 35%, с разделителем */
-        .header-data-cost {{
-            flex: 0 0 35%;
-            max-width: 35%;
-            padding-left: 16px;
-            border-left: 1px solid rgba(255,255,255,0.1);
-            display: flex;
-            flex-direction: column;
-            justify-content: center;
-        }}
-
-        .header-data-cost .label {{
-            font-size: 11px;
-            color: rgba(255,255,255,0.92);
-            text-transform: uppercase;
-            margin-bottom: 2px;
-        }}
-
-        .header-data-cost .value {{
-            font-size: 13px;
-            font-weight: 500;
-            line-height: 1.3;
-        }}
-
-        /* V2: Subheader - Расчёт план + ПЛ */
-        .request-subheader {{
-            padding: 12px 16px;
-            background: #f8fafc;
-            border-bottom: 1px solid #e2e8f0;
-            display: none;
-        }}
-
-        .request-subheader.active {{
-            display: flex;
-            gap: 24px;
-            flex-wrap: wrap;
-        }}
-
-        .subheader-section {{
-            flex: 1;
-            min-width: 280px;
-        }}
-
-        .subheader-section-header {{
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            cursor: pointer;
-            padding: 8px 0;
-        }}
-
-        .subheader-section-title {{
-            font-size: 13px;
-            font-weight: 600;
-            color: #2d3748;
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }}
-
-        .subheader-section-toggle {{
-            font-size: 11px;
-            color: #718096;
-        }}
-
-        .subheader-section-body {{
-            display: none;
-            padding-top: 8px;
-        }}
-
-        .subheader-section-body.active {{
-            display: block;
-        }}
-
-        /* Compact calc plan in subheader */
-        .subheader-calc-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(100px, 1fr));
-            gap: 8px;
-        }}
-
-        .subheader-calc-item {{
-            background: white;
-            padding: 6px 10px;
-            border-radius: 4px;
-            border: 1px solid #e9d8fd;
-        }}
-
-        .subheader-calc-item label {{
-            font-size: 10px;
-            color: #805ad5;
-            display: block;
-        }}
-
-        .subheader-calc-item input {{
-            width: 100%;
-            padding: 2px 4px;
-            border: 1px solid #d6bcfa;
-            border-radius: 3px;
-            font-size: 12px;
-        }}
-
-        .subheader-calc-results {{
-            display: flex;
-            gap: 16px;
-            margin-top: 8px;
-            flex-wrap: wrap;
-        }}
-
-        .subheader-calc-result {{
-            font-size: 12px;
-            color: #553c9a;
-        }}
-
-        .subheader-calc-result .val {{
-            font-weight: 600;
-        }}
-
-        /* Compact PL list in subheader */
-        .subheader-pl-list {{
-            display: flex;
-            gap: 8px;
-            flex-wrap: wrap;
-        }}
-
-        .subheader-pl-item {{
-            background: white;
-            border: 1px solid #e2e8f0;
-            border-radius: 6px;
-            padding: 6px 10px;
-            font-size: 12px;
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }}
-
-        .subheader-pl-dates {{
-            color: #718096;
-            font-size: 11px;
-        }}
-
-        .subheader-pl-vehicle {{
-            color: #4a5568;
-            font-weight: 500;
-            font-size: 11px;
-        }}
-
-        .subheader-pl-extra {{
-            color: #a0aec0;
-            font-size: 10px;
-        }}
-
-        .subheader-pl-number {{
-            font-weight: 600;
-            color: #2d3748;
-        }}
-
-        .subheader-pl-info {{
-            color: #718096;
-            font-size: 11px;
-        }}
-
-        .subheader-pl-vehicles {{
-            display: flex;
-            gap: 4px;
-            margin-left: 4px;
-        }}
-
-        .subheader-pl-vehicle-dot {{
-            width: 10px;
-            height: 10px;
-            border-radius: 50%;
-            border: 1px solid white;
-            box-shadow: 0 1px 2px rgba(0,0,0,0.2);
-        }}
-
-        /* Vehicle toggle bar - compact checkboxes above map */
-        .vehicle-toggle-bar {{
-            display: flex;
-            gap: 4px;
-            padding: 6px 10px;
-            background: #f0f4f8;
-            border-bottom: 1px solid #e2e8f0;
-        }}
-
-        .vehicle-toggle-item {{
-            display: flex;
-            align-items: center;
-            cursor: pointer;
-        }}
-
-        .vehicle-toggle-item input {{
-            display: none;
-        }}
-
-        .vehicle-toggle-dot {{
-            width: 20px;
-            height: 20px;
-            border-radius: 4px;
-            opacity: 1;
-            transition: opacity 0.2s;
-        }}
-
-        .vehicle-toggle-item input:not(:checked) + .vehicle-toggle-dot {{
-            opacity: 0.3;
-        }}
-
-        /* Timeline parking filter in header */
-        .timeline-parking-filter {{
-            display: flex;
-            align-items: center;
-            gap: 4px;
-            font-size: 11px;
-            color: #718096;
-        }}
-
-        .timeline-parking-filter label {{
-            display: flex;
-            align-items: center;
-            gap: 2px;
-            cursor: pointer;
-        }}
-
-        .timeline-parking-filter input[type="checkbox"] {{
-            margin: 0;
-        }}
-
-        .timeline-parking-filter input[type="number"] {{
-            width: 40px;
-            padding: 2px 4px;
-            border: 1px solid #e2e8f0;
-            border-radius: 3px;
-            font-size: 11px;
-        }}
-
-        /* V2: 2-колоночный layout (вместо 3) */
-        .request-body-layout-v2 {{
-            display: none;
-            grid-template-columns: 1fr 360px;
-            gap: 16px;
-            min-height: 600px;
-            padding: 16px;
-        }}
-
-        .request-body-layout-v2 .center-column {{
-            position: sticky;
-            top: 140px;
-            height: calc(100vh - 180px);
-            align-self: flex-start;
-            display: flex;
-            flex-direction: column;
-        }}
-
-        .request-body-layout-v2 .right-column {{
-            overflow-y: auto;
-            max-height: calc(100vh - 180px);
-            padding-left: 12px;
-        }}
-
-        .request-body-layout-v2 .map-container {{
-            display: flex !important;
-            flex-direction: column;
-            height: 100%;
-            margin: 0;
-        }}
-
-        .request-body-layout-v2 .map-layout {{
-            flex: 1;
-            min-height: 0;
-        }}
-
-        .request-body-layout-v2 .map-display-params {{
-            display: block !important;
-            margin-bottom: 8px;
-            background: white;
-            border-radius: 8px;
-            padding: 10px;
-        }}
-
-        @media (max-width: 992px) {{
-            .request-body-layout-v2 {{
-                grid-template-columns: 1fr;
-            }}
-
-            .request-body-layout-v2 .center-column {{
-                height: 500px;
-                position: static;
-            }}
-
-            .request-body-layout-v2 .right-column {{
-                max-height: none;
-            }}
-        }}
-
-        .request-body {{
-            padding: 20px;
-        }}
-
-        /* Plan Container */
-        .plan-section {{
-            background: #f7fafc;
-            border-radius: 8px;
-            padding: 16px;
-            margin-bottom: 16px;
-        }}
-
-        .section-title {{
-            font-size: 14px;
-            font-weight: 600;
-            color: #2d3748;
-            margin-bottom: 12px;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }}
-
-        .section-title::before {{
-            content: '';
-            width: 4px;
-            height: 16px;
-            background: #4299e1;
-            border-radius: 2px;
-        }}
-
-        .plan-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(180px, 1fr));
-            gap: 12px;
-        }}
-
-        .plan-item {{
-            background: white;
-            padding: 10px 12px;
-            border-radius: 6px;
-            border-left: 3px solid #4299e1;
-        }}
-
-        .plan-item .label {{
-            font-size: 11px;
-            color: #718096;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }}
-
-        .plan-item .value {{
-            font-size: 14px;
-            color: #1a202c;
-            font-weight: 500;
-            margin-top: 2px;
-        }}
-
-        /* Calculated Plan */
-        .calc-plan-section {{
-            background: linear-gradient(135deg, #faf5ff 0%, #f3e8ff 100%);
-            border: 1px solid #d6bcfa;
-            border-radius: 8px;
-            padding: 16px;
-            margin-bottom: 16px;
-        }}
-
-        .calc-plan-header {{
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 12px;
-            cursor: pointer;
-        }}
-
-        .calc-plan-title {{
-            font-size: 14px;
-            font-weight: 600;
-            color: #553c9a;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }}
-
-        .calc-plan-title::before {{
-            content: '';
-            width: 4px;
-            height: 16px;
-            background: #805ad5;
-            border-radius: 2px;
-        }}
-
-        .calc-plan-toggle {{
-            font-size: 12px;
-            color: #805ad5;
-        }}
-
-        .calc-plan-body {{
-            display: none;
-        }}
-
-        .calc-plan-body.active {{
-            display: block;
-        }}
-
-        .calc-plan-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(140px, 1fr));
-            gap: 10px;
-            margin-bottom: 12px;
-        }}
-
-        .calc-input-group {{
-            background: white;
-            padding: 8px 10px;
-            border-radius: 6px;
-            border: 1px solid #e9d8fd;
-        }}
-
-        .calc-input-group label {{
-            font-size: 11px;
-            color: #805ad5;
-            display: block;
-            margin-bottom: 4px;
-        }}
-
-        .calc-input-group input {{
-            width: 100%;
-            padding: 4px 6px;
-            border: 1px solid #d6bcfa;
-            border-radius: 4px;
-            font-size: 13px;
-            color: #553c9a;
-        }}
-
-        .calc-input-group input:focus {{
-            outline: none;
-            border-color: #805ad5;
-        }}
-
-        .calc-input-row {{
-            display: flex;
-            gap: 8px;
-            align-items: center;
-        }}
-
-        .calc-input-row input {{
-            width: 80px;
-        }}
-
-        .calc-results {{
-            background: white;
-            border-radius: 6px;
-            padding: 12px;
-            border: 1px solid #d6bcfa;
-        }}
-
-        .calc-results-title {{
-            font-size: 12px;
-            font-weight: 600;
-            color: #553c9a;
-            margin-bottom: 8px;
-        }}
-
-        .calc-result-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(180px, 1fr));
-            gap: 8px;
-        }}
-
-        .calc-result-item {{
-            display: flex;
-            justify-content: space-between;
-            font-size: 13px;
-            padding: 4px 0;
-            border-bottom: 1px dashed #e9d8fd;
-        }}
-
-        .calc-result-item:last-child {{
-            border-bottom: none;
-        }}
-
-        .calc-result-item .label {{
-            color: #718096;
-        }}
-
-        .calc-result-item .value {{
-            font-weight: 600;
-            color: #553c9a;
-        }}
-
-        .calc-result-item.highlight {{
-            background: #faf5ff;
-            padding: 6px 8px;
-            border-radius: 4px;
-            border: none;
-            margin-top: 4px;
-        }}
-
-        .calc-result-item.highlight .value {{
-            color: #38a169;
-            font-size: 14px;
-        }}
-
-        /* PL Card */
-        .pl-card {{
-            border: 1px solid #e2e8f0;
-            border-radius: 8px;
-            margin-bottom: 12px;
-            overflow: hidden;
-        }}
-
-        .pl-header {{
-            background: #edf2f7;
-            padding: 12px 16px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            cursor: pointer;
-        }}
-
-        .pl-header:hover {{
-            background: #e2e8f0;
-        }}
-
-        .pl-number {{
-            font-weight: 600;
-            color: #2d3748;
-        }}
-
-        .pl-meta {{
-            font-size: 13px;
-            color: #718096;
-        }}
-
-        .pl-body {{
-            padding: 16px;
-        }}
-
-        /* Vehicle/Fact Section */
-        .vehicle-card {{
-            background: #fff;
-            border: 1px solid #e2e8f0;
-            border-radius: 8px;
-            margin-bottom: 12px;
-            overflow: hidden;
-        }}
-
-        .vehicle-header {{
-            background: #f7fafc;
-            padding: 12px 16px;
-            border-bottom: 1px solid #e2e8f0;
-        }}
-
-        .vehicle-name {{
-            font-weight: 600;
-            color: #2d3748;
-        }}
-
-        .vehicle-reg {{
-            font-size: 13px;
-            color: #4a5568;
-            font-family: monospace;
-        }}
-
-        .fact-section {{
-            padding: 16px;
-        }}
-
-        .fact-title {{
-            font-size: 13px;
-            font-weight: 600;
-            color: #38a169;
-            margin-bottom: 10px;
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }}
-
-        .fact-title::before {{
-            content: '';
-            width: 4px;
-            height: 14px;
-            background: #38a169;
-            border-radius: 2px;
-        }}
-
-        .fact-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(140px, 1fr));
-            gap: 10px;
-            margin-bottom: 16px;
-        }}
-
-        .fact-item {{
-            background: #f0fff4;
-            padding: 8px 12px;
-            border-radius: 6px;
-            border-left: 3px solid #48bb78;
-        }}
-
-        .fact-item .label {{
-            font-size: 11px;
-            color: #276749;
-        }}
-
-        .fact-item .value {{
-            font-size: 14px;
-            font-weight: 600;
-            color: #22543d;
-        }}
-
-        /* Parkings */
-        .parkings-section {{
-            margin-top: 12px;
-        }}
-
-        .parkings-title {{
-            font-size: 12px;
-            font-weight: 600;
-            color: #744210;
-            margin-bottom: 8px;
-        }}
-
-        .parking-time {{
-            font-weight: 500;
-            color: #744210;
-        }}
-
-        .parking-address {{
-            color: #975a16;
-            font-size: 12px;
-            margin-top: 2px;
-        }}
-
-        /* Fuels */
-        .fuels-section {{
-            margin-top: 12px;
-        }}
-
-        .fuels-title {{
-            font-size: 12px;
-            font-weight: 600;
-            color: #553c9a;
-            margin-bottom: 8px;
-        }}
-
-        .fuel-item {{
-            background: #faf5ff;
-            border: 1px solid #d6bcfa;
-            border-radius: 4px;
-            padding: 8px 12px;
-            margin-bottom: 6px;
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(100px, 1fr));
-            gap: 8px;
-            font-size: 13px;
-        }}
-
-        .fuel-stat {{
-            text-align: center;
-        }}
-
-        .fuel-stat .label {{
-            font-size: 10px;
-            color: #805ad5;
-        }}
-
-        .fuel-stat .value {{
-            font-weight: 600;
-            color: #553c9a;
-        }}
-
-        /* No data */
-        .no-data {{
-            color: #a0aec0;
-            font-size: 13px;
-            font-style: italic;
-            padding: 10px;
-        }}
-
-        /* Copy button styles */
-        .copyable {{
-            cursor: pointer;
-            position: relative;
-            display: inline-flex;
-            align-items: center;
-            gap: 6px;
-        }}
-
-        .copyable:hover {{
-            opacity: 0.85;
-        }}
-
-        .copy-btn {{
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-            width: 22px;
-            height: 22px;
-            border: none;
-            background: rgba(255,255,255,0.2);
-            border-radius: 4px;
-            cursor: pointer;
-            font-size: 12px;
-            opacity: 0.7;
-            transition: opacity 0.2s, background 0.2s;
-        }}
-
-        .copy-btn:hover {{
-            opacity: 1;
-            background: rgba(255,255,255,0.35);
-        }}
-
-        .copy-btn.copied {{
-            background: #48bb78;
-            opacity: 1;
-        }}
-
-        .pl-header .copy-btn, .vehicle-header .copy-btn {{
-            background: rgba(0,0,0,0.08);
-        }}
-
-        .pl-header .copy-btn:hover, .vehicle-header .copy-btn:hover {{
-            background: rgba(0,0,0,0.15);
-        }}
-
-        /* Expand/collapse arrow indicators */
-        .expand-arrow {{
-            display: inline-block;
-            width: 16px;
-            height: 16px;
-            text-align: center;
-            font-size: 10px;
-            transition: transform 0.2s;
-            color: rgba(255,255,255,0.7);
-        }}
-
-        .expand-arrow.down {{
-            transform: rotate(0deg);
-        }}
-
-        .expand-arrow.up {{
-            transform: rotate(180deg);
-        }}
-
-        .pl-header .expand-arrow, .vehicle-header .expand-arrow {{
-            color: #718096;
-        }}
-
-        /* Timezone tag style */
-        .timezone-tag {{
-            font-size: 11px;
-            background: rgba(255,255,255,0.2);
-            padding: 2px 8px;
-            border-radius: 10px;
-            margin-left: 10px;
-            font-weight: normal;
-        }}
-
-        /* Footer */
-        .footer {{
-            text-align: center;
-            padding: 30px;
-            color: #a0aec0;
-            font-size: 12px;
-        }}
-
-        /* Responsive */
-        @media (max-width: 768px) {{
-            .header-content {{
-                flex-direction: column;
-                gap: 10px;
-            }}
-            .search-box {{
-                max-width: 100%;
-            }}
-            .header-stats {{
-                flex-wrap: wrap;
-                gap: 10px;
-            }}
-        }}
-
-        /* Map styles */
-        .map-container {{
-            display: none;
-            height: 450px;
-            margin: 12px 0;
-            border-radius: 8px;
-            overflow: hidden;
-            border: 1px solid #e2e8f0;
-        }}
-
-        .map-container.active {{
-            display: block;
-        }}
-
-        .leaflet-map {{
-            height: 100%;
-            width: 100%;
-            border-radius: 8px;
-        }}
-
-        .map-toggle-btn {{
-            background: linear-gradient(135deg, #38a169 0%, #2f855a 100%);
-            color: white;
-            border: none;
-            padding: 8px 16px;
-            border-radius: 6px;
-            cursor: pointer;
-            font-size: 13px;
-            font-weight: 500;
-            display: inline-flex;
-            align-items: center;
-            gap: 6px;
-            margin-top: 12px;
-            transition: transform 0.1s, box-shadow 0.1s;
-        }}
-
-        .map-toggle-btn:hover {{
-            transform: translateY(-1px);
-            box-shadow: 0 2px 8px rgba(56, 161, 105, 0.3);
-        }}
-
-        .map-toggle-btn.active {{
-            background: linear-gradient(135deg, #e53e3e 0%, #c53030 100%);
-        }}
-
-        .map-legend {{
-            background: white;
-            padding: 8px 12px;
-            border-radius: 6px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.15);
-            font-size: 12px;
-            line-height: 1.6;
-        }}
-
-        .map-legend-item {{
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }}
-
-        .map-legend-line {{
-            width: 20px;
-            height: 3px;
-            border-radius: 2px;
-        }}
-
-        .map-legend-marker {{
-            width: 12px;
-            height: 12px;
-            border-radius: 50%;
-        }}
-
-        /* Map display params panel */
-        .map-display-params {{
-            display: none;
-            background: #f7fafc;
-            border: 1px solid #e2e8f0;
-            border-radius: 8px;
-            padding: 12px;
-            margin: 10px 0;
-        }}
-
-        .map-display-params.active {{
-            display: block;
-        }}
-
-        .params-title {{
-            font-weight: 600;
-            font-size: 13px;
-            color: #2d3748;
-            margin-bottom: 10px;
-        }}
-
-        .filter-group {{
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            margin-bottom: 8px;
-            flex-wrap: wrap;
-        }}
-
-        .filter-label {{
-            font-size: 12px;
-            color: #4a5568;
-            min-width: 140px;
-        }}
-
-        .filter-checkbox {{
-            display: inline-flex;
-            align-items: center;
-            gap: 4px;
-            padding: 4px 8px;
-            background: white;
-            border: 1px solid #e2e8f0;
-            border-radius: 4px;
-            font-size: 12px;
-            cursor: pointer;
-            transition: all 0.15s;
-        }}
-
-        .filter-checkbox:hover {{
-            border-color: #cbd5e0;
-            background: #edf2f7;
-        }}
-
-        .filter-checkbox input {{
-            margin: 0;
-        }}
-
-        .filter-checkbox .color-dot {{
-            width: 10px;
-            height: 10px;
-            border-radius: 50%;
-        }}
-
-        .map-display-params input[type="number"] {{
-            width: 70px;
-            padding: 4px 8px;
-            border: 1px solid #e2e8f0;
-            border-radius: 4px;
-            font-size: 12px;
-        }}
-
-        /* Map layout with timeline */
-        .map-layout {{
-            display: flex;
-            height: 100%;
-        }}
-
-        .map-area {{
-            flex: 1;
-            min-width: 0;
-            height: 100%;
-        }}
-
-        .map-area .leaflet-map {{
-            height: 100%;
-            width: 100%;
-            border-radius: 8px 0 0 8px;
-        }}
-
-        .timeline-area {{
-            width: 280px;
-            height: 100%;
-            border-left: 1px solid #e2e8f0;
-            overflow-y: auto;
-            background: #fafafa;
-            flex-shrink: 0;
-        }}
-
-        .timeline-header {{
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 8px 12px;
-            background: #edf2f7;
-            border-bottom: 1px solid #e2e8f0;
-            position: sticky;
-            top: 0;
-            z-index: 1;
-        }}
-
-        .timeline-title {{
-            font-weight: 600;
-            font-size: 12px;
-            margin: 0;
-        }}
-
-        .timeline-expand-btn {{
-            background: none;
-            border: 1px solid #cbd5e0;
-            border-radius: 4px;
-            padding: 2px 8px;
-            font-size: 10px;
-            cursor: pointer;
-            color: #4a5568;
-        }}
-
-        .timeline-expand-btn:hover {{
-            background: #e2e8f0;
-        }}
-
-        .timeline-items {{
-            padding: 0;
-        }}
-
-        .timeline-vehicle-group {{
-            border-bottom: 1px solid #e2e8f0;
-        }}
-
-        .timeline-vehicle-header {{
-            font-weight: 600;
-            font-size: 11px;
-            padding: 8px 12px;
-            background: #edf2f7;
-            border-left: 4px solid #48bb78;
-            color: #2d3748;
-        }}
-
-        .timeline-item {{
-            padding: 6px 12px;
-            border-bottom: 1px solid #f0f0f0;
-            cursor: pointer;
-            font-size: 11px;
-            transition: background 0.15s;
-        }}
-
-        .timeline-item:hover {{
-            background: #edf2f7;
-        }}
-
-        .timeline-item.parking {{
-            background: #fffaf0;
-            border-left: 3px solid #ed8936;
-        }}
-
-        .timeline-item.point {{
-            border-left: 3px solid #48bb78;
-        }}
-
-        .timeline-item .time {{
-            font-weight: 600;
-            color: #2d3748;
-        }}
-
-        .timeline-item .info {{
-            color: #718096;
-            font-size: 10px;
-            margin-top: 2px;
-        }}
-
-        .timeline-item .info.address {{
-            white-space: nowrap;
-            overflow: hidden;
-            text-overflow: ellipsis;
-            max-width: 180px;
-        }}
-
-        /* Collapsed timeline - hide addresses */
-        .timeline-area.collapsed .timeline-item .info.address {{
-            display: none;
-        }}
-
-        /* Archive button styles */
-        .archive-btn {{
-            background: linear-gradient(135deg, #ed8936 0%, #dd6b20 100%);
-            color: white;
-            border: none;
-            padding: 6px 12px;
-            border-radius: 6px;
-            cursor: pointer;
-            font-size: 12px;
-            font-weight: 500;
-            display: inline-flex;
-            align-items: center;
-            gap: 4px;
-            transition: all 0.2s;
-            margin-left: 8px;
-        }}
-
-        .archive-btn:hover {{
-            transform: translateY(-1px);
-            box-shadow: 0 2px 8px rgba(237, 137, 54, 0.3);
-        }}
-
-        .archive-btn.archived {{
-            background: linear-gradient(135deg, #48bb78 0%, #38a169 100%);
-        }}
-
-        .archive-btn.archived:hover {{
-            box-shadow: 0 2px 8px rgba(72, 187, 120, 0.3);
-        }}
-
-        .request.is-archived {{
-            opacity: 0.6;
-        }}
-
-        .request.is-archived .request-header {{
-            background: linear-gradient(135deg, #718096 0%, #4a5568 100%);
-        }}
-
-        /* Hide archived filter */
-        .hide-archived-toggle {{
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            font-size: 13px;
-            color: rgba(255,255,255,0.8);
-        }}
-
-        .hide-archived-toggle input {{
-            width: 16px;
-            height: 16px;
-            cursor: pointer;
-        }}
-
-        /* Day navigation tabs */
-        .day-nav {{
-            display: flex;
-            gap: 4px;
-            margin-bottom: 12px;
-            flex-wrap: wrap;
-            background: #f7fafc;
-            padding: 8px;
-            border-radius: 8px;
-        }}
-
-        .day-nav-btn {{
-            padding: 6px 12px;
-            border: 1px solid #e2e8f0;
-            background: white;
-            border-radius: 6px;
-            cursor: pointer;
-            font-size: 12px;
-            font-weight: 500;
-            color: #4a5568;
-            transition: all 0.2s;
-        }}
-
-        .day-nav-btn:hover {{
-            background: #edf2f7;
-            border-color: #cbd5e0;
-        }}
-
-        .day-nav-btn.active {{
-            background: #4299e1;
-            color: white;
-            border-color: #4299e1;
-        }}
-
-        .day-nav-btn .day-stats {{
-            font-size: 10px;
-            opacity: 0.8;
-            margin-left: 4px;
-        }}
-
-        .day-content {{
-            display: none;
-        }}
-
-        .day-content.active {{
-            display: block;
-        }}
-
-        /* Day summary card */
-        .day-summary {{
-            background: linear-gradient(135deg, #ebf8ff 0%, #e6fffa 100%);
-            border: 1px solid #81e6d9;
-            border-radius: 8px;
-            padding: 12px 16px;
-            margin-bottom: 12px;
-        }}
-
-        .day-summary-title {{
-            font-size: 13px;
-            font-weight: 600;
-            color: #234e52;
-            margin-bottom: 8px;
-        }}
-
-        .day-summary-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(100px, 1fr));
-            gap: 12px;
-        }}
-
-        .day-summary-item {{
-            text-align: center;
-        }}
-
-        .day-summary-item .label {{
-            font-size: 10px;
-            color: #285e61;
-            text-transform: uppercase;
-        }}
-
-        .day-summary-item .value {{
-            font-size: 14px;
-            font-weight: 600;
-            color: #234e52;
-        }}
-
-        /* Shift loading styles */
-        .shift-load-btn {{
-            background: linear-gradient(135deg, #805ad5 0%, #6b46c1 100%);
-            color: white;
-            border: none;
-            padding: 8px 16px;
-            border-radius: 6px;
-            cursor: pointer;
-            font-size: 13px;
-            font-weight: 500;
-            display: inline-flex;
-            align-items: center;
-            gap: 6px;
-            margin-top: 12px;
-            transition: transform 0.1s, box-shadow 0.1s;
-        }}
-
-        .shift-load-btn:hover {{
-            transform: translateY(-1px);
-            box-shadow: 0 2px 8px rgba(128, 90, 213, 0.3);
-        }}
-
-        .shift-load-btn:disabled {{
-            opacity: 0.6;
-            cursor: not-allowed;
-            transform: none;
-        }}
-
-        .shift-container {{
-            display: none;
-            margin-top: 16px;
-            background: linear-gradient(135deg, #faf5ff 0%, #f3e8ff 100%);
-            border: 1px solid #d6bcfa;
-            border-radius: 8px;
-            padding: 16px;
-        }}
-
-        .shift-tabs {{
-            display: flex;
-            gap: 8px;
-            margin-bottom: 12px;
-            flex-wrap: wrap;
-        }}
-
-        .shift-tab {{
-            padding: 8px 16px;
-            background: white;
-            border: 1px solid #d6bcfa;
-            border-radius: 6px;
-            cursor: pointer;
-            font-size: 13px;
-            font-weight: 500;
-            color: #553c9a;
-            transition: all 0.2s;
-        }}
-
-        .shift-tab:hover {{
-            background: #e9d8fd;
-        }}
-
-        .shift-tab.active {{
-            background: #805ad5;
-            color: white;
-            border-color: #805ad5;
-        }}
-
-        .shift-content {{
-            display: none;
-        }}
-
-        .shift-content.active {{
-            display: block;
-        }}
-
-        .shift-period {{
-            font-size: 12px;
-            color: #805ad5;
-            margin-bottom: 12px;
-            font-weight: 500;
-        }}
-
-        .shift-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(120px, 1fr));
-            gap: 10px;
-        }}
-
-        .shift-item {{
-            background: white;
-            padding: 10px 12px;
-            border-radius: 6px;
-            border-left: 3px solid #805ad5;
-        }}
-
-        .shift-item .label {{
-            font-size: 11px;
-            color: #805ad5;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }}
-
-        .shift-item .value {{
-            font-size: 14px;
-            font-weight: 600;
-            color: #553c9a;
-            margin-top: 2px;
-        }}
-
-        .cache-note {{
-            font-size: 11px;
-            color: #805ad5;
-            margin-bottom: 8px;
-            font-style: italic;
-        }}
-
-        /* === V2: 3-Column Layout === */
-        .request-body-layout {{
-            display: none;  /* Hidden by default, toggled to grid */
-            grid-template-columns: 320px 1fr 360px;
-            gap: 16px;
-            min-height: 600px;
-            padding: 16px;
-        }}
-
-        .left-column {{
-            overflow-y: auto;
-            max-height: calc(100vh - 180px);
-            padding-right: 12px;
-        }}
-
-        .right-column {{
-            overflow-y: auto;
-            max-height: calc(100vh - 180px);
-            padding-left: 12px;
-        }}
-
-        .center-column {{
-            position: sticky;
-            top: 140px;
-            height: calc(100vh - 180px);
-            align-self: flex-start;
-            display: flex;
-            flex-direction: column;
-        }}
-
-        /* Map always visible in v2 */
-        .request-body-layout .map-container {{
-            display: flex !important;
-            flex-direction: column;
-            height: 100%;
-            margin: 0;
-        }}
-
-        .request-body-layout .map-layout {{
-            flex: 1;
-            min-height: 0;
-        }}
-
-        /* Compact PL list in left column */
-        .pl-compact-list {{
-            margin-top: 12px;
-        }}
-
-        .pl-compact-item {{
-            background: #f7fafc;
-            border: 1px solid #e2e8f0;
-            border-radius: 6px;
-            padding: 10px 12px;
-            margin-bottom: 8px;
-            cursor: pointer;
-            transition: all 0.15s;
-        }}
-
-        .pl-compact-item:hover {{
-            background: #edf2f7;
-            border-color: #cbd5e0;
-        }}
-
-        .pl-compact-item.expanded {{
-            background: #ebf8ff;
-            border-color: #4299e1;
-        }}
-
-        .pl-compact-header {{
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }}
-
-        .pl-compact-number {{
-            font-weight: 600;
-            font-size: 13px;
-            color: #2d3748;
-        }}
-
-        .pl-compact-date {{
-            font-size: 11px;
-            color: #718096;
-        }}
-
-        .pl-compact-vehicles {{
-            margin-top: 8px;
-            display: none;
-        }}
-
-        .pl-compact-item.expanded .pl-compact-vehicles {{
-            display: block;
-        }}
-
-        .pl-compact-vehicle {{
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            padding: 6px 8px;
-            background: white;
-            border-radius: 4px;
-            margin-top: 6px;
-            cursor: pointer;
-            transition: all 0.15s;
-            border: 1px solid transparent;
-        }}
-
-        .pl-compact-vehicle:hover {{
-            background: #f0fff4;
-        }}
-
-        .pl-compact-vehicle.selected {{
-            background: #ebf8ff;
-            border-color: #3182ce;
-        }}
-
-        .pl-vehicle-color {{
-            width: 12px;
-            height: 12px;
-            border-radius: 50%;
-            flex-shrink: 0;
-        }}
-
-        .pl-vehicle-reg {{
-            font-size: 12px;
-            font-weight: 500;
-            font-family: monospace;
-        }}
-
-        /* Vehicle selector in right column */
-        .vehicle-selector {{
-            background: #f7fafc;
-            border-radius: 8px;
-            padding: 12px;
-            margin-bottom: 12px;
-        }}
-
-        .vehicle-selector-title {{
-            font-size: 12px;
-            font-weight: 600;
-            color: #2d3748;
-            margin-bottom: 8px;
-        }}
-
-        .vehicle-selector-item {{
-            cursor: pointer;
-            padding: 8px 12px;
-            border-radius: 6px;
-            margin-bottom: 4px;
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            transition: all 0.15s;
-            border: 1px solid transparent;
-        }}
-
-        .vehicle-selector-item:hover {{
-            background: #edf2f7;
-        }}
-
-        .vehicle-selector-item.selected {{
-            background: #ebf8ff;
-            border-color: #3182ce;
-            border-left: 3px solid #3182ce;
-        }}
-
-        .vehicle-selector-color {{
-            width: 14px;
-            height: 14px;
-            border-radius: 50%;
-            flex-shrink: 0;
-            border: 2px solid white;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.2);
-        }}
-
-        .vehicle-selector-info {{
-            flex: 1;
-        }}
-
-        .vehicle-selector-reg {{
-            font-weight: 600;
-            font-size: 13px;
-            font-family: monospace;
-        }}
-
-        .vehicle-selector-name {{
-            font-size: 11px;
-            color: #718096;
-        }}
-
-        /* Active vehicle panel in right column */
-        .active-vehicle-panel {{
-            background: white;
-            border-radius: 8px;
-            border: 1px solid #e2e8f0;
-            overflow: hidden;
-        }}
-
-        .vehicle-panels-cache {{
-            display: none;
-        }}
-
-        /* Section headers in columns */
-        .column-section {{
-            margin-bottom: 16px;
-        }}
-
-        .column-section-title {{
-            font-size: 13px;
-            font-weight: 600;
-            color: #2d3748;
-            margin-bottom: 8px;
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }}
-
-        .column-section-title::before {{
-            content: '';
-            width: 3px;
-            height: 14px;
-            background: #4299e1;
-            border-radius: 2px;
-        }}
-
-        /* Map params in center column - always visible */
-        .request-body-layout .map-display-params {{
-            display: block !important;
-            margin-bottom: 8px;
-            background: white;
-            border-radius: 8px;
-            padding: 10px;
-        }}
-
-        /* Timeline in center column */
-        .request-body-layout .timeline-area {{
-            max-height: 200px;
-        }}
-
-        /* Responsive adjustments */
-        @media (max-width: 1200px) {{
-            .request-body-layout {{
-                grid-template-columns: 280px 1fr 320px;
-            }}
-        }}
-
-        @media (max-width: 992px) {{
-            .request-body-layout {{
-                grid-template-columns: 1fr;
-                grid-template-rows: auto;
-            }}
-
-            .left-column, .center-column, .right-column {{
-                max-height: none;
-                position: static;
-            }}
-
-            .center-column {{
-                height: 500px;
-            }}
-        }}
-    </style>
-</head>
+"""
+
+# Static report CSS (report.css next to this module), identical for every report.
+# Pages served by a route with report.css next to it (link_css) link it, versioned by
+# content hash so the browser caches it across reports; every other file inlines it
+# to stay self-contained (opened from disk, /report, /api/reports/{id}).
+REPORT_CSS_PATH = Path(__file__).with_name('report.css')
+_STATIC_CSS = REPORT_CSS_PATH.read_text(encoding='utf-8')
+REPORT_CSS_VERSION = hashlib.blake2b(_STATIC_CSS.encode('utf-8'), digest_size=6).hexdigest()
+# Relative href: resolves next to the report URL, also behind the frontend's /api/tyagachi proxy
+_REPORT_CSS_LINK = '<link rel="stylesheet" href="report.css?v=%s">\n' % REPORT_CSS_VERSION
+_REPORT_CSS_INLINE = '<style>\n' + _STATIC_CSS + '</style>\n'
+
+# Rest of the skeleton: header, filter panel and the opening of the requests container (format_map).
+_REPORT_BODY = """</head>
 <body>
     <div class="header">
         <div class="header-content">
             <h1>Создан: {generated_at} &middot; {total_requests} заявок</h1>
             <div class="search-box">
-                <input type="text" id="searchInput" placeholder="Поиск по номеру заявки, ПЛ или машины..." onkeyup="filterRequests()">
+                <input type="text" id="searchInput" placeholder="Поиск по номеру заявки, ПЛ или машины...">
             </div>
             <div class="header-stats">
                 <span>Заявок: <strong>{total_requests}</strong></span>
@@ -2282,7 +180,7 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                             <div class="filter-search">
                                 <input type="text" placeholder="Поиск..." oninput="searchFilterOptions('startAddr', this.value)">
                             </div>
-                            <div class="filter-options" id="startAddrOptions"></div>
+                            <div class="filter-options" id="startAddrOptions">{start_addr_options}</div>
                             <div class="filter-actions">
                                 <button class="select-all-btn" onclick="selectAllFilter('startAddr')">Все</button>
                                 <button class="clear-btn" onclick="clearFilter('startAddr')">Сбросить</button>
@@ -2302,7 +200,7 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                             <div class="filter-search">
                                 <input type="text" placeholder="Поиск..." oninput="searchFilterOptions('endAddr', this.value)">
                             </div>
-                            <div class="filter-options" id="endAddrOptions"></div>
+                            <div class="filter-options" id="endAddrOptions">{end_addr_options}</div>
                             <div class="filter-actions">
                                 <button class="select-all-btn" onclick="selectAllFilter('endAddr')">Все</button>
                                 <button class="clear-btn" onclick="clearFilter('endAddr')">Сбросить</button>
@@ -2322,7 +220,7 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                             <div class="filter-search">
                                 <input type="text" placeholder="Поиск..." oninput="searchFilterOptions('costObj', this.value)">
                             </div>
-                            <div class="filter-options" id="costObjOptions"></div>
+                            <div class="filter-options" id="costObjOptions">{cost_obj_options}</div>
                             <div class="filter-actions">
                                 <button class="select-all-btn" onclick="selectAllFilter('costObj')">Все</button>
                                 <button class="clear-btn" onclick="clearFilter('costObj')">Сбросить</button>
@@ -2334,7 +232,7 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                 <div class="filter-group">
                     <div class="filter-label">Мин. время стоянки</div>
                     <div class="parking-time-filter">
-                        <input type="number" id="minParkingTime" value="60" min="0" onchange="updateParkingDisplay()">
+                        <input type="number" id="minParkingTime" value="60" min="0">
                         <span>мин</span>
                     </div>
                 </div>
@@ -2366,27 +264,198 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
         <div id="requestsContainer">
 """
 
-    # Requests
-    for req_num, req_data in sorted_items:
-        html += _build_request_html(req_num, req_data)
+# Skeleton indentation is stripped once at import, not per report
+_REPORT_HEAD = _minify_html(_REPORT_HEAD)
+_REPORT_BODY = _minify_html(_REPORT_BODY)
+
+
+# One filter dropdown option: (value, filter_id, idx, filter_id, idx, value), values HTML-escaped
+_FILTER_OPTION_TPL = (
+    '<div class="filter-option" data-value="%s">'
+    '<input type="checkbox" id="%s_%d"> <label for="%s_%d">%s</label></div>'
+)
+
+
+def _render_filter_options(filter_id: str, values: List[str]) -> str:
+    """Render the dropdown options of one filter as a single HTML string."""
+    tpl = _FILTER_OPTION_TPL
+    opts = []
+    app = opts.append
+    for idx, value in enumerate(values):
+        value = _escape_cached(value)
+        app(tpl % (value, filter_id, idx, filter_id, idx, value))
+    return ''.join(opts)
+
+
+def _json_compact(obj: Any) -> str:
+    """Compact JSON text with non-ASCII kept as is; encoded by orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _script_json(obj: Any) -> str:
+    """JSON for a <script type="application/json"> block; "</" is escaped so no value can close it early."""
+    return _json_compact(obj).replace('</', '<\\/')
+
+
+class _DeferredNow:
+    """Stands in for datetime.now() in cached renders: strftime() leaves a marker for _STAMP_RE."""
+
+    @staticmethod
+    def strftime(fmt: str) -> str:
+        return '\x00%s\x00' % fmt
+
+
+def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, report_id: Optional[int] = None,
+                link_css: bool = False, parallel: bool = False) -> str:
+    """
+    Build HTML string from hierarchy.
+
+    Reports with a report_id are memoized in _HTML_CACHE (LRU), so rendering
+    the same hierarchy object again returns the previously built page with
+    a fresh generation timestamp. The hierarchy must not be mutated in between.
+    """
+    if report_id is None:
+        return ''.join(_iter_html(hierarchy, title, web_mode=web_mode, report_id=report_id, link_css=link_css, parallel=parallel))
+
+    key = (report_id, title, web_mode, link_css)
+    with _HTML_CACHE_LOCK:
+        cached = _HTML_CACHE.get(key)
+        if cached is not None and cached[0] is hierarchy:
+            _HTML_CACHE.move_to_end(key)
+            template = cached[1]
+        else:
+            template = None
+
+    if template is None:
+        template = ''.join(_iter_html(hierarchy, title, web_mode=web_mode, report_id=report_id,
+                                      link_css=link_css, parallel=parallel, now=_DeferredNow))
+        with _HTML_CACHE_LOCK:
+            _HTML_CACHE[key] = (hierarchy, template)
+            _HTML_CACHE.move_to_end(key)
+            while len(_HTML_CACHE) > _HTML_CACHE_SIZE:
+                _HTML_CACHE.popitem(last=False)
+
+    now = datetime.now()
+    return _STAMP_RE.sub(lambda m: now.strftime(m.group(1)), template)
+
+
+def _iter_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, report_id: Optional[int] = None,
+               link_css: bool = False, parallel: bool = False, now: Any = None) -> Iterator[str]:
+    """Yield report HTML fragments in document order (now: datetime, or _DeferredNow for cached pages)."""
+    # One timestamp for the header and the footer
+    if now is None:
+        now = datetime.now()
+    generated_at = now.strftime('%d.%m.%Y, %H:%M:%S')
+
+    # Statistics and unique filter values, collected in one pass
+    total_requests = len(hierarchy)
+    total_pl = total_vehicles = 0
+    start_addresses = set()
+    end_addresses = set()
+    cost_objects = set()
+    start_add = start_addresses.add
+    end_add = end_addresses.add
+    cost_add = cost_objects.add
+
+    map_data = {}
+
+    for req_num, req in hierarchy.items():
+        get = req.get
+        map_data[req_num] = _request_map_data(req)
+        pl_list = get('pl_list', _EMPTY)
+        total_pl += len(pl_list)
+        total_vehicles += sum(map(len, map(_pl_vehicles, pl_list)))
+
+        start_addr = get('route_start_address')
+        end_addr = get('route_end_address')
+        cost_obj = get('object_expend_name')
+        # Skip empty/placeholder values; `val == val` is false only for NaN
+        if start_addr is not None and start_addr != '' and start_addr != '—' and start_addr == start_addr:
+            start_add(start_addr if type(start_addr) is str else str(start_addr))
+        if end_addr is not None and end_addr != '' and end_addr != '—' and end_addr == end_addr:
+            end_add(end_addr if type(end_addr) is str else str(end_addr))
+        if cost_obj is not None and cost_obj != '' and cost_obj != '—' and cost_obj == cost_obj:
+            cost_add(cost_obj if type(cost_obj) is str else str(cost_obj))
 
-    html += """        </div>
+    # Sort filter values
+    start_addresses = sorted(start_addresses)
+    end_addresses = sorted(end_addresses)
+    cost_objects = sorted(cost_objects)
+
+    # Sort by route_start_date (keys are computed once, compared by itemgetter)
+    decorated = [(req.get('route_start_date') or '', req_num, req) for req_num, req in hierarchy.items()]
+    decorated.sort(key=itemgetter(0), reverse=True)
+    sorted_items = [(req_num, req) for _, req_num, req in decorated]
+
+    # Search/filter index, aligned with sorted_items: lowercase search text and
+    # dictionary-encoded filter values (position in the sorted vocabulary, -1 if empty)
+    start_ids = {v: i for i, v in enumerate(start_addresses)}
+    end_ids = {v: i for i, v in enumerate(end_addresses)}
+    cost_ids = {v: i for i, v in enumerate(cost_objects)}
+    index = {
+        'search': [],
+        'start': [],
+        'end': [],
+        'cost': [],
+        'vocab': {'startAddr': start_addresses, 'endAddr': end_addresses, 'costObj': cost_objects},
+    }
+    for req_num, req in sorted_items:
+        get = req.get
+        index['search'].append(_request_search_text(req_num, req).lower())
+        index['start'].append(start_ids.get(_clean_str(get('route_start_address')), -1))
+        index['end'].append(end_ids.get(_clean_str(get('route_end_address')), -1))
+        index['cost'].append(cost_ids.get(_clean_str(get('object_expend_name')), -1))
+
+    ctx = {
+        'generated_at': generated_at,
+        'total_requests': total_requests,
+        'total_pl': total_pl,
+        'total_vehicles': total_vehicles,
+        'start_addr_options': _render_filter_options('startAddr', start_addresses),
+        'end_addr_options': _render_filter_options('endAddr', end_addresses),
+        'cost_obj_options': _render_filter_options('costObj', cost_objects),
+    }
+    yield _REPORT_HEAD % escape(title)
+    yield _REPORT_CSS_LINK if link_css else _REPORT_CSS_INLINE
+    yield _REPORT_BODY.format_map(ctx)
+
+    # Requests are shipped as a JSON payload and mounted by the page in windows
+    # as the user scrolls. Cards are independent, large reports render them in parallel
+    # when the caller allows it (CLI only).
+    yield """        </div>
+        <div id="requestsSentinel"></div>
     </div>
 
+    <script id="__REQUESTS__" type="application/json">["""
+    _prune_request_cache()
+    if parallel and len(sorted_items) > PARALLEL_RENDER_MIN_REQUESTS:
+        with ProcessPoolExecutor() as pool:
+            yield from _json_array_items(pool.map(_render_request, sorted_items, chunksize=64))
+    else:
+        yield from _json_array_items(map(_render_request, sorted_items))
+    yield """]</script>
+
+    <script id="__INDEX__" type="application/json">"""
+    yield _script_json(index)
+    yield """</script>
+
+    <script id="__MAP_DATA__" type="application/json">"""
+    yield _script_json(map_data)
+    yield """</script>
+
     <div class="footer">
-        Сгенерировано: """ + datetime.now().strftime('%d.%m.%Y %H:%M') + """
+        Сгенерировано: """
+    yield now.strftime('%d.%m.%Y %H:%M')
+    yield """
     </div>
 
     <script>
         // Report ID for shift loading API
-        const REPORT_ID = """ + (str(report_id) if report_id else "null") + """;
-
-        // Filter data
-        const filterData = {
-            startAddr: """ + json.dumps(start_addresses, ensure_ascii=False) + """,
-            endAddr: """ + json.dumps(end_addresses, ensure_ascii=False) + """,
-            costObj: """ + json.dumps(cost_objects, ensure_ascii=False) + """
-        };
+        const REPORT_ID = """
+    yield str(report_id) if report_id else "null"
+    yield """;
 
         // Selected filter values
         const selectedFilters = {
@@ -2395,31 +464,155 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
             costObj: new Set()
         };
 
-        // Initialize filters
+        // Requests payload (#__REQUESTS__): sort keys and card HTML per request.
+        // Only a window of cards is in the DOM; more are mounted as the list is scrolled.
+        const REQUESTS = JSON.parse(document.getElementById('__REQUESTS__').textContent);
+        const REQUEST_POS = new Map(REQUESTS.map((r, i) => [r.num, i]));
+
+        // Search/filter index (#__INDEX__), built by the generator and aligned with REQUESTS:
+        // lowercase search text and filter values as ids into the sorted filter vocabularies
+        const IDX = (function() {
+            const raw = JSON.parse(document.getElementById('__INDEX__').textContent);
+            const vocabIds = {};
+            Object.keys(raw.vocab).forEach(filterId => {
+                vocabIds[filterId] = new Map(raw.vocab[filterId].map((v, id) => [v, id]));
+            });
+            return {
+                search: raw.search,
+                start: Int32Array.from(raw.start),
+                end: Int32Array.from(raw.end),
+                cost: Int32Array.from(raw.cost),
+                archived: new Uint8Array(REQUESTS.length),
+                vocabIds: vocabIds
+            };
+        })();
+        const visibleMask = new Uint8Array(REQUESTS.length);
+        const MOUNT_BATCH = 30;
+        const requestNodes = new Array(REQUESTS.length);  // created once, keep map/form state
+        const parkingMeta = new Array(REQUESTS.length);   // parking nodes + durations of created cards
+        let sortedOrder = REQUESTS.map((r, i) => i);      // all requests in the current sort
+        let visibleOrder = sortedOrder;                   // sortedOrder after filters
+        let mountedCount = 0;
+
+        function getRequestNode(i) {
+            let node = requestNodes[i];
+            if (!node) {
+                const tpl = document.createElement('template');
+                tpl.innerHTML = REQUESTS[i].html;
+                node = tpl.content.firstElementChild;
+                requestNodes[i] = node;
+                parkingMeta[i] = readParkingMeta(node);
+                applyArchivedState(node, i);
+                updateParkingDisplay(i);
+            }
+            return node;
+        }
+
+        function mountRequests(from, to) {
+            const frag = document.createDocumentFragment();
+            for (let k = from; k < to; k++) {
+                frag.appendChild(getRequestNode(visibleOrder[k]));
+            }
+            return frag;
+        }
+
+        function renderRequests() {
+            mountedCount = Math.min(MOUNT_BATCH, visibleOrder.length);
+            document.getElementById('requestsContainer').replaceChildren(mountRequests(0, mountedCount));
+            document.getElementById('resultsInfo').textContent = 'Показано заявок: ' + visibleOrder.length;
+        }
+
+        // Coalesce re-renders (e.g. fast typing) into one DOM write per frame
+        let renderFrame = 0;
+        function scheduleRenderRequests() {
+            if (renderFrame) return;
+            renderFrame = requestAnimationFrame(() => {
+                renderFrame = 0;
+                renderRequests();
+            });
+        }
+
+        function mountMoreRequests() {
+            if (renderFrame || mountedCount >= visibleOrder.length) return;
+            const to = Math.min(mountedCount + MOUNT_BATCH, visibleOrder.length);
+            document.getElementById('requestsContainer').appendChild(mountRequests(mountedCount, to));
+            mountedCount = to;
+        }
+
+        function debounce(fn, ms) {
+            let timer;
+            return function(...args) {
+                clearTimeout(timer);
+                timer = setTimeout(() => fn(...args), ms);
+            };
+        }
+
+        // Initialize list (filter options are rendered server-side)
         document.addEventListener('DOMContentLoaded', function() {
-            initFilterOptions('startAddr', filterData.startAddr);
-            initFilterOptions('endAddr', filterData.endAddr);
-            initFilterOptions('costObj', filterData.costObj);
-            updateParkingDisplay();
+            renderRequests();
+            // Fast typing / spinning the number input coalesces into one update
+            document.getElementById('searchInput').addEventListener('input', debounce(filterRequests, 80));
+            document.getElementById('minParkingTime').addEventListener('input', debounce(() => updateParkingDisplay(), 80));
+            const sentinel = document.getElementById('requestsSentinel');
+            const observer = new IntersectionObserver(function(entries) {
+                if (!entries[0].isIntersecting) return;
+                mountMoreRequests();
+                // Re-observe so a sentinel that is still in view fires again
+                observer.unobserve(sentinel);
+                observer.observe(sentinel);
+            }, { rootMargin: '1000px 0px' });
+            observer.observe(sentinel);
         });
 
-        function initFilterOptions(filterId, options) {
-            const container = document.getElementById(filterId + 'Options');
-            container.innerHTML = '';
-            options.forEach((opt, idx) => {
-                const div = document.createElement('div');
-                div.className = 'filter-option';
-                div.setAttribute('data-value', opt);
-                div.innerHTML = '<input type="checkbox" id="' + filterId + '_' + idx + '"> <label for="' + filterId + '_' + idx + '">' + opt + '</label>';
-                div.onclick = function(e) {
-                    if (e.target.tagName !== 'INPUT') {
-                        const cb = div.querySelector('input');
-                        cb.checked = !cb.checked;
-                    }
-                };
-                container.appendChild(div);
+        // One delegated click listener per options list instead of a handler on every option
+        document.querySelectorAll('.filter-options').forEach(list => {
+            list.addEventListener('click', function(e) {
+                const opt = e.target.closest('.filter-option');
+                // The checkbox and its <label for> toggle natively; toggling here too would undo it
+                if (!opt || e.target.tagName === 'INPUT' || e.target.tagName === 'LABEL') return;
+                const cb = opt.querySelector('input');
+                cb.checked = !cb.checked;
             });
-        }
+        });
+
+        // Request card controls: one delegated click and change listener on the list instead of
+        // inline handlers on every card. data-action / data-change name the handler, other data-*
+        // attributes carry its arguments. Only the innermost action runs, as stopPropagation did.
+        const cardNum = el => el.closest('.request').dataset.number;
+        const cardActions = {
+            toggleRequest: el => toggleRequestV2(el),
+            toggleSection: el => toggleSubheaderSection(el),
+            copy: el => copyToClipboard(el.dataset.copy, el.querySelector('.copy-btn')),
+            archive: el => toggleArchive(el, cardNum(el), el.dataset.startAddr, el.dataset.endAddr,
+                                         el.dataset.date, Number(el.dataset.plCount)),
+            togglePL: el => {
+                togglePL(el.dataset.pl);
+                el.querySelector('.expand-arrow').classList.toggle('up');
+            },
+            selectVehicle: el => selectVehicleV2(cardNum(el), el.dataset.vehicleUid, Number(el.dataset.idx)),
+            switchDay: el => switchDay(el.dataset.vehicle, Number(el.dataset.idx)),
+            switchShift: el => switchShift(el.dataset.vehicle, Number(el.dataset.idx)),
+            loadShifts: el => loadShifts(el.dataset.vehicle, el.dataset.pl, Number(el.dataset.tsId),
+                                         el.dataset.from, el.dataset.to),
+            applyTimeFilter: el => applyTimeFilter(cardNum(el)),
+            clearTimeFilter: el => clearTimeFilter(cardNum(el))
+        };
+        const cardChangeActions = {
+            updateCalcPlan: el => updateCalcPlan(cardNum(el)),
+            toggleParkings: el => toggleParkings(cardNum(el)),
+            updateMapFilters: el => updateMapFilters(cardNum(el))
+        };
+        (function() {
+            const container = document.getElementById('requestsContainer');
+            container.addEventListener('click', function(e) {
+                const el = e.target.closest('[data-action]');
+                if (el && container.contains(el)) cardActions[el.dataset.action](el);
+            });
+            container.addEventListener('change', function(e) {
+                const el = e.target.closest('[data-change]');
+                if (el && container.contains(el)) cardChangeActions[el.dataset.change](el);
+            });
+        })();
 
         function toggleFilter(filterId) {
             const popup = document.getElementById(filterId + 'Popup');
@@ -2500,58 +693,57 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
             }
         }
 
+        // Selected values of a filter as a mask over its vocabulary ids (null: no filter)
+        function selectedIdMask(filterId) {
+            const selected = selectedFilters[filterId];
+            if (selected.size === 0) return null;
+            const ids = IDX.vocabIds[filterId];
+            const mask = new Uint8Array(ids.size);
+            selected.forEach(value => {
+                const id = ids.get(value);
+                if (id !== undefined) mask[id] = 1;
+            });
+            return mask;
+        }
+
         function filterRequests() {
             const query = document.getElementById('searchInput').value.toLowerCase();
             const hideArchived = document.getElementById('hideArchived').checked;
-            const requests = document.querySelectorAll('.request');
-            let visibleCount = 0;
-
-            requests.forEach(req => {
-                const text = req.getAttribute('data-search').toLowerCase();
-                const startAddr = req.getAttribute('data-start-addr') || '';
-                const endAddr = req.getAttribute('data-end-addr') || '';
-                const costObj = req.getAttribute('data-cost-obj') || '';
-                const isArchived = req.classList.contains('is-archived');
-
-                // Text search
-                const matchesSearch = !query || text.includes(query);
-
-                // Filter checks
-                const matchesStart = selectedFilters.startAddr.size === 0 || selectedFilters.startAddr.has(startAddr);
-                const matchesEnd = selectedFilters.endAddr.size === 0 || selectedFilters.endAddr.has(endAddr);
-                const matchesCost = selectedFilters.costObj.size === 0 || selectedFilters.costObj.has(costObj);
-
-                // Archive filter
-                const matchesArchive = !hideArchived || !isArchived;
-
-                if (matchesSearch && matchesStart && matchesEnd && matchesCost && matchesArchive) {
-                    req.classList.remove('hidden');
-                    visibleCount++;
-                } else {
-                    req.classList.add('hidden');
-                }
-            });
+            const startMask = selectedIdMask('startAddr');
+            const endMask = selectedIdMask('endAddr');
+            const costMask = selectedIdMask('costObj');
+            const search = IDX.search, start = IDX.start, end = IDX.end, cost = IDX.cost, archived = IDX.archived;
+
+            // Filters run over the index arrays, not the DOM; only the window is re-mounted
+            for (let i = 0, n = visibleMask.length; i < n; i++) {
+                visibleMask[i] =
+                    (!query || search[i].indexOf(query) !== -1) &&
+                    (!startMask || (start[i] >= 0 && startMask[start[i]] === 1)) &&
+                    (!endMask || (end[i] >= 0 && endMask[end[i]] === 1)) &&
+                    (!costMask || (cost[i] >= 0 && costMask[cost[i]] === 1)) &&
+                    (!hideArchived || archived[i] === 0) ? 1 : 0;
+            }
+            visibleOrder = sortedOrder.filter(i => visibleMask[i] === 1);
 
-            document.getElementById('resultsInfo').textContent = 'Показано заявок: ' + visibleCount;
+            scheduleRenderRequests();
         }
 
         function sortRequests() {
-            const container = document.getElementById('requestsContainer');
-            const requests = Array.from(container.querySelectorAll('.request'));
             const sortType = document.getElementById('sortSelect').value;
 
-            requests.sort((a, b) => {
+            sortedOrder = sortedOrder.slice().sort((ia, ib) => {
+                const a = REQUESTS[ia], b = REQUESTS[ib];
                 if (sortType === 'date-desc') {
-                    return (b.getAttribute('data-date') || '').localeCompare(a.getAttribute('data-date') || '');
+                    return b.date.localeCompare(a.date);
                 } else if (sortType === 'date-asc') {
-                    return (a.getAttribute('data-date') || '').localeCompare(b.getAttribute('data-date') || '');
+                    return a.date.localeCompare(b.date);
                 } else if (sortType === 'number-asc') {
-                    return parseInt(a.getAttribute('data-number')) - parseInt(b.getAttribute('data-number'));
+                    return parseInt(a.num) - parseInt(b.num);
                 }
                 return 0;
             });
 
-            requests.forEach(req => container.appendChild(req));
+            filterRequests();
         }
 
         function togglePL(plId) {
@@ -2561,30 +753,62 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
             }
         }
 
-        function updateParkingDisplay() {
-            const minTime = parseInt(document.getElementById('minParkingTime').value) || 0;
-            document.querySelectorAll('.parking-day-group').forEach(group => {
+        // Parking day groups and items of a card with their durations, read once when it is created
+        function readParkingMeta(node) {
+            const item = el => ({ el: el, duration: parseInt(el.getAttribute('data-duration')) || 0 });
+            const groups = Array.from(node.querySelectorAll('.parking-day-group'), group => ({
+                el: group,
+                items: Array.from(group.querySelectorAll('.parking-item'), item)
+            }));
+            // Flat parking items in fact-panel (not in day groups)
+            const flat = Array.from(node.querySelectorAll('.fact-panel .parking-item'))
+                .filter(el => !el.closest('.parking-day-group'))
+                .map(item);
+            return { groups: groups, flat: flat };
+        }
+
+        function collectParkingVisibility(meta, minTime, show, hide) {
+            meta.groups.forEach(group => {
                 let visibleCount = 0;
-                group.querySelectorAll('.parking-item').forEach(item => {
-                    const duration = parseInt(item.getAttribute('data-duration')) || 0;
-                    if (duration >= minTime) {
-                        item.style.display = 'block';
+                group.items.forEach(item => {
+                    if (item.duration >= minTime) {
+                        show.push(item.el);
                         visibleCount++;
                     } else {
-                        item.style.display = 'none';
+                        hide.push(item.el);
                     }
                 });
                 // Hide day group if no items visible
-                group.style.display = visibleCount > 0 ? 'block' : 'none';
+                (visibleCount > 0 ? show : hide).push(group.el);
             });
-            // Also handle flat parking items in fact-panel (not in day groups)
-            document.querySelectorAll('.fact-panel .parking-item').forEach(item => {
-                if (item.closest('.parking-day-group')) return; // skip if already in group
-                const duration = parseInt(item.getAttribute('data-duration')) || 0;
-                item.style.display = duration >= minTime ? 'block' : 'none';
+            meta.flat.forEach(item => {
+                (item.duration >= minTime ? show : hide).push(item.el);
             });
         }
 
+        function updateParkingDisplay(i) {
+            // i: index of one card (just created or with a swapped panel); omitted to update every created card
+            const minTime = parseInt(document.getElementById('minParkingTime').value) || 0;
+            // Decide visibility from cached durations, no DOM reads
+            const show = [];
+            const hide = [];
+            if (i === undefined) {
+                parkingMeta.forEach(meta => collectParkingVisibility(meta, minTime, show, hide));
+            } else {
+                collectParkingVisibility(parkingMeta[i], minTime, show, hide);
+            }
+            // Write pass: class toggles only, batched into one frame for the live document
+            const write = () => {
+                show.forEach(el => el.classList.remove('hidden'));
+                hide.forEach(el => el.classList.add('hidden'));
+            };
+            if (i === undefined) {
+                requestAnimationFrame(write);
+            } else {
+                write();  // one card: a handful of nodes, no need to wait for a frame
+            }
+        }
+
         function switchDay(vehicleId, dayIndex) {
             // Update buttons
             const nav = document.getElementById('day-nav-' + vehicleId);
@@ -2799,13 +1023,23 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
             });
         }
 
+        // Map data of all requests (#__MAP_DATA__), parsed once on first map open
+        let allMapData = null;
+
+        function getMapData(requestId) {
+            if (allMapData === null) {
+                allMapData = JSON.parse(document.getElementById('__MAP_DATA__').textContent);
+            }
+            return allMapData[requestId];
+        }
+
         function initMap(requestId, container) {
-            const mapData = container.querySelector('.map-data');
+            const mapData = getMapData(requestId);
             if (!mapData) return;
 
-            const polyline = mapData.dataset.polyline || '';
-            const routePointsStr = mapData.dataset.routePoints || '[]';
-            const vehiclesStr = mapData.dataset.vehicles || '[]';
+            const polyline = mapData.polyline || '';
+            const routePointsStr = mapData.routePoints || '[]';
+            const vehiclesStr = mapData.vehicles || '[]';
 
             let routePoints = [];
             let vehicles = [];
@@ -3610,12 +1844,22 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
         // Archive functionality
         const archivedRequests = new Set();
 
+        function setArchived(reqNum, isArchived) {
+            if (isArchived) {
+                archivedRequests.add(reqNum);
+            } else {
+                archivedRequests.delete(reqNum);
+            }
+            const pos = REQUEST_POS.get(reqNum);
+            if (pos !== undefined) IDX.archived[pos] = isArchived ? 1 : 0;
+        }
+
         async function loadArchivedRequests() {
             try {
                 const response = await fetch('/api/archived-numbers');
                 if (response.ok) {
                     const data = await response.json();
-                    data.numbers.forEach(num => archivedRequests.add(num));
+                    data.numbers.forEach(num => setArchived(num, true));
                     updateArchivedUI();
                 }
             } catch (e) {
@@ -3624,23 +1868,23 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
             }
         }
 
-        function updateArchivedUI() {
-            document.querySelectorAll('.request').forEach(req => {
-                const reqNum = req.getAttribute('data-number');
-                if (archivedRequests.has(reqNum)) {
-                    req.classList.add('is-archived');
-                    const btn = req.querySelector('.archive-btn');
-                    if (btn) {
-                        btn.classList.add('archived');
-                        btn.innerHTML = '✓ Просмотрено';
-                    }
+        function applyArchivedState(req, i) {
+            if (IDX.archived[i] === 1) {
+                req.classList.add('is-archived');
+                const btn = req.querySelector('.archive-btn');
+                if (btn) {
+                    btn.classList.add('archived');
+                    btn.innerHTML = '✓ Просмотрено';
                 }
-            });
+            }
         }
 
-        async function toggleArchive(event, reqNum, startAddr, endAddr, startDate, plCount) {
-            event.stopPropagation();
-            const btn = event.currentTarget;
+        function updateArchivedUI() {
+            // Cards that are not created yet get their state in getRequestNode()
+            requestNodes.forEach(applyArchivedState);  // forEach passes (node, index)
+        }
+
+        async function toggleArchive(btn, reqNum, startAddr, endAddr, startDate, plCount) {
             const req = btn.closest('.request');
 
             if (archivedRequests.has(reqNum)) {
@@ -3652,7 +1896,7 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                         body: JSON.stringify({ request_number: reqNum })
                     });
                     if (response.ok) {
-                        archivedRequests.delete(reqNum);
+                        setArchived(reqNum, false);
                         req.classList.remove('is-archived');
                         btn.classList.remove('archived');
                         btn.innerHTML = '★ В архив';
@@ -3675,7 +1919,7 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                         })
                     });
                     if (response.ok) {
-                        archivedRequests.add(reqNum);
+                        setArchived(reqNum, true);
                         req.classList.add('is-archived');
                         btn.classList.add('archived');
                         btn.innerHTML = '✓ Просмотрено';
@@ -3755,7 +1999,7 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                 const activeClass = idx === 0 ? ' active' : '';
                 const label = shift.label || shift.key;
 
-                tabsHtml += '<button class="shift-tab' + activeClass + '" onclick="switchShift(\\'' + vehicleUid + '\\', ' + idx + ')">' + label + '</button>';
+                tabsHtml += '<button class="shift-tab' + activeClass + '" data-action="switchShift" data-vehicle="' + vehicleUid + '" data-idx="' + idx + '">' + label + '</button>';
 
                 // Format shift data
                 const d = shift.data || {};
@@ -3770,19 +2014,19 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                 contentHtml += '<div class="shift-grid">';
 
                 if (parseFloat(distance) > 0) {
-                    contentHtml += '<div class="shift-item"><div class="label">Пробег</div><div class="value">' + distance + ' км</div></div>';
+                    contentHtml += '<div class="shift-item"><div class="shift-item-label">Пробег</div><div class="shift-item-value">' + distance + ' км</div></div>';
                 }
                 if (parseFloat(movingHours) > 0) {
-                    contentHtml += '<div class="shift-item"><div class="label">В движении</div><div class="value">' + movingHours + ' ч</div></div>';
+                    contentHtml += '<div class="shift-item"><div class="shift-item-label">В движении</div><div class="shift-item-value">' + movingHours + ' ч</div></div>';
                 }
                 if (parseFloat(engineHours) > 0) {
-                    contentHtml += '<div class="shift-item"><div class="label">Двигатель</div><div class="value">' + engineHours + ' ч</div></div>';
+                    contentHtml += '<div class="shift-item"><div class="shift-item-label">Двигатель</div><div class="shift-item-value">' + engineHours + ' ч</div></div>';
                 }
                 if (parseFloat(idlingHours) > 0) {
-                    contentHtml += '<div class="shift-item"><div class="label">Простой</div><div class="value">' + idlingHours + ' ч</div></div>';
+                    contentHtml += '<div class="shift-item"><div class="shift-item-label">Простой</div><div class="shift-item-value">' + idlingHours + ' ч</div></div>';
                 }
                 if (parseFloat(fuelRate) > 0) {
-                    contentHtml += '<div class="shift-item"><div class="label">Расход топлива</div><div class="value">' + fuelRate + ' л</div></div>';
+                    contentHtml += '<div class="shift-item"><div class="shift-item-label">Расход топлива</div><div class="shift-item-value">' + fuelRate + ' л</div></div>';
                 }
 
                 contentHtml += '</div></div>';
@@ -3902,6 +2146,12 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
                 const cachedContent = cache.querySelector('[data-vehicle-uid="' + vehicleUid + '"]');
                 if (cachedContent) {
                     factPanel.innerHTML = cachedContent.innerHTML;
+                    // The panel's parking nodes are new: re-read them and apply the minimum time
+                    const i = REQUEST_POS.get(requestId);
+                    if (i !== undefined) {
+                        parkingMeta[i] = readParkingMeta(request);
+                        updateParkingDisplay(i);
+                    }
                 }
             }
 
@@ -3947,84 +2197,267 @@ def _build_html(hierarchy: Dict[str, Any], title: str, web_mode: bool = False, r
 </body>
 </html>
 """
-    return html
 
 
-def _build_request_html(req_num: str, req_data: Dict) -> str:
-    """Build HTML for a single request with 3-column layout (V2)."""
-    status = req_data.get('request_status', '—')
-    date_processed = req_data.get('request_date_processed', '—')
-    start_addr = req_data.get('route_start_address', '—')
-    end_addr = req_data.get('route_end_address', '—')
-    start_date = req_data.get('route_start_date', '')
-    end_date = req_data.get('route_end_date', '')
-    time_zone_tag = req_data.get('route_time_zone_tag', '')
+# Repeated per-item blocks of a request card, filled with format_map()
+_PL_ITEM_TPL = """                            <div class="subheader-pl-item">
+                                <span class="subheader-pl-number">№{pl_number}</span>
+                                <span class="subheader-pl-dates">{date_out_short} → {date_in_short}</span>
+                                {vehicles_html}
+                            </div>
+"""
+
+_VEHICLE_SELECTOR_TPL = """                        <div class="vehicle-selector-item{selected_class}" data-vehicle-uid="{vehicle_uid}" data-action="selectVehicle" data-idx="{idx}">
+                            <span class="vehicle-selector-color" style="background:{color}"></span>
+                            <div class="vehicle-selector-info">
+                                <div class="vehicle-selector-reg">{reg}</div>
+                                <div class="vehicle-selector-name">{name} · ПЛ {pl_num}</div>
+                            </div>
+                        </div>
+"""
+
+_FUEL_TPL = """                                <div class="fuel-item" style="background:#faf5ff;border:1px solid #d6bcfa;border-radius:4px;padding:8px;margin-bottom:6px;font-size:12px;">
+                                    <div style="font-weight:500;color:#553c9a;margin-bottom:4px;">{fuel_name}</div>
+                                    <div style="display:grid;grid-template-columns:repeat(3,1fr);gap:6px;font-size:11px;">
+                                        <div><span style="color:#805ad5;">Заправки:</span> {charges:.1f}л</div>
+                                        <div><span style="color:#805ad5;">Сливы:</span> {discharges:.1f}л</div>
+                                        <div><span style="color:#805ad5;">Расход:</span> {rate:.1f}л</div>
+                                    </div>
+                                    <div style="display:flex;gap:12px;font-size:11px;margin-top:4px;color:#718096;">
+                                        <span>Начало: {value_begin:.1f}л</span>
+                                        <span>Конец: {value_end:.1f}л</span>
+                                    </div>
+                                </div>
+"""
+
+_PARKING_DAY_TPL = """                                <div class="parking-day-group" style="margin-bottom:8px;">
+                                    <div class="parking-day-header" style="font-size:11px;font-weight:600;color:#744210;background:#fef3c7;padding:4px 8px;border-radius:4px;margin-bottom:4px;">
+                                        📅 {day_display} — всего {total_str} ({count} ст.)
+                                    </div>
+"""
+
+_PARKING_TPL = """                                    <div class="parking-item" data-duration="{duration}" style="background:#fffaf0;border:1px solid #fbd38d;border-radius:4px;padding:6px 10px;margin-bottom:4px;font-size:12px;">
+                                        <div class="parking-time" style="font-weight:500;color:#744210;">{begin_time} → {end_time} ({dur_str})</div>
+                                        <div class="parking-address" style="font-size:11px;color:#975a16;margin-top:2px;">{address_short}</div>
+                                    </div>
+"""
 
-    # Plan data
-    import math
-    def _clean_value(val):
-        if val is None or val == '':
-            return ''
-        if isinstance(val, float) and math.isnan(val):
-            return ''
-        return val
 
-    cargo_name = _clean_value(req_data.get('order_name_cargo', ''))
-    cargo_weight = _clean_value(req_data.get('order_weight_cargo', ''))
-    cargo_volume = _clean_value(req_data.get('order_volume_cargo', ''))
-    count_ts = req_data.get('order_count_ts', '')
-    cnt_trip = req_data.get('order_cnt_trip', '')
-    route_distance = req_data.get('route_distance', '')
-    route_time = req_data.get('route_time', '')
-    object_expend = _clean_value(req_data.get('object_expend_name', ''))
-
-    # Map data - handle NaN values
-    import math
-    route_polyline = req_data.get('route_polyline', '')
+def _request_map_data(req_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Map data of one request for the __MAP_DATA__ payload.
+
+    Route points and vehicles stay JSON strings: the browser parses them per
+    request when the map opens, so one malformed value (e.g. NaN) only breaks
+    that map, not the whole payload.
+    """
+    get = req_data.get
+    route_polyline = get('route_polyline', '')
     if route_polyline is None or (isinstance(route_polyline, float) and math.isnan(route_polyline)):
         route_polyline = ''
-    else:
-        route_polyline = str(route_polyline)
-
-    route_points_json = req_data.get('route_points_json', '')
+    route_points_json = get('route_points_json', '')
     if route_points_json is None or (isinstance(route_points_json, float) and math.isnan(route_points_json)):
         route_points_json = '[]'
-    else:
-        route_points_json = str(route_points_json)
 
-    pl_list = req_data.get('pl_list', [])
-    pl_count = len(pl_list)
+    vehicles_data = []
+    for pl in get('pl_list', _EMPTY):
+        pl_id = pl.get('pl_id', '')
+        pl_number = _format_pl_number(pl_id)
+        for v in pl.get('vehicles', _EMPTY):
+            v_track = v.get('mon_track', [])
+            v_parkings = v.get('mon_parkings', [])
+            if v_track or v_parkings:
+                vehicles_data.append({
+                    'pl_id': pl_id,
+                    'pl_number': pl_number,
+                    'ts_reg_number': v.get('ts_reg_number', ''),
+                    'track': v_track,
+                    'parkings': v_parkings
+                })
+
+    return {
+        'polyline': str(route_polyline),
+        'routePoints': str(route_points_json),
+        'vehicles': _json_compact(vehicles_data) if vehicles_data else '[]',
+    }
+
+
+def _clean_str(val: Any) -> str:
+    """str(val), or '' for None/NaN."""
+    if val is None or (isinstance(val, float) and math.isnan(val)):
+        return ''
+    return str(val)
 
-    # Search data: include request number, all PL numbers, all vehicle reg numbers
+
+def _request_search_text(req_num: str, req_data: Dict[str, Any]) -> str:
+    """Search text of a request: request number, all PL numbers, all vehicle reg numbers and names."""
     search_parts = [str(req_num)]
-    for pl in pl_list:
+    for pl in req_data.get('pl_list', _EMPTY):
         search_parts.append(_format_pl_number(pl.get('pl_id', '')))
-        for v in pl.get('vehicles', []):
+        for v in pl.get('vehicles', _EMPTY):
             search_parts.append(str(v.get('ts_reg_number', '')))
             search_parts.append(str(v.get('ts_name_mo', '')))
-    search_data = ' '.join(search_parts)
+    return ' '.join(search_parts)
+
+
+def _request_cache_key(req_num: str, req_data: Dict[str, Any]) -> str:
+    """Content hash of one request; non-JSON values (numpy scalars) hash by str()."""
+    if orjson is not None:
+        data = orjson.dumps(
+            [str(req_num), req_data],
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+            default=str,
+        )
+    else:
+        data = json.dumps([str(req_num), req_data], sort_keys=True, default=str, ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(data, key=_RENDER_VERSION, digest_size=16).hexdigest()
+
+
+def _write_cache_file(path: Path, data: str) -> None:
+    """Write a cache entry atomically (temp file + rename); errors just skip caching."""
+    tmp = path.with_name('%s.%d.%d.tmp' % (path.name, os.getpid(), threading.get_ident()))
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(data, encoding='utf-8')
+        os.replace(tmp, path)
+    except OSError:
+        pass  # Read-only dir - run without the disk cache
+
+
+def _prune_request_cache() -> None:
+    """Drop cached records of other render versions and ones unused for REQUEST_CACHE_MAX_AGE."""
+    global _REQUEST_CACHE_PRUNED
+    with _RECORD_CACHE_LOCK:
+        if _REQUEST_CACHE_PRUNED:
+            return
+        _REQUEST_CACHE_PRUNED = True
+
+    cutoff = (datetime.now() - REQUEST_CACHE_MAX_AGE).timestamp()
+    for directory, current in ((REQUEST_CACHE_ROOT, False), (REQUEST_CACHE_DIR, True)):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue  # No cache yet - nothing to prune
+        for entry in entries:
+            try:
+                if current:
+                    if entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                elif entry.path == str(REQUEST_CACHE_DIR):
+                    continue
+                elif entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.unlink(entry.path)  # Flat layout of earlier versions
+            except OSError:
+                pass  # Read-only dir or removed concurrently
+
+
+def _render_request(item: Tuple[str, Dict[str, Any]]) -> str:
+    """
+    Render one (req_num, req_data) pair as a JSON record of the __REQUESTS__ payload.
+
+    Records of unchanged requests come from the in-process LRU or from
+    REQUEST_CACHE_DIR instead of being rendered again. Module-level so
+    process-pool workers can pickle it.
+    """
+    req_num, req_data = item
+    key = _request_cache_key(req_num, req_data)
+    with _RECORD_CACHE_LOCK:
+        record = _RECORD_CACHE.get(key)
+        if record is not None:
+            _RECORD_CACHE.move_to_end(key)
+            return record
+
+    path = REQUEST_CACHE_DIR / (key + '.json')
+    try:
+        record = path.read_text(encoding='utf-8')
+    except OSError:
+        record = _build_request_record(req_num, req_data)
+        _write_cache_file(path, record)
+    else:
+        try:
+            os.utime(path)  # Mark as used, pruning goes by mtime
+        except OSError:
+            pass
+
+    with _RECORD_CACHE_LOCK:
+        _RECORD_CACHE[key] = record
+        while len(_RECORD_CACHE) > _RECORD_CACHE_SIZE:
+            _RECORD_CACHE.popitem(last=False)
+    return record
+
+
+def _build_request_record(req_num: str, req_data: Dict[str, Any]) -> str:
+    """
+    Build the JSON record of one request.
+
+    The record holds the sort keys and the card HTML, which the page mounts
+    lazily; filter fields are in the separate __INDEX__ payload.
+    """
+    record = {
+        'num': str(req_num),
+        'date': _clean_str(req_data.get('route_start_date', '')),
+        'html': _minify_html(_build_request_html(req_num, req_data)),
+    }
+    return _script_json(record)
+
+
+def _json_array_items(records: Iterator[str]) -> Iterator[str]:
+    """Yield JSON records with separating commas (brackets are written by the caller)."""
+    for i, record in enumerate(records):
+        if i:
+            yield ','
+        yield record
+
+
+def _build_request_html(req_num: str, req_data: Dict[str, Any]) -> str:
+    """Build HTML for a single request with 3-column layout (V2)."""
+    get = req_data.get
+    status = get('request_status', '—')
+    date_processed = get('request_date_processed', '—')
+    start_addr = get('route_start_address', '—')
+    end_addr = get('route_end_address', '—')
+    start_date = get('route_start_date', '')
+    end_date = get('route_end_date', '')
+    time_zone_tag = get('route_time_zone_tag', '')
+
+    # Plan data
+    def _clean_value(val):
+        if val is None or val == '':
+            return ''
+        if isinstance(val, float) and math.isnan(val):
+            return ''
+        return val
+
+    cargo_name = _clean_value(get('order_name_cargo', ''))
+    cargo_weight = _clean_value(get('order_weight_cargo', ''))
+    cargo_volume = _clean_value(get('order_volume_cargo', ''))
+    count_ts = get('order_count_ts', '')
+    cnt_trip = get('order_cnt_trip', '')
+    route_distance = get('route_distance', '')
+    route_time = get('route_time', '')
+    object_expend = _clean_value(get('object_expend_name', ''))
+
+    pl_list = get('pl_list', [])
+    pl_count = len(pl_list)
 
     status_badge = 'badge-success' if 'COMPLETED' in status else 'badge-info'
 
     # Escape quotes in addresses for data attributes
     def safe_str(val):
-        import math
         if val is None or val == '':
             return ''
         if isinstance(val, float) and math.isnan(val):
             return ''
         return str(val)
 
-    start_addr_escaped = safe_str(start_addr).replace('"', '&quot;')
-    end_addr_escaped = safe_str(end_addr).replace('"', '&quot;')
-    object_expend_escaped = safe_str(object_expend).replace('"', '&quot;')
-
     tz_tag_html = f'<span class="timezone-tag">{time_zone_tag}</span>' if time_zone_tag else ''
 
-    # Escape for JS string
-    start_addr_js = safe_str(start_addr).replace("'", "\\'").replace('"', '\\"')
-    end_addr_js = safe_str(end_addr).replace("'", "\\'").replace('"', '\\"')
-    start_date_js = (start_date or '').replace("'", "\\'")
+    # Archive button arguments (data-* attributes)
+    start_addr_attr = _escape_cached(safe_str(start_addr))
+    end_addr_attr = _escape_cached(safe_str(end_addr))
+    start_date_attr = _escape_cached(start_date or '')
 
     # Build cargo HTML for header (label+название слева, вес/объём справа)
     cargo_html = ""
@@ -4043,15 +2476,17 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                             {cargo_details_html}
                         </div>'''
 
-    html = f"""
-        <div class="request" data-search="{search_data}" data-date="{start_date}" data-number="{req_num}" data-start-addr="{start_addr_escaped}" data-end-addr="{end_addr_escaped}" data-cost-obj="{object_expend_escaped}">
+    chunks = []
+    app = chunks.append
+    app(f"""
+        <div class="request" data-number="{req_num}">
             <!-- V2: Увеличенный хедер с данными заявки -->
-            <div class="request-header-v2" onclick="toggleRequestV2(this)">
+            <div class="request-header-v2" data-action="toggleRequest">
                 <div class="request-header-top">
                     <div class="request-header-left">
                         <div class="request-title">
                             <span class="expand-arrow down">▼</span>
-                            <span class="copyable" onclick="event.stopPropagation(); copyToClipboard('{req_num}', this.querySelector('.copy-btn'));">
+                            <span class="copyable" data-action="copy" data-copy="{req_num}">
                                 Заявка №{req_num}
                                 <button class="copy-btn" title="Копировать номер заявки">📋</button>
                             </span>
@@ -4063,7 +2498,7 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                     </div>
                     <div class="request-header-right">
                         {tz_tag_html}
-                        <button class="archive-btn" onclick="toggleArchive(event, '{req_num}', '{start_addr_js}', '{end_addr_js}', '{start_date_js}', {pl_count})" title="Добавить в архив просмотренных">★ В архив</button>
+                        <button class="btn archive-btn" data-action="archive" data-start-addr="{start_addr_attr}" data-end-addr="{end_addr_attr}" data-date="{start_date_attr}" data-pl-count="{pl_count}" title="Добавить в архив просмотренных">★ В архив</button>
                     </div>
                 </div>
                 <div class="request-header-data">
@@ -4102,24 +2537,24 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                     </div>
                 </div>
             </div>
-"""
+""")
 
-    # Collect structured vehicles data for map
-    vehicles_data = []
-    all_vehicles_flat = []  # Flat list for vehicle selector
+    # Flat list of vehicles for the selector (map data goes to the shared __MAP_DATA__ payload)
+    all_vehicles_flat = []
     vehicle_idx = 0
     for pl in pl_list:
         pl_id = pl.get('pl_id', '')
         pl_number = _format_pl_number(pl_id)
         for v in pl.get('vehicles', []):
-            v_track = v.get('mon_track', [])
-            v_parkings = v.get('mon_parkings', [])
+            vget = v.get
+            v_track = vget('mon_track', [])
+            v_parkings = vget('mon_parkings', [])
             vehicle_info = {
                 'pl_id': pl_id,
                 'pl_number': pl_number,
-                'ts_reg_number': v.get('ts_reg_number', ''),
-                'ts_name_mo': v.get('ts_name_mo', ''),
-                'ts_id_mo': v.get('ts_id_mo', ''),
+                'ts_reg_number': vget('ts_reg_number', ''),
+                'ts_name_mo': vget('ts_name_mo', ''),
+                'ts_id_mo': vget('ts_id_mo', ''),
                 'idx': vehicle_idx,
                 'track': v_track,
                 'parkings': v_parkings,
@@ -4128,23 +2563,8 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                 'date_in_plan': pl.get('pl_date_in_plan', '')
             }
             all_vehicles_flat.append(vehicle_info)
-            if v_track or v_parkings:
-                vehicles_data.append({
-                    'pl_id': pl_id,
-                    'pl_number': pl_number,
-                    'ts_reg_number': v.get('ts_reg_number', ''),
-                    'track': v_track,
-                    'parkings': v_parkings
-                })
             vehicle_idx += 1
 
-    vehicles_json = json.dumps(vehicles_data, ensure_ascii=False) if vehicles_data else '[]'
-
-    # Escape for HTML attributes
-    polyline_escaped = route_polyline.replace('"', '&quot;').replace("'", "&#39;")
-    route_points_escaped = route_points_json.replace('"', '&quot;').replace("'", "&#39;")
-    vehicles_escaped = vehicles_json.replace('"', '&quot;').replace("'", "&#39;")
-
     # Расчетный план калькулятор
     # Prepare default values for calculator
     calc_ts = _safe_float(count_ts) if _safe_float(count_ts) > 0 else 1
@@ -4166,12 +2586,12 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
     track_colors = ['#48bb78', '#ed64a6', '#4299e1', '#ecc94b', '#9f7aea', '#38b2ac', '#f56565']
 
     # V2: Subheader с расчётным планом и списком ПЛ
-    html += f"""
+    app(f"""
             <!-- V2: Subheader -->
             <div class="request-subheader" id="subheader-{req_num}">
                 <!-- Расчётный план (полная версия) -->
                 <div class="subheader-section">
-                    <div class="subheader-section-header" onclick="toggleSubheaderSection(this)">
+                    <div class="subheader-section-header" data-action="toggleSection">
                         <span class="subheader-section-title">Расчётный план</span>
                         <span class="subheader-section-toggle">▼</span>
                     </div>
@@ -4179,35 +2599,35 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                         <div class="calc-plan-grid">
                             <div class="calc-input-group">
                                 <label>Кол-во ТС</label>
-                                <input type="number" id="calc-ts-{req_num}" value="{int(calc_ts)}" min="1" onchange="updateCalcPlan('{req_num}')">
+                                <input type="number" id="calc-ts-{req_num}" value="{int(calc_ts)}" min="1" data-change="updateCalcPlan">
                             </div>
                             <div class="calc-input-group">
                                 <label>Кол-во ездок</label>
-                                <input type="number" id="calc-trips-{req_num}" value="{int(calc_trips)}" min="1" onchange="updateCalcPlan('{req_num}')">
+                                <input type="number" id="calc-trips-{req_num}" value="{int(calc_trips)}" min="1" data-change="updateCalcPlan">
                             </div>
                             <div class="calc-input-group">
                                 <label>Расстояние (км, в 1 сторону)</label>
-                                <input type="number" id="calc-dist-{req_num}" value="{calc_distance_km:.0f}" min="1" onchange="updateCalcPlan('{req_num}')">
+                                <input type="number" id="calc-dist-{req_num}" value="{calc_distance_km:.0f}" min="1" data-change="updateCalcPlan">
                             </div>
                             <div class="calc-input-group">
                                 <label>Скорость (км/ч)</label>
-                                <input type="number" id="calc-speed-{req_num}" value="65" min="10" max="120" onchange="updateCalcPlan('{req_num}')">
+                                <input type="number" id="calc-speed-{req_num}" value="65" min="10" max="120" data-change="updateCalcPlan">
                             </div>
                             <div class="calc-input-group">
                                 <label>Раб. часов в день</label>
-                                <input type="number" id="calc-hours-{req_num}" value="11" min="1" max="24" step="0.5" onchange="updateCalcPlan('{req_num}')">
+                                <input type="number" id="calc-hours-{req_num}" value="11" min="1" max="24" step="0.5" data-change="updateCalcPlan">
                             </div>
                             <div class="calc-input-group">
                                 <label>Время погрузки (ч)</label>
-                                <input type="number" id="calc-load-{req_num}" value="1.5" min="0" max="10" step="0.5" onchange="updateCalcPlan('{req_num}')">
+                                <input type="number" id="calc-load-{req_num}" value="1.5" min="0" max="10" step="0.5" data-change="updateCalcPlan">
                             </div>
                             <div class="calc-input-group">
                                 <label>Дата начала</label>
-                                <input type="text" id="calc-start-date-{req_num}" value="{start_date_val}" placeholder="ДД.ММ.ГГГГ" onchange="updateCalcPlan('{req_num}')">
+                                <input type="text" id="calc-start-date-{req_num}" value="{start_date_val}" placeholder="ДД.ММ.ГГГГ" data-change="updateCalcPlan">
                             </div>
                             <div class="calc-input-group">
                                 <label>Время начала</label>
-                                <input type="text" id="calc-start-time-{req_num}" value="{start_time_val}" placeholder="ЧЧ:ММ" onchange="updateCalcPlan('{req_num}')">
+                                <input type="text" id="calc-start-time-{req_num}" value="{start_time_val}" placeholder="ЧЧ:ММ" data-change="updateCalcPlan">
                             </div>
                         </div>
                         <div class="calc-results">
@@ -4248,16 +2668,16 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
 
                 <!-- Путевые листы (компактный список) -->
                 <div class="subheader-section">
-                    <div class="subheader-section-header" onclick="toggleSubheaderSection(this)">
+                    <div class="subheader-section-header" data-action="toggleSection">
                         <span class="subheader-section-title">Путевые листы ({pl_count})</span>
                         <span class="subheader-section-toggle">▼</span>
                     </div>
                     <div class="subheader-section-body active">
                         <div class="subheader-pl-list">
-"""
+""")
 
     if not pl_list:
-        html += '                            <span class="no-data">Нет связанных ПЛ</span>\n'
+        app('                            <span class="no-data">Нет связанных ПЛ</span>\n')
     else:
         vehicle_idx_counter = 0  # Counter for vehicle colors
         for pl_idx, pl in enumerate(pl_list):
@@ -4299,34 +2719,29 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
             if not vehicles:
                 vehicles_html = '<span class="subheader-pl-vehicle">—</span>'
 
-            html += f"""                            <div class="subheader-pl-item">
-                                <span class="subheader-pl-number">№{pl_number}</span>
-                                <span class="subheader-pl-dates">{date_out_short} → {date_in_short}</span>
-                                {vehicles_html}
-                            </div>
-"""
+            app(_PL_ITEM_TPL.format_map({
+                'pl_number': pl_number,
+                'date_out_short': date_out_short,
+                'date_in_short': date_in_short,
+                'vehicles_html': vehicles_html,
+            }))
 
-    html += """                        </div>
+    app("""                        </div>
                     </div>
                 </div>
             </div>
 
             <!-- V2: 2-колоночный Body Layout -->
             <div class="request-body request-body-layout-v2">
-"""
+""")
 
     # CENTER COLUMN: Map with params and timeline (теперь первая колонка)
-    html += f"""
+    app(f"""
                 <!-- CENTER COLUMN: Map -->
                 <div class="center-column">
                     <div class="vehicle-toggle-bar" id="vehicle-filters-{req_num}"></div>
 
                     <div id="map-{req_num}" class="map-container active">
-                        <div class="map-data"
-                             data-polyline="{polyline_escaped}"
-                             data-route-points="{route_points_escaped}"
-                             data-vehicles="{vehicles_escaped}">
-                        </div>
                         <div class="map-layout">
                             <div class="map-area">
                                 <div class="leaflet-map"></div>
@@ -4336,10 +2751,10 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                                     <span class="timeline-title">Таймлайн</span>
                                     <div class="timeline-parking-filter">
                                         <label>
-                                            <input type="checkbox" id="show-parkings-{req_num}" checked onchange="toggleParkings('{req_num}')">
+                                            <input type="checkbox" id="show-parkings-{req_num}" checked data-change="toggleParkings">
                                             <span>🅿️</span>
                                         </label>
-                                        <input type="number" id="min-parking-{req_num}" value="0" min="0" onchange="updateMapFilters('{req_num}')">
+                                        <input type="number" id="min-parking-{req_num}" value="0" min="0" data-change="updateMapFilters">
                                         <span>мин</span>
                                     </div>
                                 </div>
@@ -4350,23 +2765,23 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                                     <span style="color:#a0aec0;">—</span>
                                     <input type="date" id="end-date-{req_num}" style="font-size:10px;padding:2px 4px;border:1px solid #e2e8f0;border-radius:3px;">
                                     <input type="time" id="end-time-{req_num}" value="23:59" style="width:55px;font-size:10px;padding:2px 4px;border:1px solid #e2e8f0;border-radius:3px;">
-                                    <button onclick="applyTimeFilter('{req_num}')" style="font-size:10px;padding:2px 6px;background:#48bb78;color:white;border:none;border-radius:3px;cursor:pointer;" title="Применить фильтр">✓</button>
-                                    <button onclick="clearTimeFilter('{req_num}')" style="font-size:10px;padding:2px 6px;background:#e53e3e;color:white;border:none;border-radius:3px;cursor:pointer;" title="Сбросить фильтр">✕</button>
+                                    <button data-action="applyTimeFilter" style="font-size:10px;padding:2px 6px;background:#48bb78;color:white;border:none;border-radius:3px;cursor:pointer;" title="Применить фильтр">✓</button>
+                                    <button data-action="clearTimeFilter" style="font-size:10px;padding:2px 6px;background:#e53e3e;color:white;border:none;border-radius:3px;cursor:pointer;" title="Сбросить фильтр">✕</button>
                                 </div>
                                 <div class="timeline-items"></div>
                             </div>
                         </div>
                     </div>
                 </div>
-"""
+""")
 
     # RIGHT COLUMN: Vehicle selector + fact panel
-    html += f"""
+    app(f"""
                 <!-- RIGHT COLUMN: Vehicle Selector + Fact -->
                 <div class="right-column">
                     <div class="vehicle-selector">
                         <div class="vehicle-selector-title">Выберите машину</div>
-"""
+""")
 
     # Build vehicle selector items
     for v_info in all_vehicles_flat:
@@ -4384,39 +2799,41 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                 break
 
         selected_class = ' selected' if v_info['idx'] == 0 else ''
-        html += f"""                        <div class="vehicle-selector-item{selected_class}" data-vehicle-uid="{vehicle_uid}" onclick="selectVehicleV2('{req_num}', '{vehicle_uid}', {v_info['idx']})">
-                            <span class="vehicle-selector-color" style="background:{color}"></span>
-                            <div class="vehicle-selector-info">
-                                <div class="vehicle-selector-reg">{reg}</div>
-                                <div class="vehicle-selector-name">{name} · ПЛ {pl_num}</div>
-                            </div>
-                        </div>
-"""
-
-    html += f"""                    </div>
+        app(_VEHICLE_SELECTOR_TPL.format_map({
+            'selected_class': selected_class,
+            'vehicle_uid': vehicle_uid,
+            'req_num': req_num,
+            'idx': v_info['idx'],
+            'color': color,
+            'reg': reg,
+            'name': name,
+            'pl_num': pl_num,
+        }))
+
+    app(f"""                    </div>
 
                     <div class="active-vehicle-panel" id="vehicle-fact-{req_num}">
-"""
+""")
 
     # Pre-render first vehicle's fact panel
     if all_vehicles_flat:
         first_v = all_vehicles_flat[0]
         vehicle_uid = f"{req_num}_0_v0"
-        html += _build_vehicle_fact_panel_v2(
+        app(_build_vehicle_fact_panel_v2(
             first_v['vehicle_data'],
             vehicle_uid,
             pl_id=first_v['pl_id'],
             from_date=first_v['date_out_plan'],
             to_date=first_v['date_in_plan']
-        )
+        ))
     else:
-        html += '                        <div class="no-data">Нет данных о машинах</div>\n'
+        app('                        <div class="no-data">Нет данных о машинах</div>\n')
 
-    html += f"""                    </div>
+    app(f"""                    </div>
 
                     <!-- Hidden cache of all vehicle panels -->
                     <div class="vehicle-panels-cache" id="vehicle-cache-{req_num}">
-"""
+""")
 
     # Pre-render all vehicle panels for JS switching
     for v_info in all_vehicles_flat:
@@ -4426,22 +2843,22 @@ def _build_request_html(req_num: str, req_data: Dict) -> str:
                 vehicle_uid = f"{req_num}_{pl_idx}_v{v_idx_in_pl}"
                 break
 
-        html += f'                        <div data-vehicle-uid="{vehicle_uid}">\n'
-        html += _build_vehicle_fact_panel_v2(
+        app(f'                        <div data-vehicle-uid="{vehicle_uid}">\n')
+        app(_build_vehicle_fact_panel_v2(
             v_info['vehicle_data'],
             vehicle_uid,
             pl_id=v_info['pl_id'],
             from_date=v_info['date_out_plan'],
             to_date=v_info['date_in_plan']
-        )
-        html += '                        </div>\n'
+        ))
+        app('                        </div>\n')
 
-    html += """                    </div>
+    app("""                    </div>
                 </div>
             </div>
         </div>
-"""
-    return html
+""")
+    return ''.join(chunks)
 
 
 def _build_vehicle_fact_panel_v2(vehicle: Dict, vehicle_uid: str = "", pl_id: str = "", from_date: str = "", to_date: str = "") -> str:
@@ -4462,59 +2879,61 @@ def _build_vehicle_fact_panel_v2(vehicle: Dict, vehicle_uid: str = "", pl_id: st
     parkings = vehicle.get('mon_parkings', [])
     fuels = vehicle.get('mon_fuels', [])
 
-    html = f"""
+    chunks = []
+    app = chunks.append
+    app(f"""
                         <div class="vehicle-header" style="background:#f7fafc;padding:10px 12px;border-bottom:1px solid #e2e8f0;">
                             <span class="vehicle-reg" style="font-weight:600;font-family:monospace;">{reg_number}</span>
                             <span class="vehicle-name" style="color:#718096;font-size:12px;"> — {name}</span>
                         </div>
                         <div class="fact-section" style="padding:12px;">
                             <div class="fact-title">Факт (мониторинг)</div>
-"""
+""")
 
     # Check for valid monitoring data
     has_monitoring = _safe_float(distance) > 0 or _safe_float(engine_hours) > 0
 
     if has_monitoring:
-        html += """                            <div class="fact-grid">
-"""
+        app("""                            <div class="fact-grid">
+""")
         if _safe_float(distance) > 0:
-            html += f'                                <div class="fact-item"><div class="label">Пробег</div><div class="value">{_safe_float(distance):.1f} км</div></div>\n'
+            app(f'                                <div class="fact-item"><div class="label">Пробег</div><div class="value">{_safe_float(distance):.1f} км</div></div>\n')
         if _safe_float(moving_hours) > 0:
-            html += f'                                <div class="fact-item"><div class="label">В движении</div><div class="value">{_safe_float(moving_hours):.1f} ч</div></div>\n'
+            app(f'                                <div class="fact-item"><div class="label">В движении</div><div class="value">{_safe_float(moving_hours):.1f} ч</div></div>\n')
         if _safe_float(engine_hours) > 0:
-            html += f'                                <div class="fact-item"><div class="label">Двигатель</div><div class="value">{_safe_float(engine_hours):.1f} ч</div></div>\n'
+            app(f'                                <div class="fact-item"><div class="label">Двигатель</div><div class="value">{_safe_float(engine_hours):.1f} ч</div></div>\n')
         if _safe_float(idling_hours) > 0:
-            html += f'                                <div class="fact-item"><div class="label">Простой</div><div class="value">{_safe_float(idling_hours):.1f} ч</div></div>\n'
+            app(f'                                <div class="fact-item"><div class="label">Простой</div><div class="value">{_safe_float(idling_hours):.1f} ч</div></div>\n')
         if _safe_float(fuel_rate) > 0:
-            html += f'                                <div class="fact-item"><div class="label">Топливо</div><div class="value">{_safe_float(fuel_rate):.1f} л</div></div>\n'
+            app(f'                                <div class="fact-item"><div class="label">Топливо</div><div class="value">{_safe_float(fuel_rate):.1f} л</div></div>\n')
         if parkings_count:
-            html += f'                                <div class="fact-item"><div class="label">Стоянок</div><div class="value">{parkings_count}</div></div>\n'
-        html += """                            </div>
-"""
+            app(f'                                <div class="fact-item"><div class="label">Стоянок</div><div class="value">{parkings_count}</div></div>\n')
+        app("""                            </div>
+""")
     else:
-        html += '                            <div class="no-data">Нет данных мониторинга</div>\n'
+        app('                            <div class="no-data">Нет данных мониторинга</div>\n')
 
     # Shift loading button (moved here - right after Fact section)
     ts_id_mo = vehicle.get('ts_id_mo', '')
     if ts_id_mo and from_date and to_date:
-        pl_id_js = (pl_id or '').replace("'", "\\'")
-        from_date_js = (from_date or '').replace("'", "\\'")
-        to_date_js = (to_date or '').replace("'", "\\'")
+        pl_id_attr = _escape_cached(pl_id or '')
+        from_date_attr = _escape_cached(from_date or '')
+        to_date_attr = _escape_cached(to_date or '')
 
-        html += f"""
-                            <button class="shift-load-btn" id="shift-btn-{vehicle_uid}"
-                                    onclick="loadShifts('{vehicle_uid}', '{pl_id_js}', {ts_id_mo}, '{from_date_js}', '{to_date_js}')"
+        app(f"""
+                            <button class="btn shift-load-btn" id="shift-btn-{vehicle_uid}"
+                                    data-action="loadShifts" data-vehicle="{vehicle_uid}" data-pl="{pl_id_attr}" data-ts-id="{ts_id_mo}" data-from="{from_date_attr}" data-to="{to_date_attr}"
                                     style="margin-top:10px;font-size:11px;padding:6px 12px;">
                                 📊 Загрузить по сменам
                             </button>
                             <div class="shift-container" id="shift-container-{vehicle_uid}"></div>
-"""
+""")
 
     # Fuels section
     if fuels:
-        html += """                            <div class="fuels-section" style="margin-top:12px;">
+        app("""                            <div class="fuels-section" style="margin-top:12px;">
                                 <div class="fuels-title" style="font-size:12px;font-weight:600;color:#553c9a;margin-bottom:8px;">⛽ Топливо</div>
-"""
+""")
         for fuel in fuels:
             fuel_name = fuel.get('name', '—')
             charges = _safe_float(fuel.get('charges'))
@@ -4523,27 +2942,22 @@ def _build_vehicle_fact_panel_v2(vehicle: Dict, vehicle_uid: str = "", pl_id: st
             value_begin = _safe_float(fuel.get('value_begin'))
             value_end = _safe_float(fuel.get('value_end'))
 
-            html += f"""                                <div class="fuel-item" style="background:#faf5ff;border:1px solid #d6bcfa;border-radius:4px;padding:8px;margin-bottom:6px;font-size:12px;">
-                                    <div style="font-weight:500;color:#553c9a;margin-bottom:4px;">{fuel_name}</div>
-                                    <div style="display:grid;grid-template-columns:repeat(3,1fr);gap:6px;font-size:11px;">
-                                        <div><span style="color:#805ad5;">Заправки:</span> {charges:.1f}л</div>
-                                        <div><span style="color:#805ad5;">Сливы:</span> {discharges:.1f}л</div>
-                                        <div><span style="color:#805ad5;">Расход:</span> {rate:.1f}л</div>
-                                    </div>
-                                    <div style="display:flex;gap:12px;font-size:11px;margin-top:4px;color:#718096;">
-                                        <span>Начало: {value_begin:.1f}л</span>
-                                        <span>Конец: {value_end:.1f}л</span>
-                                    </div>
-                                </div>
-"""
-        html += """                            </div>
-"""
+            app(_FUEL_TPL.format_map({
+                'fuel_name': fuel_name,
+                'charges': charges,
+                'discharges': discharges,
+                'rate': rate,
+                'value_begin': value_begin,
+                'value_end': value_end,
+            }))
+        app("""                            </div>
+""")
 
     # Parkings - grouped by day
     if parkings:
-        html += """                            <div class="parkings-section" style="margin-top:12px;">
+        app("""                            <div class="parkings-section" style="margin-top:12px;">
                                 <div class="parkings-title" style="font-size:12px;font-weight:600;color:#744210;margin-bottom:8px;">🅿️ Стоянки</div>
-"""
+""")
         # Group parkings by day
         from collections import defaultdict
         parkings_by_day = defaultdict(list)
@@ -4567,11 +2981,11 @@ def _build_vehicle_fact_panel_v2(vehicle: Dict, vehicle_uid: str = "", pl_id: st
             # Format day for display
             day_display = day if day != 'unknown' else 'Без даты'
 
-            html += f"""                                <div class="parking-day-group" style="margin-bottom:8px;">
-                                    <div class="parking-day-header" style="font-size:11px;font-weight:600;color:#744210;background:#fef3c7;padding:4px 8px;border-radius:4px;margin-bottom:4px;">
-                                        📅 {day_display} — всего {total_str} ({len(day_parkings)} ст.)
-                                    </div>
-"""
+            app(_PARKING_DAY_TPL.format_map({
+                'day_display': day_display,
+                'total_str': total_str,
+                'count': len(day_parkings),
+            }))
             # Show first 4 parkings per day
             for p in day_parkings[:4]:
                 duration = p.get('duration_min') or 0
@@ -4580,21 +2994,23 @@ def _build_vehicle_fact_panel_v2(vehicle: Dict, vehicle_uid: str = "", pl_id: st
                 end_time = _extract_time(p.get('end', ''))
                 address = p.get('address', '—')
                 address_short = address[:50] + ('...' if len(address) > 50 else '')
-                html += f"""                                    <div class="parking-item" data-duration="{int(duration)}" style="background:#fffaf0;border:1px solid #fbd38d;border-radius:4px;padding:6px 10px;margin-bottom:4px;font-size:12px;">
-                                        <div class="parking-time" style="font-weight:500;color:#744210;">{begin_time} → {end_time} ({dur_str})</div>
-                                        <div class="parking-address" style="font-size:11px;color:#975a16;margin-top:2px;">{address_short}</div>
-                                    </div>
-"""
+                app(_PARKING_TPL.format_map({
+                    'duration': int(duration),
+                    'begin_time': begin_time,
+                    'end_time': end_time,
+                    'dur_str': dur_str,
+                    'address_short': address_short,
+                }))
             if len(day_parkings) > 4:
-                html += f'                                    <div style="font-size:11px;color:#718096;padding:2px 10px;text-align:center;">...ещё {len(day_parkings)-4} стоянок за этот день</div>\n'
-            html += """                                </div>
-"""
-        html += """                            </div>
-"""
+                app(f'                                    <div style="font-size:11px;color:#718096;padding:2px 10px;text-align:center;">...ещё {len(day_parkings)-4} стоянок за этот день</div>\n')
+            app("""                                </div>
+""")
+        app("""                            </div>
+""")
 
-    html += """                        </div>
-"""
-    return html
+    app("""                        </div>
+""")
+    return ''.join(chunks)
 
 
 def _build_pl_html(pl_data: Dict, pl_uid: str) -> str:
@@ -4608,12 +3024,14 @@ def _build_pl_html(pl_data: Dict, pl_uid: str) -> str:
 
     vehicles = pl_data.get('vehicles', [])
 
-    html = f"""
+    chunks = []
+    app = chunks.append
+    app(f"""
                 <div class="pl-card">
-                    <div class="pl-header" onclick="togglePL('{pl_uid}'); var arrow = this.querySelector('.expand-arrow'); arrow.classList.toggle('up');">
+                    <div class="pl-header" data-action="togglePL" data-pl="{pl_uid}">
                         <div>
                             <span class="expand-arrow down">▼</span>
-                            <span class="pl-number copyable" onclick="event.stopPropagation(); copyToClipboard('{pl_number}', this.querySelector('.copy-btn'));">
+                            <span class="pl-number copyable" data-action="copy" data-copy="{pl_number}">
                                 ПЛ №{pl_number}
                                 <button class="copy-btn" title="Копировать номер ПЛ">📋</button>
                             </span>
@@ -4625,25 +3043,25 @@ def _build_pl_html(pl_data: Dict, pl_uid: str) -> str:
                         <div style="font-size: 13px; color: #718096; margin-bottom: 12px;">
                             План: {date_out_plan or '—'} → {date_in_plan or '—'}
                         </div>
-"""
+""")
 
     if not vehicles:
-        html += '                        <div class="no-data">Нет транспортных средств</div>\n'
+        app('                        <div class="no-data">Нет транспортных средств</div>\n')
     else:
         for v_idx, vehicle in enumerate(vehicles):
             vehicle_uid = f"{pl_uid}_v{v_idx}"
-            html += _build_vehicle_html(
+            app(_build_vehicle_html(
                 vehicle,
                 vehicle_uid,
                 pl_id=pl_id,
                 from_date=date_out_plan,
                 to_date=date_in_plan
-            )
+            ))
 
-    html += """                    </div>
+    app("""                    </div>
                 </div>
-"""
-    return html
+""")
+    return ''.join(chunks)
 
 
 def _build_vehicle_html(vehicle: Dict, vehicle_uid: str = "", pl_id: str = "", from_date: str = "", to_date: str = "") -> str:
@@ -4664,10 +3082,12 @@ def _build_vehicle_html(vehicle: Dict, vehicle_uid: str = "", pl_id: str = "", f
     parkings = vehicle.get('mon_parkings', [])
     fuels = vehicle.get('mon_fuels', [])
 
-    html = f"""
+    chunks = []
+    app = chunks.append
+    app(f"""
                         <div class="vehicle-card">
                             <div class="vehicle-header">
-                                <span class="vehicle-reg copyable" onclick="copyToClipboard('{reg_number}', this.querySelector('.copy-btn'));">
+                                <span class="vehicle-reg copyable" data-action="copy" data-copy="{reg_number}">
                                     {reg_number}
                                     <button class="copy-btn" title="Копировать номер машины">📋</button>
                                 </span>
@@ -4675,38 +3095,38 @@ def _build_vehicle_html(vehicle: Dict, vehicle_uid: str = "", pl_id: str = "", f
                             </div>
                             <div class="fact-section">
                                 <div class="fact-title">Факт (мониторинг)</div>
-"""
+""")
 
     # Check for valid monitoring data (not None and not NaN)
     has_monitoring = _safe_float(distance) > 0 or _safe_float(engine_hours) > 0
 
     if has_monitoring:
-        html += """                                <div class="fact-grid">
-"""
+        app("""                                <div class="fact-grid">
+""")
         if _safe_float(distance) > 0:
-            html += f'                                    <div class="fact-item"><div class="label">Пробег</div><div class="value">{_safe_float(distance):.1f} км</div></div>\n'
+            app(f'                                    <div class="fact-item"><div class="label">Пробег</div><div class="value">{_safe_float(distance):.1f} км</div></div>\n')
         if _safe_float(moving_hours) > 0:
-            html += f'                                    <div class="fact-item"><div class="label">В движении</div><div class="value">{_safe_float(moving_hours):.1f} ч</div></div>\n'
+            app(f'                                    <div class="fact-item"><div class="label">В движении</div><div class="value">{_safe_float(moving_hours):.1f} ч</div></div>\n')
         if _safe_float(engine_hours) > 0:
-            html += f'                                    <div class="fact-item"><div class="label">Двигатель</div><div class="value">{_safe_float(engine_hours):.1f} ч</div></div>\n'
+            app(f'                                    <div class="fact-item"><div class="label">Двигатель</div><div class="value">{_safe_float(engine_hours):.1f} ч</div></div>\n')
         if _safe_float(idling_hours) > 0:
-            html += f'                                    <div class="fact-item"><div class="label">Простой</div><div class="value">{_safe_float(idling_hours):.1f} ч</div></div>\n'
+            app(f'                                    <div class="fact-item"><div class="label">Простой</div><div class="value">{_safe_float(idling_hours):.1f} ч</div></div>\n')
         if _safe_float(fuel_rate) > 0:
-            html += f'                                    <div class="fact-item"><div class="label">Расход топлива</div><div class="value">{_safe_float(fuel_rate):.1f} л</div></div>\n'
+            app(f'                                    <div class="fact-item"><div class="label">Расход топлива</div><div class="value">{_safe_float(fuel_rate):.1f} л</div></div>\n')
         if parkings_count:
-            html += f'                                    <div class="fact-item"><div class="label">Стоянок</div><div class="value">{parkings_count} ({_safe_float(parkings_total):.1f} ч)</div></div>\n'
-        html += """                                </div>
-"""
+            app(f'                                    <div class="fact-item"><div class="label">Стоянок</div><div class="value">{parkings_count} ({_safe_float(parkings_total):.1f} ч)</div></div>\n')
+        app("""                                </div>
+""")
     else:
-        html += '                                <div class="no-data">Нет данных мониторинга</div>\n'
+        app('                                <div class="no-data">Нет данных мониторинга</div>\n')
 
     # Fuels details
     if fuels:
-        html += """                                <div class="fuels-section">
+        app("""                                <div class="fuels-section">
                                     <div class="fuels-title">⛽ Топливо</div>
-"""
+""")
         for fuel in fuels:
-            html += f"""                                    <div class="fuel-item">
+            app(f"""                                    <div class="fuel-item">
                                         <div class="fuel-stat"><div class="label">Тип</div><div class="value">{fuel.get('name', '—')}</div></div>
                                         <div class="fuel-stat"><div class="label">Заправки</div><div class="value">{_safe_float(fuel.get('charges')):.1f} л</div></div>
                                         <div class="fuel-stat"><div class="label">Сливы</div><div class="value">{_safe_float(fuel.get('discharges')):.1f} л</div></div>
@@ -4714,9 +3134,9 @@ def _build_vehicle_html(vehicle: Dict, vehicle_uid: str = "", pl_id: str = "", f
                                         <div class="fuel-stat"><div class="label">Начало</div><div class="value">{_safe_float(fuel.get('value_begin')):.1f} л</div></div>
                                         <div class="fuel-stat"><div class="label">Конец</div><div class="value">{_safe_float(fuel.get('value_end')):.1f} л</div></div>
                                     </div>
-"""
-        html += """                                </div>
-"""
+""")
+        app("""                                </div>
+""")
 
     # Parkings details - grouped by day with navigation
     if parkings:
@@ -4734,30 +3154,30 @@ def _build_vehicle_html(vehicle: Dict, vehicle_uid: str = "", pl_id: str = "", f
         sorted_days = sorted(parkings_by_day.keys(), key=_parse_date_for_sort)
         num_days = len(sorted_days)
 
-        html += """                                <div class="parkings-section">
+        app("""                                <div class="parkings-section">
                                     <div class="parkings-title">🅿️ Стоянки</div>
-"""
+""")
 
         # Day navigation (only if more than 1 day)
         if num_days > 1:
-            html += f"""                                    <div class="day-nav" id="day-nav-{vehicle_uid}">
-"""
+            app(f"""                                    <div class="day-nav" id="day-nav-{vehicle_uid}">
+""")
             for idx, day in enumerate(sorted_days):
                 day_parkings = parkings_by_day[day]
                 day_total_min = sum(p.get('duration_min') or 0 for p in day_parkings)
                 day_total_str = _format_duration_minutes(day_total_min)
                 active_class = ' active' if idx == 0 else ''
-                html += f"""                                        <button class="day-nav-btn{active_class}" onclick="switchDay('{vehicle_uid}', {idx})">
+                app(f"""                                        <button class="day-nav-btn{active_class}" data-action="switchDay" data-vehicle="{vehicle_uid}" data-idx="{idx}">
                                             📅 {day}
-                                            <span class="day-stats">({len(day_parkings)} ст., {day_total_str})</span>
+                                            <span class="day-stats-count">({len(day_parkings)} ст., {day_total_str})</span>
                                         </button>
-"""
-            html += """                                    </div>
-"""
+""")
+            app("""                                    </div>
+""")
 
         # Day content containers
-        html += f"""                                    <div id="day-container-{vehicle_uid}">
-"""
+        app(f"""                                    <div id="day-container-{vehicle_uid}">
+""")
         for idx, day in enumerate(sorted_days):
             day_parkings = parkings_by_day[day]
             active_class = ' active' if idx == 0 or num_days == 1 else ''
@@ -4765,67 +3185,67 @@ def _build_vehicle_html(vehicle: Dict, vehicle_uid: str = "", pl_id: str = "", f
             # Calculate day summary
             day_total_min = sum(p.get('duration_min') or 0 for p in day_parkings)
 
-            html += f"""                                        <div class="day-content{active_class}">
-"""
+            app(f"""                                        <div class="day-content{active_class}">
+""")
             # Day summary (if multiple days)
             if num_days > 1:
-                html += f"""                                            <div class="day-summary">
+                app(f"""                                            <div class="day-summary">
                                                 <div class="day-summary-title">📅 {day}</div>
                                                 <div class="day-summary-grid">
                                                     <div class="day-summary-item">
-                                                        <div class="label">Стоянок</div>
-                                                        <div class="value">{len(day_parkings)}</div>
+                                                        <div class="day-summary-label">Стоянок</div>
+                                                        <div class="day-summary-value">{len(day_parkings)}</div>
                                                     </div>
                                                     <div class="day-summary-item">
-                                                        <div class="label">Общее время</div>
-                                                        <div class="value">{_format_duration_minutes(day_total_min)}</div>
+                                                        <div class="day-summary-label">Общее время</div>
+                                                        <div class="day-summary-value">{_format_duration_minutes(day_total_min)}</div>
                                                     </div>
                                                 </div>
                                             </div>
-"""
+""")
 
-            html += f"""                                            <div class="parking-day-group">
+            app(f"""                                            <div class="parking-day-group">
                                                 <div class="parking-day-items" style="border-radius: 4px;">
-"""
+""")
             for p in day_parkings:
                 duration = p.get('duration_min') or 0
                 dur_str = _format_duration_minutes(duration)
                 begin_time = _extract_time(p.get('begin', ''))
                 end_time = _extract_time(p.get('end', ''))
                 address = p.get('address', '—')
-                html += f"""                                                    <div class="parking-item" data-duration="{int(duration)}">
+                app(f"""                                                    <div class="parking-item" data-duration="{int(duration)}">
                                                         <div class="parking-time">{begin_time} → {end_time} ({dur_str})</div>
                                                         <div class="parking-address">{address}</div>
                                                     </div>
-"""
-            html += """                                                </div>
+""")
+            app("""                                                </div>
                                             </div>
                                         </div>
-"""
-        html += """                                    </div>
+""")
+        app("""                                    </div>
                                 </div>
-"""
+""")
 
     # Shift loading button and container
     ts_id_mo = vehicle.get('ts_id_mo', '')
     if ts_id_mo and from_date and to_date:
-        # Escape values for JS
-        pl_id_js = pl_id.replace("'", "\\'") if pl_id else ''
-        from_date_js = from_date.replace("'", "\\'") if from_date else ''
-        to_date_js = to_date.replace("'", "\\'") if to_date else ''
-
-        html += f"""
-                                <button class="shift-load-btn" id="shift-btn-{vehicle_uid}"
-                                        onclick="loadShifts('{vehicle_uid}', '{pl_id_js}', {ts_id_mo}, '{from_date_js}', '{to_date_js}')">
+        # Escape values for data-* attributes
+        pl_id_attr = _escape_cached(pl_id) if pl_id else ''
+        from_date_attr = _escape_cached(from_date) if from_date else ''
+        to_date_attr = _escape_cached(to_date) if to_date else ''
+
+        app(f"""
+                                <button class="btn shift-load-btn" id="shift-btn-{vehicle_uid}"
+                                        data-action="loadShifts" data-vehicle="{vehicle_uid}" data-pl="{pl_id_attr}" data-ts-id="{ts_id_mo}" data-from="{from_date_attr}" data-to="{to_date_attr}">
                                     📊 Загрузить по сменам
                                 </button>
                                 <div class="shift-container" id="shift-container-{vehicle_uid}"></div>
-"""
+""")
 
-    html += """                            </div>
+    app("""                            </div>
                         </div>
-"""
-    return html
+""")
+    return ''.join(chunks)
 
 
 def _format_int(val) -> str:
@@ -4833,7 +3253,6 @@ def _format_int(val) -> str:
     if val is None or val == '':
         return '—'
     try:
-        import math
         if isinstance(val, float) and math.isnan(val):
             return '—'
         return str(int(val))
@@ -4846,7 +3265,6 @@ def _format_number(val) -> str:
     if val is None or val == '':
         return '—'
     try:
-        import math
         if isinstance(val, float) and math.isnan(val):
             return '—'
         return f"{float(val):,.0f}".replace(',', ' ')
@@ -4859,7 +3277,6 @@ def _format_distance_km(meters) -> str:
     if meters is None or meters == '':
         return '—'
     try:
-        import math
         if isinstance(meters, float) and math.isnan(meters):
             return '—'
         km = float(meters) / 1000
@@ -4876,7 +3293,6 @@ def _format_time(milliseconds) -> str:
     if milliseconds is None or milliseconds == '':
         return '—'
     try:
-        import math
         if isinstance(milliseconds, float) and math.isnan(milliseconds):
             return '—'
         total_seconds = int(float(milliseconds) / 1000)  # Convert ms to seconds
@@ -4892,7 +3308,6 @@ def _safe_float(val, default=0) -> float:
     if val is None or val == '':
         return default
     try:
-        import math
         f = float(val)
         if math.isnan(f):
             return default
@@ -4957,15 +3372,37 @@ def _format_duration_minutes(minutes) -> str:
         return '—'
 
 
+def _iter_rows(matched_data):
+    """
+    Yield (getter, mon_items) per row for a DataFrame or a list of dicts.
+
+    DataFrames are walked with itertuples() and a column-index map, so no
+    per-row dict is materialized; a list of dicts is still accepted for
+    callers that attach nested monitoring (parkings, track) per record.
+    """
+    if hasattr(matched_data, 'itertuples'):
+        col_idx = {col: i for i, col in enumerate(matched_data.columns)}
+        mon_idx = [(col, i) for col, i in col_idx.items() if str(col).startswith('mon_')]
+        for values in matched_data.itertuples(index=False, name=None):
+            def get(key, default=None, _values=values):
+                i = col_idx.get(key)
+                return default if i is None else _values[i]
+            yield get, [(col, values[i]) for col, i in mon_idx]
+    else:
+        for row in matched_data:
+            yield row.get, [(key, value) for key, value in row.items() if key.startswith('mon_')]
+
+
 def build_hierarchy(
-    matched_data: List[Dict],
+    matched_data,
     unmatched_requests: List[Dict] = None
 ) -> Dict[str, Any]:
     """
     Build hierarchical structure from flat matched data.
 
     Args:
-        matched_data: List of matched records (Request + PL + Vehicle + Monitoring)
+        matched_data: Matched records (Request + PL + Vehicle + Monitoring),
+            as a DataFrame or a list of dicts
         unmatched_requests: Optional list of requests without PL (ignored now)
 
     Returns:
@@ -4974,37 +3411,37 @@ def build_hierarchy(
     hierarchy = {}
 
     # Process matched data
-    for row in matched_data:
-        req_num = str(row.get('request_number', 'unknown'))
+    for get, mon_items in _iter_rows(matched_data):
+        req_num = str(get('request_number', 'unknown'))
 
         # Initialize request if new
         if req_num not in hierarchy:
             hierarchy[req_num] = {
                 'request_number': req_num,
-                'request_status': row.get('request_status'),
-                'request_date_processed': row.get('request_date_processed'),
-                'route_start_address': row.get('route_start_address'),
-                'route_end_address': row.get('route_end_address'),
-                'route_start_date': row.get('route_start_date'),
-                'route_end_date': row.get('route_end_date'),
-                'route_time_zone_tag': row.get('route_time_zone_tag'),
+                'request_status': get('request_status'),
+                'request_date_processed': get('request_date_processed'),
+                'route_start_address': get('route_start_address'),
+                'route_end_address': get('route_end_address'),
+                'route_start_date': get('route_start_date'),
+                'route_end_date': get('route_end_date'),
+                'route_time_zone_tag': get('route_time_zone_tag'),
                 # Plan fields
-                'order_name_cargo': row.get('order_name_cargo'),
-                'order_weight_cargo': row.get('order_weight_cargo'),
-                'order_volume_cargo': row.get('order_volume_cargo'),
-                'order_count_ts': row.get('order_count_ts'),
-                'order_cnt_trip': row.get('order_cnt_trip'),
-                'route_distance': row.get('route_distance'),
-                'route_time': row.get('route_time'),
-                'object_expend_name': row.get('object_expend_name'),
+                'order_name_cargo': get('order_name_cargo'),
+                'order_weight_cargo': get('order_weight_cargo'),
+                'order_volume_cargo': get('order_volume_cargo'),
+                'order_count_ts': get('order_count_ts'),
+                'order_cnt_trip': get('order_cnt_trip'),
+                'route_distance': get('route_distance'),
+                'route_time': get('route_time'),
+                'object_expend_name': get('object_expend_name'),
                 # Map data
-                'route_polyline': row.get('route_polyline'),
-                'route_points_json': row.get('route_points_json'),
+                'route_polyline': get('route_polyline'),
+                'route_points_json': get('route_points_json'),
                 'pl_list': []
             }
 
         # Find or create PL
-        pl_id = row.get('pl_id')
+        pl_id = get('pl_id')
         pl_list = hierarchy[req_num]['pl_list']
 
         pl_entry = None
@@ -5016,25 +3453,23 @@ def build_hierarchy(
         if pl_entry is None:
             pl_entry = {
                 'pl_id': pl_id,
-                'pl_date_out': row.get('pl_date_out'),
-                'pl_date_out_plan': row.get('pl_date_out_plan'),
-                'pl_date_in_plan': row.get('pl_date_in_plan'),
-                'pl_status': row.get('pl_status'),
+                'pl_date_out': get('pl_date_out'),
+                'pl_date_out_plan': get('pl_date_out_plan'),
+                'pl_date_in_plan': get('pl_date_in_plan'),
+                'pl_status': get('pl_status'),
                 'vehicles': []
             }
             pl_list.append(pl_entry)
 
         # Add vehicle with monitoring
         vehicle = {
-            'ts_id_mo': row.get('ts_id_mo'),
-            'ts_reg_number': row.get('ts_reg_number'),
-            'ts_name_mo': row.get('ts_name_mo'),
+            'ts_id_mo': get('ts_id_mo'),
+            'ts_reg_number': get('ts_reg_number'),
+            'ts_name_mo': get('ts_name_mo'),
         }
 
         # Add monitoring fields
-        for key, value in row.items():
-            if key.startswith('mon_'):
-                vehicle[key] = value
+        vehicle.update(mon_items)
 
         pl_entry['vehicles'].append(vehicle)
 
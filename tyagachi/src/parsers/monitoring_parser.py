@@ -5,9 +5,15 @@ Parses monitoring API response, extracting key metrics.
 Track array is simplified by time interval to reduce data size.
 """
 
+import json
 from typing import Dict, Any, List
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json fallback
+    orjson = None
+
 # Default interval for track simplification (minutes)
 TRACK_SIMPLIFY_INTERVAL_MIN = 20  # Снижено для лучшей детализации
 
@@ -194,6 +200,23 @@ def parse_monitoring(data: Dict[str, Any]) -> Dict[str, Any]:
     return result
 
 
+def parse_monitoring_bytes(raw: bytes) -> Dict[str, Any]:
+    """
+    Decode raw monitoring API response and parse it.
+
+    The multi-token fetchers take raw response bytes, so orjson decodes
+    them directly without an intermediate str.
+
+    Args:
+        raw: Raw JSON response body
+
+    Returns:
+        Parsed monitoring data (see parse_monitoring)
+    """
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    return parse_monitoring(data)
+
+
 def _empty_monitoring() -> Dict[str, Any]:
     """Return empty monitoring record."""
     return {
@@ -236,3 +259,10 @@ MONITORING_FIELDS = [
     'mon_parkings_count',
     'mon_parkings_total_hours',
 ]
+
+# Array fields (parkings, fuels, track) - HTML only, not written to CSV
+MONITORING_LIST_FIELDS = [
+    'mon_fuels',
+    'mon_parkings',
+    'mon_track',
+]
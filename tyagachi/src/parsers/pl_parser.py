@@ -14,6 +14,11 @@ from pathlib import Path
 from typing import Dict, Any, List, Optional
 import yaml
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json fallback
+    orjson = None
+
 
 def extract_request_number(order_descr: str) -> Optional[int]:
     """
@@ -159,8 +164,13 @@ class PLParser:
 
         try:
             # Load JSON file
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError
+            if orjson is not None:
+                with open(input_file, 'rb') as f:
+                    data = orjson.loads(f.read())
+            else:
+                with open(input_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
 
             # Validate structure
             if 'list' not in data:
@@ -381,8 +391,26 @@ class PLParser:
         self.logger.info("Starting PL parsing")
 
         try:
-            # Load route lists from JSON
             data = self.load_route_lists()
+        except Exception as e:
+            self.logger.error(f"Critical error during parsing: {e}")
+            raise
+
+        self.parse_obj(data)
+
+    def parse_obj(self, data: Dict[str, Any]) -> None:
+        """
+        Parse already loaded route lists (e.g. straight from the API) and write CSV output.
+
+        Skips the JSON file round trip of parse().
+
+        Args:
+            data: Route lists JSON data with a 'list' key
+
+        Raises:
+            Exception: If any critical error occurs during parsing
+        """
+        try:
             route_lists = data['list']
 
             # Extract fields from all route lists (flattening calcs)
@@ -12,6 +12,11 @@ from pathlib import Path
 from typing import Dict, Any, List, Optional
 import yaml
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json fallback
+    orjson = None
+
 
 class RequestParser:
     """
@@ -128,8 +133,13 @@ class RequestParser:
 
         try:
             # Load JSON file
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError
+            if orjson is not None:
+                with open(input_file, 'rb') as f:
+                    data = orjson.loads(f.read())
+            else:
+                with open(input_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
 
             # Validate structure
             if 'list' not in data:
@@ -380,8 +390,26 @@ class RequestParser:
         self.logger.info("Starting request parsing")
 
         try:
-            # Load requests from JSON
             data = self.load_requests()
+        except Exception as e:
+            self.logger.error(f"Critical error during parsing: {e}")
+            raise
+
+        self.parse_obj(data)
+
+    def parse_obj(self, data: Dict[str, Any]) -> None:
+        """
+        Parse already loaded requests (e.g. straight from the API) and write CSV output.
+
+        Skips the JSON file round trip of parse().
+
+        Args:
+            data: Requests JSON data with a 'list' key
+
+        Raises:
+            Exception: If any critical error occurs during parsing
+        """
+        try:
             requests_list = data['list']
 
             # Extract fields from all requests
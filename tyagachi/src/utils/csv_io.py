@@ -0,0 +1,179 @@
+"""
+CSV I/O helpers for intermediate and final pipeline files.
+
+Uses the multi-threaded PyArrow CSV reader/writer when pyarrow is installed,
+falling back to the pandas C engine otherwise. read_table()/write_table()
+additionally keep a typed Parquet copy next to the CSV for stage-to-stage
+hand-off; the CSV stays as the user-facing export.
+"""
+
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pyarrow is optional
+    pa = None
+    pacsv = None
+
+
+def read_csv(path: Union[str, Path]) -> pd.DataFrame:
+    """
+    Read CSV into a DataFrame.
+
+    Columns stay NumPy-backed: report builders rely on NaN (not pd.NA)
+    for missing values.
+
+    Args:
+        path: Path to CSV file
+
+    Returns:
+        Loaded DataFrame
+    """
+    if pacsv is not None:
+        return pd.read_csv(path, engine='pyarrow')
+    return pd.read_csv(path)
+
+
+def write_csv(df: pd.DataFrame, path: Union[str, Path]) -> None:
+    """
+    Write DataFrame to CSV without index.
+
+    Args:
+        df: DataFrame to write
+        path: Output CSV path
+    """
+    if pacsv is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object columns — Arrow can't infer a single type
+            pass
+        else:
+            pacsv.write_csv(table, str(path))
+            return
+    df.to_csv(path, index=False)
+
+
+def _parquet_path(path: Union[str, Path]) -> Path:
+    return Path(path).with_suffix('.parquet')
+
+
+def read_table(path: Union[str, Path]) -> pd.DataFrame:
+    """
+    Read a pipeline table, preferring its Parquet copy.
+
+    The Parquet copy is used only if it is not older than the CSV — other
+    writers (e.g. the web server) may have rewritten the CSV alone.
+
+    Args:
+        path: Path to CSV file
+
+    Returns:
+        Loaded DataFrame
+    """
+    path = Path(path)
+    parquet_path = _parquet_path(path)
+    if pa is not None and parquet_path.exists() and (
+        not path.exists() or parquet_path.stat().st_mtime >= path.stat().st_mtime
+    ):
+        return pd.read_parquet(parquet_path, engine='pyarrow')
+    return read_csv(path)
+
+
+def write_table(df: pd.DataFrame, path: Union[str, Path]) -> None:
+    """
+    Write a pipeline table as CSV plus a zstd-compressed Parquet copy.
+
+    Args:
+        df: DataFrame to write
+        path: Output CSV path
+    """
+    write_csv(df, path)
+    if pa is not None:
+        try:
+            df.to_parquet(_parquet_path(path), engine='pyarrow', compression='zstd', index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object columns — CSV alone is enough
+            _parquet_path(path).unlink(missing_ok=True)
+
+
+class TableWriter:
+    """
+    Incremental writer for a pipeline table produced chunk by chunk.
+
+    Appends every chunk to the CSV (and the Parquet copy when pyarrow is
+    available), so the full table never has to exist in memory.
+
+    Usage:
+        with TableWriter(path, template) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, path: Union[str, Path], template: pd.DataFrame,
+                 arrow_sources: Optional[List[pd.DataFrame]] = None):
+        """
+        Args:
+            path: Output CSV path
+            template: Empty frame with the final column names and dtypes
+            arrow_sources: Full frames whose columns (in order) make up the
+                table; used to infer Arrow types of object columns, which an
+                empty template can't provide
+        """
+        self.path = Path(path)
+        self.template = template
+        self.rows = 0
+        self._csv_writer = None
+        self._parquet_writer = None
+        self._schema = self._arrow_schema(template, arrow_sources) if pa is not None else None
+
+        _parquet_path(self.path).unlink(missing_ok=True)
+        if self._schema is not None:
+            import pyarrow.parquet as pq
+            self._csv_writer = pacsv.CSVWriter(str(self.path), self._schema)
+            self._parquet_writer = pq.ParquetWriter(
+                str(_parquet_path(self.path)), self._schema, compression='zstd'
+            )
+
+    @staticmethod
+    def _arrow_schema(template, arrow_sources):
+        try:
+            fields = []
+            for source in arrow_sources or [template]:
+                fields.extend(pa.Schema.from_pandas(source, preserve_index=False))
+            # pandas-метаданные шаблона восстанавливают dtypes при чтении Parquet
+            meta = pa.Schema.from_pandas(template, preserve_index=False).metadata
+            return pa.schema(
+                [f.with_name(name) for f, name in zip(fields, template.columns)],
+                metadata=meta,
+            )
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type object columns — pandas CSV only
+            return None
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Append a chunk with the template's columns."""
+        if self._schema is not None:
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            self._csv_writer.write_table(table)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._schema is not None:
+            self._csv_writer.close()
+            self._parquet_writer.close()
+        elif not self.rows:
+            self.template.to_csv(self.path, index=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
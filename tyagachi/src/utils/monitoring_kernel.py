@@ -0,0 +1,45 @@
+"""
+Numba kernel for attaching monitoring records to matched rows.
+
+Importing this module requires numba; callers fall back to a pandas merge
+when it is not installed.
+"""
+
+import numba
+import numpy as np
+from numba import types
+from numba.typed import Dict
+
+
+@numba.njit(cache=True)
+def first_match(row_codes, offsets, ts_vals, mon_packed):
+    """
+    Find the first monitoring record for every matched row.
+
+    Keys are packed into int64 as ``pl_code << 32 | ts_id``.
+
+    Args:
+        row_codes: pl_id code per row (-1 for missing pl_id)
+        offsets: CSR offsets into ts_vals, length n_rows + 1
+        ts_vals: ts_id values of all rows, in row order
+        mon_packed: packed key per monitoring record
+
+    Returns:
+        int64 array: monitoring record position per row, -1 if none
+    """
+    lookup = Dict.empty(types.int64, types.int64)
+    for pos in range(mon_packed.shape[0]):
+        if mon_packed[pos] not in lookup:
+            lookup[mon_packed[pos]] = pos
+
+    out = np.full(row_codes.shape[0], -1, np.int64)
+    for i in range(row_codes.shape[0]):
+        if row_codes[i] < 0:
+            continue
+        # ts_id перебираются в порядке записи в ts_id_mo, берётся первый найденный
+        for j in range(offsets[i], offsets[i + 1]):
+            r = lookup.get((row_codes[i] << 32) | ts_vals[j], -1)
+            if r != -1:
+                out[i] = r
+                break
+    return out
@@ -1069,6 +1069,25 @@ async def get_report_by_id(report_id: int):
     return FileResponse(html_path, media_type='text/html')
 
 
+def _report_css_response() -> FileResponse:
+    """Shared V2 report stylesheet (URL is versioned by content hash, cache forever)."""
+    from src.output.html_generator_v2 import REPORT_CSS_PATH
+    return FileResponse(
+        REPORT_CSS_PATH,
+        media_type='text/css',
+        headers={'Cache-Control': 'public, max-age=31536000, immutable'},
+    )
+
+
+# Reports rendered with link_css link "report.css" relative to their own URL, so the
+# stylesheet is served next to those routes (and reaches the frontend via its /api proxy too).
+# Files served elsewhere (/report, /api/reports/{report_id}) inline the CSS.
+@app.get("/api/reports/{report_id}/report.css")
+async def get_report_v2_css(report_id: int):
+    """Stylesheet of a V2 report opened via /api/reports/{report_id}/v2."""
+    return _report_css_response()
+
+
 @app.get("/api/reports/{report_id}/v2")
 async def get_report_v2_by_id(report_id: int):
     """Get V2 report HTML by ID (3-column layout)."""
@@ -1274,6 +1293,12 @@ async def get_route_addresses():
         session.close()
 
 
+@app.get("/api/request/{request_number}/report.css")
+async def get_request_report_css(request_number: int):
+    """Stylesheet of a V2 report opened via /api/request/{request_number}/report."""
+    return _report_css_response()
+
+
 @app.get("/api/request/{request_number}/report", response_class=HTMLResponse)
 async def get_request_report(request_number: int):
     """Generate V2 report for a single request from cached matched_data_json."""
@@ -1301,7 +1326,7 @@ async def get_request_report(request_number: int):
     with tempfile.NamedTemporaryFile(suffix='.html', delete=False, dir=str(HISTORY_DIR)) as tmp:
         tmp_path = tmp.name
 
-    generate_html_report(hierarchy, tmp_path, title=title, web_mode=True)
+    generate_html_report(hierarchy, tmp_path, title=title, web_mode=True, link_css=True)
 
     html_content = Path(tmp_path).read_text(encoding='utf-8')
     Path(tmp_path).unlink()  # cleanup
@@ -1404,6 +1429,7 @@ def run_fetch_pipeline(from_req: str, to_req: str, from_pl: str, to_pl: str, use
         from src.parsers.request_parser import RequestParser
         from src.parsers.pl_parser import PLParser
         from src.output.html_generator_v2 import generate_html_report, build_hierarchy
+        import numpy as np
         import pandas as pd
         import yaml
 
@@ -1491,7 +1517,12 @@ def run_fetch_pipeline(from_req: str, to_req: str, from_pl: str, to_pl: str, use
         html_records = []
         matched_count = 0
 
-        for idx, row in matched_df.iterrows():
+        # Значения копятся по строкам и пишутся одним iloc-присваиванием после цикла
+        col_positions = [matched_df.columns.get_loc(col) for col in monitoring_cols_csv]
+        hit_rows = []
+        hit_values = []
+
+        for pos, (idx, row) in enumerate(matched_df.iterrows()):
             pl_id = row.get('pl_id')
             ts_id_str = str(row.get('ts_id_mo', ''))
             ts_ids = [int(x.strip()) for x in ts_id_str.split(',') if x.strip().isdigit()]
@@ -1503,9 +1534,8 @@ def run_fetch_pipeline(from_req: str, to_req: str, from_pl: str, to_pl: str, use
                 key = (pl_id, ts_id)
                 if key in monitoring_results:
                     mon_data_found = monitoring_results[key]
-                    for col in monitoring_cols_csv:
-                        if col in mon_data_found:
-                            matched_df.at[idx, col] = mon_data_found[col]
+                    hit_rows.append(pos)
+                    hit_values.append([mon_data_found.get(col) for col in monitoring_cols_csv])
                     matched_count += 1
                     break
 
@@ -1513,6 +1543,11 @@ def run_fetch_pipeline(from_req: str, to_req: str, from_pl: str, to_pl: str, use
                 record.update(mon_data_found)
             html_records.append(record)
 
+        if hit_rows:
+            values = np.empty((len(hit_rows), len(col_positions)), dtype=object)
+            values[:] = hit_values
+            matched_df.iloc[hit_rows, col_positions] = values
+
         matched_df.to_csv(output_dir / 'matched_full.csv', index=False)
         matched_df.to_csv(output_dir / 'matched.csv', index=False)
 
@@ -1575,6 +1610,7 @@ def run_fetch_pipeline_for_report(
         from src.parsers.request_parser import RequestParser
         from src.parsers.pl_parser import PLParser
         from src.output.html_generator_v2 import generate_html_report, build_hierarchy
+        import numpy as np
         import pandas as pd
         import yaml
 
@@ -1662,7 +1698,12 @@ def run_fetch_pipeline_for_report(
         html_records = []
         matched_count = 0
 
-        for idx, row in matched_df.iterrows():
+        # Значения копятся по строкам и пишутся одним iloc-присваиванием после цикла
+        col_positions = [matched_df.columns.get_loc(col) for col in monitoring_cols_csv]
+        hit_rows = []
+        hit_values = []
+
+        for pos, (idx, row) in enumerate(matched_df.iterrows()):
             pl_id = row.get('pl_id')
             ts_id_str = str(row.get('ts_id_mo', ''))
             ts_ids = [int(x.strip()) for x in ts_id_str.split(',') if x.strip().isdigit()]
@@ -1674,9 +1715,8 @@ def run_fetch_pipeline_for_report(
                 key = (pl_id, ts_id)
                 if key in monitoring_results:
                     mon_data_found = monitoring_results[key]
-                    for col in monitoring_cols_csv:
-                        if col in mon_data_found:
-                            matched_df.at[idx, col] = mon_data_found[col]
+                    hit_rows.append(pos)
+                    hit_values.append([mon_data_found.get(col) for col in monitoring_cols_csv])
                     matched_count += 1
                     break
 
@@ -1684,6 +1724,11 @@ def run_fetch_pipeline_for_report(
                 record.update(mon_data_found)
             html_records.append(record)
 
+        if hit_rows:
+            values = np.empty((len(hit_rows), len(col_positions)), dtype=object)
+            values[:] = hit_values
+            matched_df.iloc[hit_rows, col_positions] = values
+
         matched_df.to_csv(output_dir / 'matched_full.csv', index=False)
         matched_df.to_csv(output_dir / 'matched.csv', index=False)
 
@@ -1736,7 +1781,8 @@ def run_fetch_pipeline_for_report(
                 str(v2_path),
                 title=f"{report_title} (V2)",
                 web_mode=True,
-                report_id=report_id
+                report_id=report_id,
+                link_css=True
             )
             # Also save to final
             v2_final_path = output_dir / 'report_v2.html'
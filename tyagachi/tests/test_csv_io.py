@@ -0,0 +1,91 @@
+"""
+Круговые тесты src.utils.csv_io: Parquet-копия против CSV, устаревание копии,
+TableWriter и fallback без pyarrow.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import csv_io
+
+
+@pytest.fixture(params=['pyarrow', 'pandas'])
+def backend(request, monkeypatch):
+    """Оба бэкенда: pyarrow (если установлен) и pandas-fallback."""
+    if request.param == 'pyarrow':
+        if csv_io.pa is None:
+            pytest.skip('pyarrow не установлен')
+    else:
+        monkeypatch.setattr(csv_io, 'pa', None)
+        monkeypatch.setattr(csv_io, 'pacsv', None)
+    return request.param
+
+
+def _frame(n: int = 50) -> pd.DataFrame:
+    return pd.DataFrame({
+        'request_number': np.arange(n, dtype='int64'),
+        'pl_id': [f"{i}_01.02.2026" for i in range(n)],
+        'mon_distance': [float(i) * 1.5 if i % 7 else np.nan for i in range(n)],
+        'ts_reg_number': [f"А{i:03d}ВС" if i % 5 else None for i in range(n)],
+    })
+
+
+def test_parquet_matches_csv(tmp_path, backend):
+    df = _frame()
+    path = tmp_path / 'matched.csv'
+    csv_io.write_table(df, path)
+
+    assert path.with_suffix('.parquet').exists() == (backend == 'pyarrow')
+    from_table = csv_io.read_table(path)
+    from_csv = csv_io.read_csv(path)
+
+    pd.testing.assert_frame_equal(from_table, from_csv, check_dtype=False)
+    pd.testing.assert_frame_equal(from_table, df, check_dtype=False)
+
+
+def test_stale_parquet_is_ignored(tmp_path, backend):
+    path = tmp_path / 'matched.csv'
+    csv_io.write_table(_frame(), path)
+
+    # Другой писатель (веб-сервер) перезаписал только CSV
+    newer = _frame(10)
+    newer.to_csv(path, index=False)
+    parquet_path = path.with_suffix('.parquet')
+    if parquet_path.exists():
+        stamp = path.stat().st_mtime
+        os.utime(parquet_path, (stamp - 10, stamp - 10))
+
+    pd.testing.assert_frame_equal(csv_io.read_table(path), newer, check_dtype=False)
+
+
+def test_table_writer_matches_write_table(tmp_path, backend):
+    df = _frame(120)
+    chunks = [df.iloc[i:i + 32] for i in range(0, len(df), 32)]
+
+    streamed = tmp_path / 'streamed.csv'
+    with csv_io.TableWriter(streamed, df.iloc[:0], arrow_sources=[df]) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    assert writer.rows == len(df)
+
+    whole = tmp_path / 'whole.csv'
+    csv_io.write_table(df, whole)
+
+    pd.testing.assert_frame_equal(csv_io.read_table(streamed), csv_io.read_table(whole), check_dtype=False)
+    pd.testing.assert_frame_equal(csv_io.read_csv(streamed), csv_io.read_csv(whole), check_dtype=False)
+
+
+def test_table_writer_empty_writes_header(tmp_path, backend):
+    df = _frame()
+    path = tmp_path / 'empty.csv'
+    with csv_io.TableWriter(path, df.iloc[:0], arrow_sources=[df]):
+        pass
+
+    assert list(csv_io.read_csv(path).columns) == list(df.columns)
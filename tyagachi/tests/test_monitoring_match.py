@@ -0,0 +1,99 @@
+"""
+Эквивалентность numba-ядра first_match и хеш-поиска по MultiIndex
+при присоединении мониторинга к matched-строкам.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import (
+    _first_match_kernel,
+    _match_monitoring_index,
+    _match_monitoring_jit,
+    attach_monitoring,
+    explode_ts_ids,
+    monitoring_to_frame,
+)
+
+
+def _sample(seed: int, n_rows: int = 400):
+    """Случайные matched-строки и мониторинг с пропусками, дублями и несколькими ts_id в строке."""
+    rng = np.random.default_rng(seed)
+    pl_pool = [f"{num}_{day:02d}.02.2026" for num in range(40) for day in (1, 2)]
+    ts_pool = rng.integers(1, 5000, size=60)
+
+    pl_ids = []
+    ts_id_mo = []
+    for _ in range(n_rows):
+        pl_ids.append(None if rng.random() < 0.05 else pl_pool[rng.integers(len(pl_pool))])
+        k = rng.integers(0, 4)
+        ids = [str(v) for v in rng.choice(ts_pool, size=k)]
+        if rng.random() < 0.1:
+            ids.append('abc')  # нечисловая часть отбрасывается
+        ts_id_mo.append(', '.join(ids) if ids else None)
+
+    monitoring = {}
+    for _ in range(n_rows // 2):
+        key = (pl_pool[rng.integers(len(pl_pool))], int(rng.choice(ts_pool)))
+        monitoring[key] = {'mon_distance': float(rng.integers(0, 500)), 'mon_parkings_count': int(rng.integers(0, 9))}
+
+    matched_df = pd.DataFrame({'pl_id': pl_ids, 'ts_id_mo': ts_id_mo})
+    return matched_df, monitoring_to_frame(monitoring)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_jit_matches_index(seed):
+    kernel = _first_match_kernel()
+    if kernel is None:
+        pytest.skip('numba не установлена')
+
+    matched_df, mon_df = _sample(seed)
+    ts_ids = explode_ts_ids(matched_df['ts_id_mo'])
+
+    jit_rows, jit_pos = _match_monitoring_jit(kernel, matched_df['pl_id'], ts_ids, mon_df.index)
+    idx_rows, idx_pos = _match_monitoring_index(matched_df['pl_id'], ts_ids, mon_df.index)
+
+    assert len(idx_rows) > 0
+    np.testing.assert_array_equal(jit_rows, idx_rows)
+    np.testing.assert_array_equal(jit_pos, idx_pos)
+
+
+def test_first_matching_ts_id_wins():
+    kernel = _first_match_kernel()
+    matched_df = pd.DataFrame({
+        'pl_id': ['A', 'A', 'B', None],
+        'ts_id_mo': ['1, 2', '3, 2', '2', '1'],
+    })
+    mon_df = monitoring_to_frame({
+        ('A', 2): {'mon_distance': 20.0},
+        ('A', 1): {'mon_distance': 10.0},
+        ('B', 7): {'mon_distance': 70.0},
+    })
+    ts_ids = explode_ts_ids(matched_df['ts_id_mo'])
+
+    matchers = [_match_monitoring_index]
+    if kernel is not None:
+        matchers.append(lambda *args: _match_monitoring_jit(kernel, *args))
+    for matcher in matchers:
+        rows, positions = matcher(matched_df['pl_id'], ts_ids, mon_df.index)
+        assert rows.tolist() == [0, 1]
+        assert mon_df['mon_distance'].to_numpy()[positions].tolist() == [10.0, 20.0]
+
+
+def test_attach_monitoring_keeps_ints_for_html():
+    matched_df = pd.DataFrame({'pl_id': ['A', 'B'], 'ts_id_mo': ['1', '2']})
+    mon_df = monitoring_to_frame({('A', 1): {'mon_distance': 12.5, 'mon_parkings_count': 3}})
+
+    flat_df, html_df, matched_count = attach_monitoring(matched_df, mon_df, ['mon_distance', 'mon_parkings_count'])
+
+    assert matched_count == 1
+    assert flat_df['mon_distance'].dtype == np.float64
+    assert html_df.loc[0, 'mon_parkings_count'] == 3
+    assert type(html_df.loc[0, 'mon_parkings_count']) is not float
+    assert pd.isna(html_df.loc[1, 'mon_distance'])